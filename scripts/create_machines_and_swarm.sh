@@ -25,6 +25,9 @@ else
     if [ ! -d $PWD/volumes/whitebox_program_uploads/compilations ]; then
 	mkdir $PWD/volumes/whitebox_program_uploads/compilations
     fi
+    if [ ! -d $PWD/volumes/whitebox_program_uploads/cache ]; then
+	mkdir $PWD/volumes/whitebox_program_uploads/cache
+    fi
 
     docker-machine create -d virtualbox --virtualbox-share-folder $PWD/volumes:volumes node-manager
     VBoxManage controlvm node-manager poweroff
@@ -0,0 +1,33 @@
+-- Upgrade of a database created before the changes below.
+--
+-- The services create the missing tables when they start (db.create_all),
+-- but they never alter the existing ones: the columns and the indexes added
+-- to the existing tables are added here. Run it once, with the services
+-- stopped (see "Upgrading an existing database" in the README):
+--
+--   mysql -u root -p db_wb < upgrade_database.sql
+--
+-- The new tables (contest_state, calibration) need nothing.
+
+-- Slot which compiled and tested the program, and the statistics of its
+-- measures
+ALTER TABLE program
+    ADD COLUMN _slot VARCHAR(64),
+    ADD COLUMN _benchmark_summary TEXT;
+
+-- Seed of the messages signed by the program, the programs submitted before
+-- get one when they are tested again
+ALTER TABLE program
+    ADD COLUMN _seed VARCHAR(32);
+
+-- Incremental banana ranking
+CREATE INDEX ix_user__bananas ON `user` (_bananas);
+
+-- Sample of the published programs, serialized when they are published.
+-- The samples of the programs published before are serialized on the fly
+ALTER TABLE program
+    ADD COLUMN _sample TEXT;
+
+-- Compilation queue
+CREATE INDEX ix_program_status_timestamp_submitted
+    ON program (_status, _timestamp_submitted);
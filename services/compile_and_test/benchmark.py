@@ -0,0 +1,160 @@
+"""Robust statistics of the CPU time and memory measured for each message.
+
+The time and RAM factors of a program are estimated from one measure per
+message. The first warm_up measures of a run (cold caches, first page
+faults) are left out, the run can be extended by repetitions timed runs on
+the first messages, and the estimate comes with what is needed to judge
+how noisy the node was:
+
+- the median and its median absolute deviation (MAD),
+- the mean trimmed of the `trimmed` lowest and highest measures,
+- distribution-free confidence intervals of the median (order statistics)
+  and of the trimmed mean (winsorized variance),
+- the measures flagged as outliers, i.e. whose modified z-score
+  0.6745 * |x - median| / MAD exceeds outlier_threshold.
+
+The summary is posted to the launcher, which stores it next to the
+factors."""
+
+import math
+import os
+from collections import namedtuple
+from statistics import NormalDist, mean, median, stdev
+
+ESTIMATORS = ('median', 'trimmed_mean', 'mean')
+MAX_REPORTED_OUTLIERS = 10
+
+Settings = namedtuple('Settings', ['warm_up', 'repetitions', 'estimator',
+                                   'trimmed', 'confidence',
+                                   'outlier_threshold'])
+
+DEFAULT_SETTINGS = Settings(warm_up=0, repetitions=0,
+                            estimator='trimmed_mean', trimmed=5,
+                            confidence=0.95, outlier_threshold=3.5)
+
+
+def settings_from_environ():
+    settings = Settings(
+        warm_up=int(os.environ.get('BENCHMARK_WARM_UP_RUNS',
+                                   DEFAULT_SETTINGS.warm_up)),
+        repetitions=int(os.environ.get('BENCHMARK_REPETITIONS',
+                                       DEFAULT_SETTINGS.repetitions)),
+        estimator=os.environ.get('BENCHMARK_ESTIMATOR',
+                                 DEFAULT_SETTINGS.estimator),
+        trimmed=int(os.environ.get('BENCHMARK_TRIMMED_MEASURES',
+                                   DEFAULT_SETTINGS.trimmed)),
+        confidence=float(os.environ.get('BENCHMARK_CONFIDENCE',
+                                        DEFAULT_SETTINGS.confidence)),
+        outlier_threshold=float(os.environ.get(
+            'BENCHMARK_OUTLIER_THRESHOLD',
+            DEFAULT_SETTINGS.outlier_threshold)))
+    if settings.estimator not in ESTIMATORS:
+        raise ValueError(f"Unknown estimator {settings.estimator}")
+    if settings.warm_up < 0 or settings.repetitions < 0 or \
+       settings.trimmed < 0 or not 0 < settings.confidence < 1:
+        raise ValueError(f"Invalid benchmark settings {settings}")
+    return settings
+
+
+def _trimmed(sorted_samples, trimmed):
+    """Number of measures actually trimmed on each side: nothing is
+    trimmed if it would leave less than 3 measures."""
+    if len(sorted_samples) - 2 * trimmed < 3:
+        return 0
+    return trimmed
+
+
+def trimmed_mean(sorted_samples, trimmed):
+    trimmed = _trimmed(sorted_samples, trimmed)
+    return mean(sorted_samples[trimmed:len(sorted_samples) - trimmed])
+
+
+def median_confidence_interval(sorted_samples, confidence):
+    """The median lies between the returned order statistics with
+    probability (about) confidence, whatever the distribution."""
+    n = len(sorted_samples)
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    half_width = z * math.sqrt(n) / 2
+    low = max(0, math.floor(n / 2 - half_width))
+    high = min(n - 1, math.ceil(n / 2 + half_width) - 1)
+    return (sorted_samples[low], sorted_samples[high])
+
+
+def trimmed_mean_confidence_interval(sorted_samples, trimmed, confidence):
+    """Tukey-McLaughlin interval: the standard error of the trimmed mean is
+    derived from the variance of the winsorized measures."""
+    n = len(sorted_samples)
+    trimmed = _trimmed(sorted_samples, trimmed)
+    center = trimmed_mean(sorted_samples, trimmed)
+    if n < 2:
+        return (center, center)
+    winsorized = [sorted_samples[trimmed]] * trimmed + \
+        sorted_samples[trimmed:n - trimmed] + \
+        [sorted_samples[n - trimmed - 1]] * trimmed
+    standard_error = stdev(winsorized) / ((1 - 2 * trimmed / n) * math.sqrt(n))
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    return (center - z * standard_error, center + z * standard_error)
+
+
+def outliers(samples, center, mad, threshold):
+    """Indices of the outliers among samples."""
+    if mad == 0:
+        return [i for i, x in enumerate(samples) if x != center]
+    return [i for i, x in enumerate(samples)
+            if 0.6745 * abs(x - center) / mad > threshold]
+
+
+def summarize(samples, settings=DEFAULT_SETTINGS):
+    """Statistics of the measures (after the warm-up ones were removed)."""
+    sorted_samples = sorted(samples)
+    center = median(sorted_samples)
+    mad = median(abs(x - center) for x in sorted_samples)
+    outlier_indices = outliers(samples, center, mad,
+                               settings.outlier_threshold)
+    return {
+        'number_of_measures': len(samples),
+        'min': sorted_samples[0],
+        'max': sorted_samples[-1],
+        'mean': mean(sorted_samples),
+        'stdev': stdev(sorted_samples) if len(samples) > 1 else 0.,
+        'median': center,
+        'mad': mad,
+        'relative_mad': mad / center if center else 0.,
+        'median_confidence_interval':
+            median_confidence_interval(sorted_samples, settings.confidence),
+        'trimmed_mean': trimmed_mean(sorted_samples, settings.trimmed),
+        'trimmed_mean_confidence_interval':
+            trimmed_mean_confidence_interval(sorted_samples,
+                                             settings.trimmed,
+                                             settings.confidence),
+        'number_of_outliers': len(outlier_indices),
+        'outliers': outlier_indices[:MAX_REPORTED_OUTLIERS],
+    }
+
+
+def measures_after_warm_up(runs, warm_up):
+    """Concatenation of the measures of each run, without the first warm_up
+    ones of each run (unless nothing would be left)."""
+    measures = list()
+    for run in runs:
+        measures += run[warm_up:] if len(run) > warm_up else run
+    return measures
+
+
+def summary(cpu_time_runs, ram_runs, settings=DEFAULT_SETTINGS):
+    """Summary of the runs, each run being the list of its measures in
+    the order of the messages."""
+    return {
+        'settings': settings._asdict(),
+        'cpu_time': summarize(
+            measures_after_warm_up(cpu_time_runs, settings.warm_up),
+            settings),
+        'ram': summarize(
+            measures_after_warm_up(ram_runs, settings.warm_up),
+            settings),
+    }
+
+
+def estimate(statistics, estimator):
+    """Value of the estimator in the statistics returned by summarize."""
+    return statistics[estimator]
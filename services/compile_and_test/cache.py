@@ -0,0 +1,113 @@
+"""Content-addressed cache of compiled objects and linked executables.
+
+An entry is a directory named after the SHA-256 of the source file and of
+the toolchain fingerprint (compiler version, flags and the objects the
+submission is linked against). Entries are created atomically (written in
+a temporary directory, then renamed) and evicted in least recently used
+order once the cache exceeds its maximum size.
+
+The sandboxes mount the cache read-only: the code they run could otherwise
+plant an entry for a source submitted later. They only get entries, the
+launcher puts the files a run staged before executing the submission once
+the run succeeded (this file is copied in the launcher, see the
+Makefile)."""
+
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+
+OBJECT = 'object.o'
+
+
+def file_digest(path, h=None):
+    if h is None:
+        h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(2**20), b''):
+            h.update(chunk)
+    return h
+
+
+class CompilationCache:
+
+    def __init__(self, root, max_size):
+        self.root = root
+        self.max_size = max_size
+
+    def key(self, source, fingerprint):
+        h = hashlib.sha256(fingerprint.encode() + b'\0')
+        return file_digest(source, h).hexdigest()
+
+    def _entry(self, key):
+        return os.path.join(self.root, key)
+
+    def get(self, key, name, destination):
+        """Copy the file 'name' of the entry to destination. Returns False
+        if there is no such entry or file."""
+        entry = self._entry(key)
+        try:
+            shutil.copyfile(os.path.join(entry, name), destination)
+            shutil.copymode(os.path.join(entry, name), destination)
+            # Mark the entry as recently used
+            os.utime(entry)
+        except OSError:
+            return False
+        return True
+
+    def put(self, key, files):
+        """Store files, a dict mapping names to paths, under key. Files
+        already in the entry are kept."""
+        entry = self._entry(key)
+        if os.path.isdir(entry):
+            for name, path in files.items():
+                target = os.path.join(entry, name)
+                if not os.path.exists(target):
+                    tmp = f'{target}.{os.getpid()}.tmp'
+                    shutil.copy(path, tmp)
+                    os.rename(tmp, target)
+            os.utime(entry)
+        else:
+            tmp = tempfile.mkdtemp(prefix='.tmp-', dir=self.root)
+            for name, path in files.items():
+                shutil.copy(path, os.path.join(tmp, name))
+            try:
+                os.rename(tmp, entry)
+            except OSError:
+                # Somebody else created the same entry in the meantime
+                shutil.rmtree(tmp, ignore_errors=True)
+        self.evict()
+
+    def _entries(self):
+        entries = list()
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if name.startswith('.') or not os.path.isdir(path):
+                continue
+            try:
+                size = sum(os.path.getsize(os.path.join(path, f))
+                           for f in os.listdir(path))
+                entries.append((os.path.getmtime(path), size, path))
+            except OSError:
+                continue
+        return entries
+
+    def evict(self):
+        entries = sorted(self._entries())
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total_size <= self.max_size:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total_size -= size
+
+        # Leftovers of interrupted insertions
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            try:
+                if name.startswith('.tmp-') and \
+                   os.path.getmtime(path) < time.time() - 3600:
+                    shutil.rmtree(path, ignore_errors=True)
+            except OSError:
+                continue
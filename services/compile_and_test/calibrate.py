@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""Calibration of a sandbox node with the reference signer.
+
+The reference signer (reference_signer.c, linked against the streaming
+harness like a submission) signs a fixed set of messages. The statistics
+of its CPU time tell how fast the node is: the launcher divides the time
+factors measured on the node by its speed coefficient, the ratio of this
+CPU time to the reference one, so that moving the sandbox to another host
+does not shift the scores.
+
+The launcher asks for a calibration (CALIBRATE=True) along with a program
+to compile and test, when the slot was not calibrated recently. Run as a
+script, it prints the calibration of the current node."""
+
+import hashlib
+import json
+import logging
+import os
+import socket
+import sys
+import urllib.request
+
+import benchmark
+import streaming
+
+logger = logging.getLogger()
+
+REFERENCE_HARNESS = '/reference_harness'
+
+
+def reference_messages(number_of_messages):
+    """The same messages on every node."""
+    return b''.join(hashlib.sha256(i.to_bytes(4, 'big')).digest()
+                    for i in range(number_of_messages))
+
+
+def node_name():
+    # NODE_NAME is set from the service template to the hostname of the node
+    return os.environ.get('NODE_NAME', socket.gethostname())
+
+
+def calibrate(number_of_messages, cpu_time_limit,
+              settings=benchmark.DEFAULT_SETTINGS):
+    """Benchmark summary (see benchmark.summary) of the reference signer on
+    this node."""
+    messages = reference_messages(number_of_messages)
+    _, all_cpu_time, all_max_ram = streaming.stream(
+        REFERENCE_HARNESS, messages, number_of_messages, cpu_time_limit)
+    summary = benchmark.summary([all_cpu_time], [all_max_ram], settings)
+    summary['node'] = node_name()
+    return summary
+
+
+def calibrate_and_notify_launcher(url, number_of_messages, cpu_time_limit,
+                                  settings=benchmark.DEFAULT_SETTINGS):
+    """Post the calibration of the node to the launcher. A failed
+    calibration is only logged: it must not fail the program tested
+    along."""
+    try:
+        summary = calibrate(number_of_messages, cpu_time_limit, settings)
+        logger.info(f"Calibration of {summary['node']}: median "
+                    f"{summary['cpu_time']['median']:.6g}s, MAD "
+                    f"{summary['cpu_time']['mad']:.6g}s")
+        req = urllib.request.Request(
+            url,
+            data=json.dumps(summary).encode('utf8'),
+            headers={'content-type': 'application/json'}
+        )
+        urllib.request.urlopen(req)
+    except Exception as e:
+        logger.warning(f"Could not calibrate the node: {e}")
+
+
+def main():
+    logging.basicConfig(stream=sys.stderr, level=logging.INFO)
+    number_of_messages = int(os.environ.get(
+        'CALIBRATION_NUMBER_OF_MESSAGES', 200))
+    cpu_time_limit = int(os.environ.get(
+        'CHALLENGE_MAX_TIME_EXECUTION_IN_SECS', 3))
+    summary = calibrate(number_of_messages, cpu_time_limit,
+                        benchmark.settings_from_environ())
+    print(json.dumps(summary, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,29 @@
 #!/usr/bin/env python3
 
-import binascii
+import functools
+import hashlib
 import json
 import logging
 import mmap
 import os
 import re
-import subprocess
+import resource
+import signal
 import sys
 import traceback
 import urllib.request
-from urllib.parse import urljoin
-from statistics import mean
+from urllib.parse import urlencode, urljoin
+
+import benchmark
+import cache
+import calibrate
+import parallel
+import result_protocol
+import runner
+import scanner
+import streaming
+import uploader
+import vectors
 
 # logging
 FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
@@ -30,6 +42,16 @@ ERR_CODE_EXECUTION_EXCEED_TIME_LIMIT = 7
 forbidden_strings = [b'#include', b'extern', b'_FILE__', b'__DATE__',
                      b'__TIME', b'__STDC_', b'__asm__', b'syscall']
 forbidden_pattern = [re.compile(p) for p in [b'\sasm\W', ]]
+forbidden_scanner = scanner.Scanner(forbidden_strings, forbidden_pattern)
+MAX_REPORTED_FORBIDDEN_HITS = 20
+
+COMPILE_FLAGS = ['-c']
+LINK_FLAGS = ['-lgmp']
+
+# Runs a process signing a message and reports its peak RSS (see peak_rss.c)
+PEAK_RSS = '/peak_rss'
+# Wall-clock time allowed to a process signing a message, in CPU time limits
+SPAWN_TIMEOUT_FACTOR = 10
 
 
 def exit_after_notifying_launcher(code, post_data=None):
@@ -37,15 +59,19 @@ def exit_after_notifying_launcher(code, post_data=None):
     url = urljoin(url_to_ping_back, './%d' % code)
     logger.info(f"Contacting {url}")
 
-    # post data
+    # post data, the successful results are binary (see result_protocol.py)
     try:
-        if post_data:
+        content_type = 'application/json'
+        if isinstance(post_data, bytes):
+            content_type = result_protocol.CONTENT_TYPE
+            logger.info(f"POST: {len(post_data)} bytes")
+        elif post_data:
             post_data = json.dumps(post_data).encode('utf8')
             logger.info(f"POST: {post_data}")
         req = urllib.request.Request(
             url,
             data=post_data,
-            headers={'content-type': 'application/json'}
+            headers={'content-type': content_type}
         )
         urllib.request.urlopen(req)
 
@@ -59,13 +85,16 @@ def exit_after_notifying_launcher(code, post_data=None):
         os._exit(1)
 
 
-def try_fetch_messages():
+def test_messages():
+    """The messages to sign, generated from the seed of the program (see
+    vectors.py)."""
     try:
-        url = os.environ['URL_FOR_FETCHING_MESSAGES']
-        logger.info(f"Contacting {url}")
-        return urllib.request.urlopen(url).read()
-    except:
-        logger.error("Could not fetch messages")
+        return vectors.Messages(
+            os.environ['TEST_VECTORS_SEED'],
+            vectors.decode_edge_cases(os.environ['CHALLENGE_TEST_EDGE_CASES']),
+            int(os.environ['CHALLENGE_NUMBER_OF_TEST_VECTORS']))
+    except (KeyError, ValueError):
+        logger.error("Could not generate the messages")
         os._exit(1)
 
 
@@ -73,30 +102,105 @@ def preprocess(source):
     with open(source, 'rb', 0) as f, \
             mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as contents:
 
+        # The include of gmp.h is allowed: it is scanned as if it had been
+        # removed, without copying the file
+        skip = None
         include_str = b'#include <gmp.h>\n'
         if (idx := contents.find(include_str)) != -1:
-            logger.info("Remove #include <gmp.h>")
-            contents = contents[:idx] + contents[idx+17:]
-
-        for string in forbidden_strings:
-            if contents.find(string) != -1:
-                error_message = f"Forbidden string '{string.decode()}' found."
-                logger.warning(error_message)
-                post_data = {"error_message": error_message}
-                exit_after_notifying_launcher(
-                    ERR_CODE_CONTAININT_FORBIDDEN_STRING, post_data)
-
-        for pattern in forbidden_pattern:
-            match = re.search(pattern, contents)
-            if match is not None:
-                matched = match.group(0).decode()
-                pattern = pattern.pattern.decode()
-                error_message = (f"The string '{matched}' in the source code "
-                                 f"matches forbidden pattern '{pattern}'.")
-                logger.warning(error_message)
-                post_data = {"error_message": error_message}
-                exit_after_notifying_launcher(
-                    ERR_CODE_CONTAININT_FORBIDDEN_STRING, post_data)
+            logger.info("Ignore #include <gmp.h>")
+            skip = (idx, idx + len(include_str))
+
+        hits = forbidden_scanner.scan(contents, skip=skip,
+                                      max_hits=MAX_REPORTED_FORBIDDEN_HITS)
+
+    if hits:
+        error_messages = list()
+        for hit in hits:
+            if hit.is_pattern:
+                matched = hit.matched.decode(errors='replace')
+                pattern = hit.forbidden.pattern.decode()
+                error_messages.append(
+                    f"The string '{matched}' in the source code at line "
+                    f"{hit.line} matches forbidden pattern '{pattern}'.")
+            else:
+                error_messages.append(
+                    f"Forbidden string '{hit.forbidden.decode()}' found at "
+                    f"line {hit.line}.")
+        error_message = '\n'.join(error_messages)
+        logger.warning(error_message)
+        post_data = {"error_message": error_message}
+        exit_after_notifying_launcher(
+            ERR_CODE_CONTAININT_FORBIDDEN_STRING, post_data)
+
+
+def get_compilation_cache():
+    cache_dir = os.environ.get('COMPILATION_CACHE_DIR')
+    max_size = int(os.environ.get('COMPILATION_CACHE_MAX_SIZE_IN_MB', 0))
+    if not cache_dir or max_size <= 0 or not os.path.isdir(cache_dir):
+        return None
+    return cache.CompilationCache(cache_dir, max_size * 2**20)
+
+
+def toolchain_fingerprint(compile_flags, link_flags, objects):
+    h = hashlib.sha256()
+    for cmd in (['gcc', '-dumpfullversion'], ['gcc', '-dumpmachine']):
+        h.update(runner.run(cmd).stdout)
+    h.update(' '.join(compile_flags).encode() + b'\0')
+    h.update(' '.join(link_flags).encode() + b'\0')
+    for path in objects:
+        if os.path.exists(path):
+            cache.file_digest(path, h)
+    return h.hexdigest()
+
+
+def stage_for_compilation_cache(fingerprint, files):
+    """Send the files compiled here to the launcher, which puts them in the
+    compilation cache if the run succeeds. files maps the names in the
+    cache to paths. This must be done before the submission is executed."""
+    url = os.environ.get('URL_FOR_COMPILATION_CACHE')
+    if not url:
+        return
+    query = urlencode({'fingerprint': fingerprint})
+    for name, path in files.items():
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            req = urllib.request.Request(
+                urljoin(url, f'./{name}?{query}'),
+                data=data,
+                headers={'content-type': 'application/octet-stream'}
+            )
+            urllib.request.urlopen(req).close()
+        except Exception as e:
+            logger.warning(f"Could not stage {name} for the compilation "
+                           f"cache: {e}")
+
+
+def notify_execution_start():
+    """Tell the launcher that the submission is about to be executed: from
+    then on, it ignores the files staged for the compilation cache and the
+    calibrations of this run. We stop if it does not acknowledge."""
+    url = os.environ.get('URL_FOR_EXECUTION_START')
+    if not url:
+        return
+    try:
+        req = urllib.request.Request(url, data=b'')
+        with urllib.request.urlopen(req) as response:
+            started = json.loads(response.read()).get('started')
+    except Exception as e:
+        logger.error(f"Could not contact {url}: {e}")
+        started = False
+    if not started:
+        logger.error("The launcher did not acknowledge the execution start")
+        exit_after_notifying_launcher(ERR_CODE_EXECUTION_FAILED)
+
+
+def get_signature_uploader():
+    url = os.environ.get('URL_FOR_STREAMING_SIGNATURES')
+    batch_size = int(os.environ.get('SIGNATURES_BATCH_SIZE', 0))
+    if not url or batch_size <= 0:
+        return None
+    return uploader.SignatureUploader(url, batch_size)
 
 
 def compile(basename, source, obj):
@@ -104,14 +208,18 @@ def compile(basename, source, obj):
         # max ram in KB
         max_ram = int(os.environ['CHALLENGE_MAX_MEM_COMPILATION_IN_MB']) * (2**10) + 5000  # noqa
         max_cpu_time = int(os.environ['CHALLENGE_MAX_TIME_COMPILATION_IN_SECS']) + 10  # noqa
-        cmd_ulimit_ram = f'ulimit -v {max_ram}'
-        cmd_ulimit_cpu_time = f'ulimit -t {max_cpu_time}'
-        cmd_compile = f'gcc -c {source} -o {obj}'
-
-        cmd_all = f'{cmd_ulimit_ram}; {cmd_ulimit_cpu_time}; {cmd_compile}'
-        logger.info(f"Compilation CMD: {cmd_all}")
-        compile_prcess = subprocess.run(cmd_all, check=True, shell=True,
-                                        stderr=subprocess.PIPE)
+        rlimits = {
+            resource.RLIMIT_AS: max_ram * 1024,
+            resource.RLIMIT_CPU: max_cpu_time,
+        }
+        cmd_compile = ['gcc'] + COMPILE_FLAGS + [source, '-o', obj]
+
+        logger.info(f"Compilation CMD: {' '.join(cmd_compile)} "
+                    f"(max ram {max_ram}KB, max cpu time {max_cpu_time}s)")
+        compile_prcess = runner.run(cmd_compile, rlimits=rlimits,
+                                    capture_stderr=True)
+        if compile_prcess.returncode != 0:
+            raise Exception(f"gcc returned {compile_prcess.returncode}")
 
         if b'warning: implicit declaration of function' in compile_prcess.stderr:
             err_msg = re.sub(
@@ -129,93 +237,248 @@ def compile(basename, source, obj):
     logger.info(f"The compilation of {basename}.c succeeded.")
 
 
-def link(basename, obj, executable):
+def link(basename, obj, executable, main_obj='/main.o'):
     try:
-        cmd_list = ['gcc', '/main.o', obj, '-lgmp', '-o', executable]
-        subprocess.run(cmd_list, check=True)
+        cmd_list = ['gcc', main_obj, obj] + LINK_FLAGS + ['-o', executable]
+        if runner.run(cmd_list).returncode != 0:
+            raise Exception("gcc failed")
     except:
         logger.error(f"The link of the file with basename {basename} failed.")
         exit_after_notifying_launcher(ERR_CODE_LINK_FAILED)
     logger.info(f"The link of the file with basename {basename} succeeded.")
 
 
+def check_limits(cpu_time, ram, cpu_time_limit, ram_limit):
+    if cpu_time > cpu_time_limit:
+        logger.warning("Execution reaches CPU time limit: "
+                       f"{cpu_time:.2f}s was used!")
+        post_data = {"cpu_time": cpu_time}
+        exit_after_notifying_launcher(
+            ERR_CODE_EXECUTION_EXCEED_TIME_LIMIT,
+            post_data=post_data)
+    if ram > ram_limit:
+        logger.warning("Execution reaches memory limit: "
+                       f"{ram/1024:.2f}MB")
+        post_data = {"ram": ram/1024.}
+        exit_after_notifying_launcher(
+            ERR_CODE_EXECUTION_EXCEED_RAM_LIMIT,
+            post_data=post_data)
+
+
+def spawn_limits(ram_limit, cpu_time_limit):
+    """Resource limits of a process signing a message (ram_limit in KB),
+    with the same margins as the compilation."""
+    return {
+        resource.RLIMIT_AS: (ram_limit + 5000) * 1024,
+        resource.RLIMIT_CPU: cpu_time_limit + 1,
+    }
+
+
 def performance_measure(executable,
                         messages,
                         number_of_tests,
                         ram_limit,
-                        cpu_time_limit):
+                        cpu_time_limit,
+                        on_signature=None):
+    """Sign each message with a fresh process. Returns (signatures,
+    cpu_times, max_rams, per_core_statistics), the measures being in the
+    order of the messages.
+    The RAM is the one used by the container during the run when the
+    kernel tells it, the peak RSS of the process (see peak_rss.c)
+    otherwise."""
     current_test_index = 0
     signatures = b''
     all_cpu_time = list()
     all_max_ram = list()
+    rlimits = spawn_limits(ram_limit, cpu_time_limit)
 
     while current_test_index < number_of_tests:
         current_message = messages[
             current_test_index*32: (current_test_index+1)*32]
-        current_message_as_text = binascii.hexlify(current_message).decode()
-        cmd = (f'/execute.py {executable} {current_message_as_text} '
-               f'{current_test_index}')
         try:
-            ps = subprocess.run(cmd, check=True, stdout=subprocess.PIPE,
-                                shell=True)
-            signature_as_text, cpu_time, ram = json.loads(ps.stdout)
-            current_signature = bytes.fromhex(signature_as_text)
+            result = runner.run(
+                [PEAK_RSS, executable], input=current_message,
+                rlimits=rlimits, capture_stderr=True,
+                timeout=SPAWN_TIMEOUT_FACTOR * (cpu_time_limit + 1),
+                with_cgroup=True)
+            if result.returncode in (-signal.SIGXCPU, -signal.SIGKILL):
+                logger.warning("Execution reaches CPU time limit "
+                               f"(return code {result.returncode})")
+                exit_after_notifying_launcher(
+                    ERR_CODE_EXECUTION_EXCEED_TIME_LIMIT,
+                    post_data={"cpu_time": float(cpu_time_limit)})
+            if result.returncode != 0:
+                raise Exception(f"{executable} returned {result.returncode}")
+            current_signature = result.stdout
+            cpu_time = result.cpu_time
+            if result.cgroup and result.cgroup['max_ram'] is not None:
+                ram = result.cgroup['max_ram']
+            else:
+                ram = int(result.stderr.split()[-1])
             if len(current_signature) != 64:
                 raise Exception("Signature is too short")
             signatures += current_signature
 
             # check whether we reach the limitation
-            if cpu_time > cpu_time_limit:
-                logger.warning("Execution reaches CPU time limit: "
-                               f"{cpu_time:.2f}s was used!")
-                post_data = {"cpu_time": cpu_time}
-                exit_after_notifying_launcher(
-                    ERR_CODE_EXECUTION_EXCEED_TIME_LIMIT,
-                    post_data=post_data)
-            if ram > ram_limit:
-                logger.warning("Execution reaches memory limit: "
-                               f"{ram/1024:.2f}MB")
-                post_data = {"ram": ram/1024.}
-                exit_after_notifying_launcher(
-                    ERR_CODE_EXECUTION_EXCEED_RAM_LIMIT,
-                    post_data=post_data)
+            check_limits(cpu_time, ram, cpu_time_limit, ram_limit)
 
             all_cpu_time.append(cpu_time)
             all_max_ram.append(ram)
+            if on_signature is not None:
+                on_signature(current_test_index, current_signature)
             current_test_index += 1
+        except uploader.Aborted:
+            raise
         except Exception as e:
-            logger.error(f"Execution failed: {cmd}")
+            logger.error(f"Execution failed: {executable} "
+                         f"(test vector {current_test_index})")
             traceback.print_exc()
             logger.error("===========")
             logger.error(e)
             exit_after_notifying_launcher(ERR_CODE_EXECUTION_FAILED)
 
     logger.info("The execution succeeded and we retrieved the signatures.")
-    all_cpu_time.sort()
-    all_max_ram.sort()
-    average_cpu_time = mean(all_cpu_time[5:-5])
-    average_max_ram = mean(all_max_ram[5:-5])
 
-    return (signatures, average_cpu_time, average_max_ram)
+    return (signatures, all_cpu_time, all_max_ram, None)
+
+
+def performance_measure_streaming(harness,
+                                  messages,
+                                  number_of_tests,
+                                  ram_limit,
+                                  cpu_time_limit,
+                                  on_signature=None,
+                                  number_of_workers=1):
+    """Same as performance_measure, but all the messages are signed by a
+    single harness process (see harness.c), or by number_of_workers harness
+    processes pinned to distinct cores."""
+    def on_result(index, signature, cpu_time, ram):
+        check_limits(cpu_time, ram, cpu_time_limit, ram_limit)
+        if on_signature is not None:
+            on_signature(index, signature)
+
+    per_core_statistics = None
+    try:
+        if number_of_workers > 1:
+            signatures, all_cpu_time, all_max_ram, per_core_statistics = \
+                parallel.stream(harness, messages, number_of_tests,
+                                cpu_time_limit,
+                                number_of_workers=number_of_workers,
+                                on_result=on_result)
+        else:
+            signatures, all_cpu_time, all_max_ram = streaming.stream(
+                harness, messages, number_of_tests, cpu_time_limit,
+                on_result=on_result)
+    except streaming.HarnessTimeLimitExceeded as e:
+        logger.warning(f"Execution reaches CPU time limit: {e}")
+        post_data = {"cpu_time": float(cpu_time_limit)}
+        exit_after_notifying_launcher(
+            ERR_CODE_EXECUTION_EXCEED_TIME_LIMIT,
+            post_data=post_data)
+    except uploader.Aborted:
+        raise
+    except Exception as e:
+        logger.error(f"Execution failed: {harness}")
+        traceback.print_exc()
+        logger.error("===========")
+        logger.error(e)
+        exit_after_notifying_launcher(ERR_CODE_EXECUTION_FAILED)
+
+    logger.info("The execution succeeded and we retrieved the signatures.")
+
+    if per_core_statistics is not None:
+        # Timings are only comparable with serial runs if the cores behave
+        # the same, which the spread of the per-core medians tells us
+        medians = [stats['cpu_time_median'] for stats in per_core_statistics]
+        for stats in per_core_statistics:
+            logger.info(f"Core {stats['core']}: "
+                        f"{stats['number_of_tests']} tests, "
+                        f"median {stats['cpu_time_median']:.6f}s, "
+                        f"min {stats['cpu_time_min']:.6f}s, "
+                        f"max {stats['cpu_time_max']:.6f}s")
+        if min(medians) > 0:
+            logger.info("Spread of the per-core medians: "
+                        f"{max(medians) / min(medians):.3f}")
+
+    return (signatures, all_cpu_time, all_max_ram, per_core_statistics)
 
 
 def main():
     logger.info("Start compilation and test")
 
+    # the launcher may restrict the slot we run in to some cores, the
+    # compiler and the submission inherit the affinity
+    cpu_set = os.environ.get('CPU_SET')
+    if cpu_set:
+        cores = parallel.parse_cpu_set(cpu_set)
+        logger.info(f"Running on the cores {sorted(cores)}")
+        os.sched_setaffinity(0, cores)
+
     # Compile
     upload_folder = os.environ['UPLOAD_FOLDER']
     basename = os.environ['FILE_BASENAME']
     source_file = basename + '.c'
     object_file = basename + '.o'
     path_to_source = os.path.join(upload_folder, source_file)
-    path_to_object = os.path.join('/tmp', object_file)
-
-    # check forbidden string and pattern
-    logger.info("***** Preprocess the code *****")
-    preprocess(path_to_source)
-
-    logger.info("***** Start to compile *****")
-    compile(basename, path_to_source, path_to_object)
+    # pool workers give each program its own working directory
+    work_dir = os.environ.get('WORK_DIR', '/tmp')
+    path_to_object = os.path.join(work_dir, object_file)
+
+    # the submission is linked either against the historical main (one
+    # process per message) or against the streaming harness (one process
+    # for all the messages)
+    execution_mode = os.environ.get('EXECUTION_MODE', 'streaming')
+    if execution_mode in ('streaming', 'parallel'):
+        path_to_executable = os.path.join(work_dir, 'harness')
+        main_obj = '/harness.o'
+        number_of_workers = 1
+        if execution_mode == 'parallel':
+            number_of_workers = int(os.environ.get('EXECUTION_WORKERS', 0))
+            if number_of_workers <= 0:
+                number_of_workers = parallel.default_number_of_workers()
+            logger.info(f"Running {number_of_workers} workers in parallel")
+        measure = functools.partial(performance_measure_streaming,
+                                    number_of_workers=number_of_workers)
+    else:
+        path_to_executable = os.path.join(work_dir, 'main')
+        main_obj = '/main.o'
+        measure = performance_measure
+    executable_name = os.path.basename(path_to_executable)
+    benchmark_settings = benchmark.settings_from_environ()
+
+    # the launcher asks for a calibration of the node from time to time, it
+    # is done before the submission can disturb the node (or forge it)
+    if os.environ.get('CALIBRATE') == 'True':
+        logger.info("***** Calibrate the node *****")
+        calibrate.calibrate_and_notify_launcher(
+            os.environ['URL_FOR_CALIBRATION_RESULT'],
+            int(os.environ['CALIBRATION_NUMBER_OF_MESSAGES']),
+            int(os.environ['CHALLENGE_MAX_TIME_EXECUTION_IN_SECS']),
+            benchmark_settings)
+
+    # an identical source already compiled with the same toolchain does not
+    # need to be preprocessed and compiled again
+    compilation_cache = get_compilation_cache()
+    cache_key = None
+    cache_hit = False
+    compiled_files = dict()
+    if compilation_cache is not None:
+        fingerprint = toolchain_fingerprint(
+            COMPILE_FLAGS, LINK_FLAGS, ['/main.o', '/harness.o'])
+        cache_key = compilation_cache.key(path_to_source, fingerprint)
+        cache_hit = compilation_cache.get(cache_key, cache.OBJECT,
+                                          path_to_object)
+
+    if cache_hit:
+        logger.info(f"***** Compilation cache hit ({cache_key}) *****")
+    else:
+        # check forbidden string and pattern
+        logger.info("***** Preprocess the code *****")
+        preprocess(path_to_source)
+
+        logger.info("***** Start to compile *****")
+        compile(basename, path_to_source, path_to_object)
+        compiled_files[cache.OBJECT] = path_to_object
 
     # check the binary size
     max_bin_size = 2**20 * int(os.environ['CHALLENGE_MAX_BINARY_SIZE_IN_MB'])
@@ -224,36 +487,81 @@ def main():
         exit_after_notifying_launcher(ERR_CODE_BIN_TOO_LARGE)
 
     # link
-    logger.info("***** Start to link *****")
-    path_to_executable = '/tmp/main'
-    link(basename, path_to_object, path_to_executable)
-
-    # fetch the plaintexts to encrypt
-    logger.info("***** Start to fetch messages to sign *****")
-    messages = try_fetch_messages()
+    if cache_hit and compilation_cache.get(cache_key, executable_name,
+                                           path_to_executable):
+        logger.info("***** Linked executable found in cache *****")
+    else:
+        logger.info("***** Start to link *****")
+        link(basename, path_to_object, path_to_executable,
+             main_obj=main_obj)
+        compiled_files[executable_name] = path_to_executable
+
+    # the cache is read-only here, the files are staged before the
+    # submission runs and could tamper with them
+    if compilation_cache is not None and compiled_files:
+        stage_for_compilation_cache(fingerprint, compiled_files)
+    notify_execution_start()
+
+    # the messages are generated from the seed of the program, they are
+    # sliced as needed by the measure
+    messages = test_messages()
 
     # performance measure
     logger.info("***** Sign messages, and measure performances *****")
-    number_of_tests = int(os.environ['CHALLENGE_NUMBER_OF_TEST_VECTORS']) + \
-        int(os.environ['CHALLENGE_NUMBER_OF_TEST_EDGE_CASES'])
-    logger.info("Number of tests: {number_of_tests}")
+    number_of_tests = messages.number_of_messages
+    logger.info(f"Number of tests: {number_of_tests}")
     cpu_time_limit = int(os.environ['CHALLENGE_MAX_TIME_EXECUTION_IN_SECS'])
     ram_limit = 2**10 * int(os.environ['CHALLENGE_MAX_MEM_EXECUTION_IN_MB'])
-    signatures, average_cpu_time, average_max_ram = performance_measure(
-        path_to_executable, messages, number_of_tests,
-        ram_limit, cpu_time_limit
-    )
+    # the signatures are sent to the launcher by batches while they are
+    # computed, the launcher stops us on the first wrong one
+    signature_uploader = get_signature_uploader()
+    on_signature = None
+    if signature_uploader is not None:
+        on_signature = signature_uploader.add
+    try:
+        signatures, all_cpu_time, all_max_ram, per_core_statistics = \
+            measure(path_to_executable, messages, number_of_tests,
+                    ram_limit, cpu_time_limit, on_signature=on_signature)
+        if signature_uploader is not None:
+            signature_uploader.close()
+    except uploader.Aborted:
+        logger.info("The launcher found a wrong signature and stopped us")
+        os._exit(0)
+
+    # the first messages are signed again to get more measures, the
+    # signatures are discarded
+    cpu_time_runs, ram_runs = [all_cpu_time], [all_max_ram]
+    repetitions = min(benchmark_settings.repetitions, number_of_tests)
+    if repetitions > 0:
+        logger.info(f"***** Measure {repetitions} more runs *****")
+        _, cpu_times, max_rams, _ = measure(
+            path_to_executable, messages[:32*repetitions], repetitions,
+            ram_limit, cpu_time_limit)
+        cpu_time_runs.append(cpu_times)
+        ram_runs.append(max_rams)
+    benchmark_summary = benchmark.summary(cpu_time_runs, ram_runs,
+                                          benchmark_settings)
+    # for the operators, the launcher knows which slot we ran in
+    benchmark_summary['node'] = calibrate.node_name()
+    for name in ('cpu_time', 'ram'):
+        statistics = benchmark_summary[name]
+        logger.info(f"{name}: median {statistics['median']:.6g}, "
+                    f"MAD {statistics['mad']:.6g}, "
+                    f"trimmed mean {statistics['trimmed_mean']:.6g}, "
+                    f"{statistics['number_of_outliers']} outliers out of "
+                    f"{statistics['number_of_measures']} measures")
+    average_cpu_time = benchmark.estimate(benchmark_summary['cpu_time'],
+                                          benchmark_settings.estimator)
+    average_max_ram = benchmark.estimate(benchmark_summary['ram'],
+                                         benchmark_settings.estimator)
+
     size_factor = os.path.getsize(path_to_object) / max_bin_size
     ram_factor = average_max_ram * 1.0 / ram_limit
     time_factor = average_cpu_time * 1.0 / cpu_time_limit
 
     # If we reach this line, everything went fine
-    post_data = {
-        "signatures": binascii.hexlify(signatures).decode(),
-        "size_factor": size_factor,
-        "ram_factor": ram_factor,
-        "time_factor": time_factor
-    }
+    post_data = result_protocol.encode(size_factor, ram_factor, time_factor,
+                                       signatures, benchmark_summary)
     exit_after_notifying_launcher(CODE_SUCCESS, post_data=post_data)
 
 
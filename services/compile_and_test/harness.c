@@ -0,0 +1,105 @@
+/*
+  Streaming harness linked against the submitted object file.
+
+  Instead of running the submission once per test vector, the harness is
+  started once and signs every message received on stdin:
+
+    request frame:  32 bytes, the hash to sign
+    response frame: 64 bytes signature
+                    8 bytes  CPU time spent in ECDSA_256_sign (ns, little endian)
+                    8 bytes  peak RSS of the process so far (KB, little endian)
+
+  The harness stops on EOF. If a CPU time limit (in seconds) is given as
+  first argument, a profiling timer kills the process (SIGPROF) whenever a
+  single signature takes longer than this limit.
+
+  The peak RSS is read from VmHWM in /proc/self/status: ru_maxrss also
+  accounts for the RSS of the parent process at the time of the exec.
+
+  Both figures are computed in the process of the submission, which can
+  override clock_gettime or fopen: streaming.py measures them from outside
+  and only checks the CPU times of the frames against its measures.
+*/
+
+#include <stdio.h>
+#include <stdlib.h>
+#include <stdint.h>
+#include <string.h>
+#include <time.h>
+#include <sys/resource.h>
+#include <sys/time.h>
+
+#define MESSAGE_SIZE 32
+#define SIGNATURE_SIZE 64
+#define RESULT_FRAME_SIZE (SIGNATURE_SIZE + 8 + 8)
+
+void ECDSA_256_sign(unsigned char sig[64], const unsigned char hash[32]);
+
+static void put_u64_le(unsigned char *out, uint64_t v) {
+  for (int i = 0; i < 8; i++) {
+    out[i] = (unsigned char)(v >> (8 * i));
+  }
+}
+
+static uint64_t cpu_time_ns(void) {
+  struct timespec ts;
+  clock_gettime(CLOCK_PROCESS_CPUTIME_ID, &ts);
+  return (uint64_t)ts.tv_sec * 1000000000ULL + (uint64_t)ts.tv_nsec;
+}
+
+static uint64_t peak_rss_kb(void) {
+  char line[128];
+  unsigned long long vm_hwm = 0;
+  int found = 0;
+  FILE *status = fopen("/proc/self/status", "r");
+  if (status != NULL) {
+    while (!found && fgets(line, sizeof(line), status) != NULL) {
+      found = sscanf(line, "VmHWM: %llu kB", &vm_hwm) == 1;
+    }
+    fclose(status);
+  }
+  if (!found) {
+    struct rusage usage;
+    getrusage(RUSAGE_SELF, &usage);
+    vm_hwm = (unsigned long long)usage.ru_maxrss;
+  }
+  return (uint64_t)vm_hwm;
+}
+
+static void arm_cpu_timer(long seconds) {
+  struct itimerval timer;
+  memset(&timer, 0, sizeof(timer));
+  timer.it_value.tv_sec = seconds;
+  setitimer(ITIMER_PROF, &timer, NULL);
+}
+
+int main(int argc, char *argv[]) {
+  unsigned char message[MESSAGE_SIZE];
+  unsigned char frame[RESULT_FRAME_SIZE];
+  long cpu_time_limit = 0;
+
+  if (argc > 1) {
+    cpu_time_limit = strtol(argv[1], NULL, 10);
+  }
+
+  while (fread(message, 1, MESSAGE_SIZE, stdin) == MESSAGE_SIZE) {
+    memset(frame, 0, sizeof(frame));
+    if (cpu_time_limit > 0) {
+      arm_cpu_timer(cpu_time_limit);
+    }
+    uint64_t start = cpu_time_ns();
+    ECDSA_256_sign(frame, message);
+    uint64_t end = cpu_time_ns();
+    if (cpu_time_limit > 0) {
+      arm_cpu_timer(0);
+    }
+
+    put_u64_le(frame + SIGNATURE_SIZE, end - start);
+    put_u64_le(frame + SIGNATURE_SIZE + 8, peak_rss_kb());
+    if (fwrite(frame, 1, RESULT_FRAME_SIZE, stdout) != RESULT_FRAME_SIZE) {
+      return 1;
+    }
+    fflush(stdout);
+  }
+  return 0;
+}
@@ -0,0 +1,148 @@
+"""Sign the test vectors with several harness processes, each one pinned to
+its own core. The messages are split into contiguous shards (one per
+worker) and the signatures are merged back in the original order."""
+
+import math
+import os
+import threading
+from statistics import mean, median
+
+import streaming
+
+
+class _Aborted(Exception):
+    pass
+
+
+def cpu_quota():
+    """Number of CPUs allowed by the CFS quota of the container (cgroup v2
+    or v1), or None if there is no quota."""
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()
+        if quota == 'max':
+            return None
+        return int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        with open('/sys/fs/cgroup/cpu/cpu.cfs_quota_us') as f:
+            quota = int(f.read())
+        with open('/sys/fs/cgroup/cpu/cpu.cfs_period_us') as f:
+            period = int(f.read())
+        if quota <= 0:
+            return None
+        return quota / period
+    except (OSError, ValueError):
+        return None
+
+
+def parse_cpu_set(cpu_set):
+    """Cores of a cpuset list such as '0-3,6'."""
+    cores = set()
+    for part in cpu_set.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        first, _, last = part.partition('-')
+        cores.update(range(int(first), int(last or first) + 1))
+    return cores
+
+
+def available_cores():
+    return sorted(os.sched_getaffinity(0))
+
+
+def default_number_of_workers():
+    """One worker per core we are allowed to use, bounded by the quota."""
+    cores = available_cores()
+    quota = cpu_quota()
+    if quota is None:
+        return len(cores)
+    return max(1, min(len(cores), math.floor(quota)))
+
+
+def shards(number_of_tests, number_of_workers):
+    """Split range(number_of_tests) into contiguous (start, stop) shards."""
+    number_of_workers = max(1, min(number_of_workers, number_of_tests))
+    size, extra = divmod(number_of_tests, number_of_workers)
+    start = 0
+    for i in range(number_of_workers):
+        stop = start + size + (1 if i < extra else 0)
+        yield (start, stop)
+        start = stop
+
+
+def core_statistics(core, cpu_times):
+    return {
+        'core': core,
+        'number_of_tests': len(cpu_times),
+        'cpu_time_total': sum(cpu_times),
+        'cpu_time_mean': mean(cpu_times),
+        'cpu_time_median': median(cpu_times),
+        'cpu_time_min': min(cpu_times),
+        'cpu_time_max': max(cpu_times),
+    }
+
+
+def stream(harness, messages, number_of_tests, cpu_time_limit,
+           number_of_workers=None, on_result=None):
+    """Parallel version of streaming.stream.
+
+    Returns (signatures, cpu_times, max_rams, per_core_statistics). The
+    first error raised by a worker (or by on_result) stops all the other
+    workers and is raised again here."""
+    if number_of_workers is None:
+        number_of_workers = default_number_of_workers()
+    cores = available_cores()
+    all_shards = list(shards(number_of_tests, number_of_workers))
+    results = [None] * len(all_shards)
+    errors = list()
+    failed = threading.Event()
+    lock = threading.Lock()
+
+    def worker(i, start, stop, core):
+        def on_shard_result(index, signature, cpu_time, ram):
+            if failed.is_set():
+                raise _Aborted()
+            if on_result is not None:
+                with lock:
+                    on_result(start + index, signature, cpu_time, ram)
+
+        try:
+            results[i] = streaming.stream(
+                harness, messages[start * streaming.MESSAGE_SIZE:
+                                  stop * streaming.MESSAGE_SIZE],
+                stop - start, cpu_time_limit, on_result=on_shard_result,
+                core=core)
+        except _Aborted:
+            pass
+        except Exception as e:
+            with lock:
+                errors.append(e)
+            failed.set()
+
+    threads = list()
+    for i, (start, stop) in enumerate(all_shards):
+        core = cores[i % len(cores)]
+        thread = threading.Thread(target=worker, args=(i, start, stop, core))
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+
+    if errors:
+        # A time limit is more informative than the failures it induced
+        for e in errors:
+            if isinstance(e, streaming.HarnessTimeLimitExceeded):
+                raise e
+        raise errors[0]
+
+    signatures = b''.join(result[0] for result in results)
+    all_cpu_time = [t for result in results for t in result[1]]
+    all_max_ram = [r for result in results for r in result[2]]
+    per_core_statistics = [
+        core_statistics(cores[i % len(cores)], result[1])
+        for i, result in enumerate(results)]
+
+    return (signatures, all_cpu_time, all_max_ram, per_core_statistics)
@@ -0,0 +1,63 @@
+/*
+  Run a program and report its peak RSS, for the executions with one
+  process per message (see performance_measure in compile_and_test.py).
+
+    peak_rss PROGRAM [ARGS...]
+
+  The kernel accounts the RSS of the process a program is exec'ed from in
+  its ru_maxrss: exec'ed from the Python harness, a program looks at least
+  as large as the harness. This small process forks and execs the program,
+  so that only its own few pages come along, and writes the ru_maxrss of
+  the program (KB) on stderr once it is done. The stderr of the program is
+  discarded, so that it cannot forge the report.
+
+  The program inherits stdin, stdout and the resource limits. The exit
+  status is the one of the program, a program killed by a signal kills
+  this process with the same signal.
+*/
+
+#include <fcntl.h>
+#include <signal.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <unistd.h>
+#include <sys/prctl.h>
+#include <sys/resource.h>
+#include <sys/types.h>
+#include <sys/wait.h>
+
+int main(int argc, char *argv[]) {
+  if (argc < 2) {
+    fprintf(stderr, "usage: %s PROGRAM [ARGS...]\n", argv[0]);
+    return 127;
+  }
+
+  pid_t pid = fork();
+  if (pid < 0) {
+    return 127;
+  }
+  if (pid == 0) {
+    /* The program does not survive us if we are killed (time out) */
+    prctl(PR_SET_PDEATHSIG, SIGKILL);
+    int devnull = open("/dev/null", O_WRONLY);
+    if (devnull < 0 || dup2(devnull, STDERR_FILENO) < 0) {
+      _exit(127);
+    }
+    execv(argv[1], argv + 1);
+    _exit(127);
+  }
+
+  int status;
+  struct rusage usage;
+  if (wait4(pid, &status, 0, &usage) != pid) {
+    return 127;
+  }
+  fprintf(stderr, "%ld\n", usage.ru_maxrss);
+  fflush(stderr);
+
+  if (WIFSIGNALED(status)) {
+    signal(WTERMSIG(status), SIG_DFL);
+    kill(getpid(), WTERMSIG(status));
+  }
+  return WIFEXITED(status) ? WEXITSTATUS(status) : 127;
+}
@@ -0,0 +1,199 @@
+/*
+  Reference ECDSA P-256 signer used to calibrate the sandbox nodes.
+
+  It is linked against the streaming harness exactly like a submission and
+  signs with a fixed key, using GMP with straightforward Jacobian
+  double-and-add: its running time only depends on the speed of the node,
+  which makes it a stable yardstick for the time factors (see
+  calibrate.py). The nonce is derived from the hash, this is a workload,
+  not a secure implementation.
+*/
+
+#include <gmp.h>
+#include <string.h>
+
+static const char *P_HEX =
+  "ffffffff00000001000000000000000000000000ffffffffffffffffffffffff";
+static const char *N_HEX =
+  "ffffffff00000000ffffffffffffffffbce6faada7179e84f3b9cac2fc632551";
+static const char *GX_HEX =
+  "6b17d1f2e12c4247f8bce6e563a440f277037d812deb33a0f4a13945d898c296";
+static const char *GY_HEX =
+  "4fe342e2fe1a7f9b8ee7eb4a7c0f9e162bce33576b315ececbb6406837bf51f5";
+static const char *D_HEX =
+  "c9afa9d845ba75166b5c215767b1d6934e50c3db36e89b127b8a622b120f6721";
+
+static int initialized = 0;
+static mpz_t p, n, gx, gy, d;
+
+struct point {
+  mpz_t x, y, z;
+};
+
+static void point_init(struct point *r) {
+  mpz_init(r->x);
+  mpz_init(r->y);
+  mpz_init(r->z);
+}
+
+static void point_clear(struct point *r) {
+  mpz_clear(r->x);
+  mpz_clear(r->y);
+  mpz_clear(r->z);
+}
+
+/* r = 2 * r, a = -3 */
+static void point_double(struct point *r) {
+  mpz_t delta, gamma, beta, alpha, t;
+  if (mpz_sgn(r->z) == 0 || mpz_sgn(r->y) == 0) {
+    mpz_set_ui(r->z, 0);
+    return;
+  }
+  mpz_inits(delta, gamma, beta, alpha, t, NULL);
+  mpz_mul(delta, r->z, r->z);
+  mpz_mod(delta, delta, p);
+  mpz_mul(gamma, r->y, r->y);
+  mpz_mod(gamma, gamma, p);
+  mpz_mul(beta, r->x, gamma);
+  mpz_mod(beta, beta, p);
+  mpz_sub(alpha, r->x, delta);
+  mpz_add(t, r->x, delta);
+  mpz_mul(alpha, alpha, t);
+  mpz_mul_ui(alpha, alpha, 3);
+  mpz_mod(alpha, alpha, p);
+  /* z3 = (y + z)^2 - gamma - delta */
+  mpz_add(t, r->y, r->z);
+  mpz_mul(t, t, t);
+  mpz_sub(t, t, gamma);
+  mpz_sub(t, t, delta);
+  mpz_mod(r->z, t, p);
+  /* x3 = alpha^2 - 8 beta */
+  mpz_mul(t, alpha, alpha);
+  mpz_submul_ui(t, beta, 8);
+  mpz_mod(r->x, t, p);
+  /* y3 = alpha (4 beta - x3) - 8 gamma^2 */
+  mpz_mul_ui(beta, beta, 4);
+  mpz_sub(beta, beta, r->x);
+  mpz_mul(t, alpha, beta);
+  mpz_mul(gamma, gamma, gamma);
+  mpz_submul_ui(t, gamma, 8);
+  mpz_mod(r->y, t, p);
+  mpz_clears(delta, gamma, beta, alpha, t, NULL);
+}
+
+/* r = r + (qx, qy), the second point being affine */
+static void point_add_affine(struct point *r, const mpz_t qx, const mpz_t qy) {
+  mpz_t zz, u2, s2, h, hh, hhh, rr, v;
+  if (mpz_sgn(r->z) == 0) {
+    mpz_set(r->x, qx);
+    mpz_set(r->y, qy);
+    mpz_set_ui(r->z, 1);
+    return;
+  }
+  mpz_inits(zz, u2, s2, h, hh, hhh, rr, v, NULL);
+  mpz_mul(zz, r->z, r->z);
+  mpz_mod(zz, zz, p);
+  mpz_mul(u2, qx, zz);
+  mpz_mod(u2, u2, p);
+  mpz_mul(s2, qy, zz);
+  mpz_mul(s2, s2, r->z);
+  mpz_mod(s2, s2, p);
+  mpz_sub(h, u2, r->x);
+  mpz_mod(h, h, p);
+  mpz_sub(rr, s2, r->y);
+  mpz_mod(rr, rr, p);
+  if (mpz_sgn(h) == 0) {
+    if (mpz_sgn(rr) == 0) {
+      point_double(r);
+    } else {
+      mpz_set_ui(r->z, 0);
+    }
+    mpz_clears(zz, u2, s2, h, hh, hhh, rr, v, NULL);
+    return;
+  }
+  mpz_mul(hh, h, h);
+  mpz_mod(hh, hh, p);
+  mpz_mul(hhh, h, hh);
+  mpz_mod(hhh, hhh, p);
+  mpz_mul(v, r->x, hh);
+  mpz_mod(v, v, p);
+  /* x3 = rr^2 - hhh - 2 v */
+  mpz_mul(u2, rr, rr);
+  mpz_sub(u2, u2, hhh);
+  mpz_submul_ui(u2, v, 2);
+  mpz_mod(u2, u2, p);
+  /* y3 = rr (v - x3) - y1 hhh */
+  mpz_sub(v, v, u2);
+  mpz_mul(v, rr, v);
+  mpz_submul(v, r->y, hhh);
+  mpz_mod(r->y, v, p);
+  mpz_set(r->x, u2);
+  /* z3 = z1 h */
+  mpz_mul(r->z, r->z, h);
+  mpz_mod(r->z, r->z, p);
+  mpz_clears(zz, u2, s2, h, hh, hhh, rr, v, NULL);
+}
+
+static void initialize(void) {
+  mpz_init_set_str(p, P_HEX, 16);
+  mpz_init_set_str(n, N_HEX, 16);
+  mpz_init_set_str(gx, GX_HEX, 16);
+  mpz_init_set_str(gy, GY_HEX, 16);
+  mpz_init_set_str(d, D_HEX, 16);
+  initialized = 1;
+}
+
+static void export_32(unsigned char out[32], const mpz_t v) {
+  size_t count = 0;
+  unsigned char buffer[32];
+  memset(out, 0, 32);
+  mpz_export(buffer, &count, 1, 1, 1, 0, v);
+  memcpy(out + 32 - count, buffer, count);
+}
+
+void ECDSA_256_sign(unsigned char sig[64], const unsigned char hash[32]) {
+  mpz_t e, k, r, s, zi;
+  struct point kg;
+
+  if (!initialized) {
+    initialize();
+  }
+  mpz_inits(e, k, r, s, zi, NULL);
+  point_init(&kg);
+
+  mpz_import(e, 32, 1, 1, 1, 0, hash);
+  /* k = e + d mod n, never 0 for this key */
+  mpz_add(k, e, d);
+  mpz_mod(k, k, n);
+  if (mpz_sgn(k) == 0) {
+    mpz_set_ui(k, 1);
+  }
+
+  mpz_set_ui(kg.z, 0);
+  for (long i = (long)mpz_sizeinbase(k, 2) - 1; i >= 0; i--) {
+    point_double(&kg);
+    if (mpz_tstbit(k, i)) {
+      point_add_affine(&kg, gx, gy);
+    }
+  }
+
+  /* r = x / z^2 mod n */
+  mpz_invert(zi, kg.z, p);
+  mpz_mul(zi, zi, zi);
+  mpz_mul(r, kg.x, zi);
+  mpz_mod(r, r, p);
+  mpz_mod(r, r, n);
+
+  /* s = (e + r d) / k mod n */
+  mpz_mul(s, r, d);
+  mpz_add(s, s, e);
+  mpz_invert(k, k, n);
+  mpz_mul(s, s, k);
+  mpz_mod(s, s, n);
+
+  export_32(sig, r);
+  export_32(sig + 32, s);
+
+  point_clear(&kg);
+  mpz_clears(e, k, r, s, zi, NULL);
+}
@@ -0,0 +1,70 @@
+"""Binary format of the result posted to the launcher when a program was
+compiled and tested successfully (the failures are still reported in JSON).
+
+The body (application/octet-stream) is a fixed size little-endian header
+followed by the raw 64-byte signatures, in the order of the messages, and
+by the summary of the benchmark (see benchmark.py) in UTF-8 encoded JSON:
+
+    magic                 4 bytes  b'WBXR'
+    version               uint16   VERSION
+    reserved              uint16   0
+    size_factor           double
+    ram_factor            double
+    time_factor           double
+    number_of_signatures  uint32
+    summary_length        uint32   length of the JSON summary in bytes
+
+The launcher copies this file from services/compile_and_test (see the
+Makefile), any change must bump VERSION."""
+
+import json
+import struct
+from collections import namedtuple
+
+CONTENT_TYPE = 'application/octet-stream'
+MAGIC = b'WBXR'
+VERSION = 2
+HEADER = struct.Struct('<4sHHdddII')
+SIGNATURE_SIZE = 64
+
+Result = namedtuple('Result', ['size_factor', 'ram_factor', 'time_factor',
+                               'signatures', 'benchmark_summary'])
+
+
+def encode(size_factor, ram_factor, time_factor, signatures,
+           benchmark_summary):
+    summary = json.dumps(benchmark_summary).encode('utf8')
+    header = HEADER.pack(MAGIC, VERSION, 0, size_factor, ram_factor,
+                         time_factor, len(signatures) // SIGNATURE_SIZE,
+                         len(summary))
+    return header + signatures + summary
+
+
+def decode(body):
+    """Result read from body (bytes-like), its signatures being a
+    memoryview of body. Raises ValueError if body is not a result of this
+    version."""
+    if len(body) < HEADER.size:
+        raise ValueError("The result is too short")
+    magic, version, _, size_factor, ram_factor, time_factor, \
+        number_of_signatures, summary_length = HEADER.unpack_from(body)
+    if magic != MAGIC:
+        raise ValueError("The result does not start with the magic bytes")
+    if version != VERSION:
+        raise ValueError(f"Unsupported version {version} of the result")
+    signatures_length = SIGNATURE_SIZE * number_of_signatures
+    if len(body) != HEADER.size + signatures_length + summary_length:
+        raise ValueError(f"The result announces {number_of_signatures} "
+                         f"signatures and a summary of {summary_length} "
+                         f"bytes but carries {len(body)} bytes")
+    signatures = memoryview(body)[HEADER.size:HEADER.size + signatures_length]
+    try:
+        benchmark_summary = json.loads(
+            bytes(body[HEADER.size + signatures_length:]).decode('utf8'))
+    except ValueError:
+        raise ValueError("The summary of the benchmark is not valid JSON")
+    return Result(size_factor=size_factor,
+                  ram_factor=ram_factor,
+                  time_factor=time_factor,
+                  signatures=signatures,
+                  benchmark_summary=benchmark_summary)
@@ -0,0 +1,265 @@
+"""Run a program directly (no intermediate shell) and collect the resource
+usage of this single child with wait4.
+
+Programs without resource limits are started with posix_spawn. When resource
+limits are requested, we fork, call setrlimit in the child (this replaces the
+'ulimit' shell prefix) and exec the program."""
+
+import os
+import resource
+import selectors
+import signal
+import time
+from collections import namedtuple
+
+CGROUP_ROOT = '/sys/fs/cgroup'
+
+RunResult = namedtuple('RunResult', ['returncode', 'stdout', 'stderr',
+                                     'cpu_time', 'max_ram', 'cgroup'])
+
+
+class Child:
+
+    def __init__(self, pid, stdin, stdout, stderr):
+        self.pid = pid
+        self.stdin = stdin
+        self.stdout = stdout
+        self.stderr = stderr
+        self.returncode = None
+        self.rusage = None
+
+    def wait(self):
+        """Reap the child, returns (returncode, rusage). The return code is
+        negative when the child was killed by a signal."""
+        if self.returncode is None:
+            _, status, self.rusage = os.wait4(self.pid, 0)
+            if os.WIFSIGNALED(status):
+                self.returncode = -os.WTERMSIG(status)
+            else:
+                self.returncode = os.WEXITSTATUS(status)
+        return (self.returncode, self.rusage)
+
+    def poll(self):
+        if self.returncode is None:
+            pid, status, rusage = os.wait4(self.pid, os.WNOHANG)
+            if pid == 0:
+                return None
+            self.rusage = rusage
+            if os.WIFSIGNALED(status):
+                self.returncode = -os.WTERMSIG(status)
+            else:
+                self.returncode = os.WEXITSTATUS(status)
+        return self.returncode
+
+    def kill(self):
+        if self.returncode is None:
+            try:
+                os.kill(self.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+
+def _exec_with_rlimits(argv, env, rlimits, dup2s):
+    # We are in the forked child: anything going wrong ends with exit 127
+    try:
+        for fd, newfd in dup2s:
+            os.dup2(fd, newfd)
+        for sig in (signal.SIGPIPE, signal.SIGXFSZ):
+            signal.signal(sig, signal.SIG_DFL)
+        for res, limit in rlimits.items():
+            resource.setrlimit(res, (limit, limit))
+        os.execvpe(argv[0], argv, env)
+    finally:
+        os._exit(127)
+
+
+def spawn(argv, rlimits=None, stdin=True, stdout=True, stderr=False,
+          env=None):
+    """Start argv without a shell. stdin/stdout/stderr set to True are
+    connected to pipes available as attributes of the returned Child.
+    rlimits maps resource.RLIMIT_* constants to a limit (soft == hard)."""
+    if env is None:
+        env = os.environ
+    parent_ends = dict()
+    child_ends = list()
+    for fd, wanted in ((0, stdin), (1, stdout), (2, stderr)):
+        if not wanted:
+            continue
+        r, w = os.pipe()
+        if fd == 0:
+            parent_ends[fd], child_end = w, r
+        else:
+            parent_ends[fd], child_end = r, w
+        child_ends.append((child_end, fd))
+
+    try:
+        if rlimits:
+            pid = os.fork()
+            if pid == 0:
+                _exec_with_rlimits(argv, env, rlimits, child_ends)
+        else:
+            file_actions = [(os.POSIX_SPAWN_DUP2, child_end, fd)
+                            for child_end, fd in child_ends]
+            pid = os.posix_spawnp(
+                argv[0], argv, env, file_actions=file_actions,
+                setsigdef=(signal.SIGPIPE, signal.SIGXFSZ))
+    except Exception:
+        for fd in parent_ends.values():
+            os.close(fd)
+        raise
+    finally:
+        for child_end, _ in child_ends:
+            os.close(child_end)
+
+    return Child(
+        pid,
+        os.fdopen(parent_ends[0], 'wb') if 0 in parent_ends else None,
+        os.fdopen(parent_ends[1], 'rb') if 1 in parent_ends else None,
+        os.fdopen(parent_ends[2], 'rb') if 2 in parent_ends else None)
+
+
+def _communicate(child, input, timeout):
+    """Write input to the child and read its stdout/stderr until both are
+    closed. Returns (stdout, stderr, timed_out)."""
+    outputs = {child.stdout: bytearray(), child.stderr: bytearray()}
+    deadline = None if timeout is None else time.monotonic() + timeout
+    input = memoryview(input or b'')
+    with selectors.DefaultSelector() as selector:
+        if child.stdin is not None:
+            if input:
+                selector.register(child.stdin, selectors.EVENT_WRITE)
+            else:
+                child.stdin.close()
+        for f in (child.stdout, child.stderr):
+            if f is not None:
+                selector.register(f, selectors.EVENT_READ)
+
+        while selector.get_map():
+            remaining = None
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return (bytes(outputs[child.stdout]),
+                            bytes(outputs[child.stderr]), True)
+            for key, _ in selector.select(remaining):
+                f = key.fileobj
+                if f is child.stdin:
+                    try:
+                        written = os.write(f.fileno(), input[:65536])
+                    except BrokenPipeError:
+                        written = len(input)
+                    input = input[written:]
+                    if not input:
+                        selector.unregister(f)
+                        f.close()
+                else:
+                    data = os.read(f.fileno(), 65536)
+                    if data:
+                        outputs[f] += data
+                    else:
+                        selector.unregister(f)
+                        f.close()
+    return (bytes(outputs[child.stdout]), bytes(outputs[child.stderr]), False)
+
+
+def cgroup_usage(cgroup_root=CGROUP_ROOT):
+    """Read the cgroup v2 accounting of the current container, returns a
+    dict with 'cpu_time' (in seconds) and 'max_ram' (in KB, the peak since
+    the container started), or None if the cgroup v2 files are not
+    available."""
+    try:
+        with open(os.path.join(cgroup_root, 'cpu.stat')) as f:
+            cpu_stat = dict(line.split() for line in f if line.strip())
+        with open(os.path.join(cgroup_root, 'memory.peak')) as f:
+            memory_peak = int(f.read())
+    except (OSError, ValueError):
+        return None
+    return {
+        'cpu_time': int(cpu_stat['usage_usec']) / 1e6,
+        'max_ram': memory_peak // 1024,
+    }
+
+
+def _open_memory_peak(cgroup_root=CGROUP_ROOT):
+    """Reset the memory peak of the container for a run. Returns the file
+    to read the peak of the run from and the memory usage at its start, or
+    None if the kernel cannot reset the peak (Linux < 6.12)."""
+    try:
+        f = open(os.path.join(cgroup_root, 'memory.peak'), 'r+b',
+                 buffering=0)
+    except OSError:
+        return None
+    try:
+        # Resets the peak read through this file only
+        f.write(b'reset\n')
+        with open(os.path.join(cgroup_root, 'memory.current')) as current:
+            return (f, int(current.read()))
+    except (OSError, ValueError):
+        f.close()
+        return None
+
+
+def _read_memory_peak(memory_peak):
+    """RAM (in KB) used by the container during the run on top of its
+    usage at the start, None if unknown."""
+    if memory_peak is None:
+        return None
+    f, start = memory_peak
+    try:
+        f.seek(0)
+        return max(0, int(f.read()) - start) // 1024
+    except (OSError, ValueError):
+        return None
+    finally:
+        f.close()
+
+
+def run(argv, input=None, rlimits=None, capture_stderr=False, timeout=None,
+        with_cgroup=False):
+    """Run argv until completion and return a RunResult. cpu_time (user +
+    system, in seconds) and max_ram (in KB) are the ones of this child only.
+    Note that the kernel initializes the ru_maxrss of an exec'ed process
+    with the RSS of its parent, so max_ram is never lower than the RSS of
+    the calling Python process (the streaming harness reads VmHWM instead,
+    peak_rss.c measures a single program).
+    If with_cgroup is set and cgroup v2 is available, RunResult.cgroup holds
+    the CPU time consumed by the container during the run and the RAM it
+    used on top of its usage at the start of the run ('max_ram', None if
+    the kernel cannot tell)."""
+    cgroup_before = cgroup_usage() if with_cgroup else None
+    memory_peak = _open_memory_peak() if cgroup_before is not None else None
+    child = spawn(argv, rlimits=rlimits, stdin=True, stdout=True,
+                  stderr=capture_stderr)
+    try:
+        stdout, stderr, timed_out = _communicate(child, input, timeout)
+    except BaseException:
+        child.kill()
+        child.wait()
+        if memory_peak is not None:
+            memory_peak[0].close()
+        raise
+    finally:
+        for f in (child.stdin, child.stdout, child.stderr):
+            if f is not None:
+                f.close()
+    if timed_out:
+        child.kill()
+    returncode, rusage = child.wait()
+
+    cgroup = None
+    max_ram = _read_memory_peak(memory_peak)
+    if cgroup_before is not None:
+        cgroup_after = cgroup_usage()
+        if cgroup_after is not None:
+            cgroup = {
+                'cpu_time': cgroup_after['cpu_time'] -
+                cgroup_before['cpu_time'],
+                'max_ram': max_ram,
+            }
+
+    return RunResult(returncode=returncode,
+                     stdout=stdout,
+                     stderr=stderr if capture_stderr else None,
+                     cpu_time=rusage.ru_utime + rusage.ru_stime,
+                     max_ram=rusage.ru_maxrss,
+                     cgroup=cgroup)
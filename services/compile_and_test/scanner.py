@@ -0,0 +1,191 @@
+"""Single pass scan of a (possibly huge) source file for forbidden strings
+and patterns.
+
+The forbidden strings, together with the literal part each forbidden pattern
+requires (e.g. 'asm' for '\\sasm\\W'), are compiled into one alternation of
+literals: the regex engine matches it in a single pass over the memory
+mapped file, and the full patterns are only tried around the occurrences of
+their literal part. Patterns without such a literal part are added to the
+alternation as they are.
+
+The file is scanned window by window, consecutive windows overlapping by
+the length of the longest match minus one, so that a literal straddling
+two windows is found exactly once. Nothing is copied out of the mapping
+while scanning."""
+
+import itertools
+import re
+from collections import namedtuple
+
+try:
+    from re import _parser as sre_parse
+except ImportError:
+    import sre_parse
+
+CHUNK_SIZE = 2**20
+
+Hit = namedtuple('Hit', ['offset', 'line', 'matched', 'forbidden',
+                         'is_pattern'])
+
+# A forbidden string or pattern found from one literal of the alternation
+_Alternative = namedtuple('_Alternative', ['forbidden', 'is_pattern',
+                                           'min_prefix', 'max_prefix'])
+
+
+def _max_width(pattern):
+    _, width = sre_parse.parse(pattern.pattern, pattern.flags).getwidth()
+    if width >= sre_parse.MAXREPEAT:
+        raise ValueError(f"Pattern {pattern.pattern} has no maximum length")
+    return width
+
+
+def _required_literal(pattern):
+    """Longest run of literal bytes found at the top level of pattern,
+    returned as (literal, min_prefix, max_prefix) where the prefixes bound
+    its offset in a match, or None."""
+    if pattern.flags & re.IGNORECASE:
+        return None
+    parsed = sre_parse.parse(pattern.pattern, pattern.flags)
+    best = None
+    run_start = None
+    items = list(parsed) + [(None, None)]
+    for i, (op, av) in enumerate(items):
+        if op is sre_parse.LITERAL:
+            if run_start is None:
+                run_start = i
+            continue
+        if run_start is not None and \
+           (best is None or i - run_start > best[1] - best[0]):
+            best = (run_start, i)
+        run_start = None
+    if best is None:
+        return None
+    literal = bytes(av for _, av in items[best[0]:best[1]])
+    prefix = sre_parse.SubPattern(parsed.state, parsed.data[:best[0]])
+    min_prefix, max_prefix = prefix.getwidth()
+    return (literal, min_prefix, max_prefix)
+
+
+def _line_numbers(contents, offsets):
+    """Line numbers (starting at 1) of the sorted offsets in contents."""
+    lines = list()
+    line, pos = 1, 0
+    for offset in offsets:
+        while pos < offset:
+            stop = min(offset, pos + CHUNK_SIZE)
+            line += contents[pos:stop].count(b'\n')
+            pos = stop
+        lines.append(line)
+    return lines
+
+
+class Scanner:
+
+    def __init__(self, strings, patterns, chunk_size=CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        # The alternation has no group (which would disable the fast search
+        # of its first bytes): the alternatives are found back from the
+        # matched literal
+        self.by_literal = dict()
+        self.unliteral_patterns = list()
+        literals = list()
+        self.max_width = 1
+        for string in strings:
+            self.by_literal.setdefault(string, []).append(
+                _Alternative(string, False, 0, 0))
+            literals.append(re.escape(string))
+            self.max_width = max(self.max_width, len(string))
+        for pattern in patterns:
+            self.max_width = max(self.max_width, _max_width(pattern))
+            required = _required_literal(pattern)
+            if required is None:
+                self.unliteral_patterns.append(pattern)
+                literals.append(b'(?:' + pattern.pattern + b')')
+                continue
+            literal, min_prefix, max_prefix = required
+            self.by_literal.setdefault(literal, []).append(
+                _Alternative(pattern, True, min_prefix, max_prefix))
+            literals.append(re.escape(literal))
+        self.regex = re.compile(b'|'.join(literals))
+        # Every alternative is at most max_width long
+        self.overlap = self.max_width - 1
+
+    def _literals(self, contents, start, stop, end):
+        """Literal matches starting in [start, stop) and ending before end,
+        overlapping matches included."""
+        pos = start
+        while pos < stop:
+            match = self.regex.search(contents, pos, end)
+            if match is None or match.start() >= stop:
+                return
+            yield match
+            pos = match.start() + 1
+
+    def _matches(self, contents, lo, hi, start, stop):
+        """Yield (offset, forbidden, is_pattern, matched) for the literals
+        starting in [start, stop). The match of a pattern around a literal
+        must lie within [lo, hi)."""
+        end = min(stop + self.overlap, hi)
+        for literal in self._literals(contents, start, stop, end):
+            for alternative in self.by_literal.get(literal.group(0), []):
+                if not alternative.is_pattern:
+                    yield (literal.start(), alternative.forbidden, False,
+                           literal.group(0))
+                    continue
+                first = max(lo, literal.start() - alternative.max_prefix)
+                last = literal.start() - alternative.min_prefix
+                for offset in range(first, last + 1):
+                    match = alternative.forbidden.match(contents, offset, hi)
+                    if match is not None:
+                        yield (offset, alternative.forbidden, True,
+                               match.group(0))
+            for pattern in self.unliteral_patterns:
+                match = pattern.match(contents, literal.start(), hi)
+                if match is not None:
+                    yield (literal.start(), pattern, True, match.group(0))
+
+    def _scan_segment(self, contents, lo, hi):
+        for start in range(lo, hi, self.chunk_size):
+            stop = min(start + self.chunk_size, hi)
+            yield from self._matches(contents, lo, hi, start, stop)
+
+    def _scan_junction(self, contents, skip):
+        """Matches which only exist once the skipped range is removed."""
+        left = max(0, skip[0] - self.max_width)
+        junction = (contents[left:skip[0]] +
+                    contents[skip[1]:skip[1] + self.max_width])
+        middle = skip[0] - left
+        for offset, forbidden, is_pattern, matched in self._matches(
+                junction, 0, len(junction), 0, len(junction)):
+            if offset < middle < offset + len(matched):
+                yield (left + offset, forbidden, is_pattern, matched)
+
+    def scan(self, contents, skip=None, max_hits=None):
+        """Return the hits found in contents (bytes or mmap), sorted by
+        offset. skip is an optional (start, stop) range of contents scanned
+        as if it had been removed. The scan stops after max_hits hits."""
+        if skip is None:
+            matches = self._scan_segment(contents, 0, len(contents))
+        else:
+            matches = itertools.chain(
+                self._scan_segment(contents, 0, skip[0]),
+                self._scan_junction(contents, skip),
+                self._scan_segment(contents, skip[1], len(contents)))
+
+        found = dict()
+        for offset, forbidden, is_pattern, matched in matches:
+            if max_hits is not None and len(found) >= max_hits:
+                break
+            # A pattern may be found from several of its literals
+            found.setdefault((offset, id(forbidden)),
+                             (offset, forbidden, is_pattern, matched))
+        found = sorted(found.values(), key=lambda hit: hit[0])
+
+        lines = _line_numbers(contents, [hit[0] for hit in found])
+        return [Hit(offset=offset,
+                    line=line,
+                    matched=matched,
+                    forbidden=forbidden,
+                    is_pattern=is_pattern)
+                for (offset, forbidden, is_pattern, matched), line
+                in zip(found, lines)]
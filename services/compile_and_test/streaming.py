@@ -0,0 +1,163 @@
+import os
+import resource
+import signal
+import struct
+
+import runner
+
+# See harness.c for the description of the frames
+MESSAGE_SIZE = 32
+SIGNATURE_SIZE = 64
+RESULT_FRAME = struct.Struct('<64sQQ')
+
+
+class HarnessError(Exception):
+    pass
+
+
+class HarnessTimeLimitExceeded(HarnessError):
+    pass
+
+
+# The harness runs in the process of the submission, which can fake the
+# CPU time and the RAM it reports (by overriding clock_gettime or fopen).
+# Both are measured from outside instead: the messages are sent one at a
+# time, and while the harness waits for the next one we read its CPU time
+# (/proc/<pid>/schedstat) and its peak RSS (/proc/<pid>/status). The total
+# CPU time is the one of wait4. The CPU times reported by the harness are
+# only hints: the run is rejected if their sum exceeds the total, or is
+# less than HINTS_MIN_FRACTION of it, beyond CPU_TIME_SLACK_IN_SECS
+HINTS_MIN_FRACTION = 0.25
+CPU_TIME_SLACK_IN_SECS = 0.01
+
+
+def _read_proc(pid, name):
+    try:
+        with open(f'/proc/{pid}/{name}') as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def cpu_time_ns(pid):
+    """CPU time of the live process pid, or None."""
+    schedstat = _read_proc(pid, 'schedstat')
+    try:
+        return int(schedstat.split()[0])
+    except (AttributeError, ValueError, IndexError):
+        return None
+
+
+def peak_rss_kb(pid):
+    """VmHWM of the live process pid, or None."""
+    status = _read_proc(pid, 'status')
+    for line in (status or '').splitlines():
+        if line.startswith('VmHWM:'):
+            try:
+                return int(line.split()[1])
+            except (ValueError, IndexError):
+                return None
+    return None
+
+
+def check_hints(hints, total):
+    """Raises HarnessError if the CPU times reported by the harness do not
+    match total, the CPU time measured by wait4."""
+    reported = sum(hints)
+    if reported > total + CPU_TIME_SLACK_IN_SECS or \
+       reported < HINTS_MIN_FRACTION * total - CPU_TIME_SLACK_IN_SECS:
+        raise HarnessError(
+            f"The harness reported {reported:.6f}s of CPU time, "
+            f"{total:.6f}s were used")
+
+
+def _read_frame(stdout):
+    frame = b''
+    while len(frame) < RESULT_FRAME.size:
+        chunk = stdout.read(RESULT_FRAME.size - len(frame))
+        if not chunk:
+            return None
+        frame += chunk
+    return frame
+
+
+def stream(harness, messages, number_of_tests, cpu_time_limit,
+           on_result=None, core=None):
+    """Sign number_of_tests messages with a single harness process.
+
+    Returns (signatures, cpu_times, max_rams) where the CPU times are in
+    seconds and the RAM in KB, one entry per message.
+    on_result(index, signature, cpu_time, ram) is called for each frame as
+    soon as it is received, and may raise to stop the harness.
+    If core is given, the harness is pinned to this CPU."""
+    messages = bytes(messages[:number_of_tests * MESSAGE_SIZE])
+    if len(messages) != number_of_tests * MESSAGE_SIZE:
+        raise HarnessError("Not enough messages to sign")
+
+    # The harness kills itself (SIGPROF) when a single signature exceeds
+    # the limit, we give it one more second to be on the safe side. The
+    # submission can disarm this timer, RLIMIT_CPU bounds the whole run
+    cmd = [harness, str(int(cpu_time_limit) + 1)]
+    max_cpu_time = (int(cpu_time_limit) + 1) * number_of_tests + 1
+    ps = runner.spawn(cmd, rlimits={resource.RLIMIT_CPU: max_cpu_time})
+    if core is not None:
+        # The harness is blocked on stdin until the first message, so no
+        # signature is computed before it is pinned
+        os.sched_setaffinity(ps.pid, {core})
+
+    signatures = bytearray()
+    hints = list()
+    all_cpu_time = list()
+    all_max_ram = list()
+    try:
+        last_cpu_time_ns = cpu_time_ns(ps.pid)
+        for index in range(number_of_tests):
+            try:
+                ps.stdin.write(messages[index * MESSAGE_SIZE:
+                                        (index + 1) * MESSAGE_SIZE])
+                ps.stdin.flush()
+            except (BrokenPipeError, OSError):
+                # The harness died, reported below
+                break
+            frame = _read_frame(ps.stdout)
+            if frame is None:
+                break
+            # The harness waits for the next message, its figures are final
+            current_cpu_time_ns = cpu_time_ns(ps.pid)
+            max_ram = peak_rss_kb(ps.pid)
+            if current_cpu_time_ns is None or last_cpu_time_ns is None or \
+               max_ram is None:
+                raise HarnessError("Could not measure the harness")
+            cpu_time = (current_cpu_time_ns - last_cpu_time_ns) / 1e9
+            last_cpu_time_ns = current_cpu_time_ns
+            signature, hint_ns, _ = RESULT_FRAME.unpack(frame)
+            signatures += signature
+            hints.append(hint_ns / 1e9)
+            all_cpu_time.append(cpu_time)
+            all_max_ram.append(max_ram)
+            if on_result is not None:
+                on_result(index, signature, cpu_time, max_ram)
+    finally:
+        if ps.poll() is None and len(all_cpu_time) < number_of_tests:
+            ps.kill()
+        try:
+            ps.stdin.close()
+        except (BrokenPipeError, OSError):
+            pass
+        ps.stdout.close()
+        returncode, rusage = ps.wait()
+
+    total = rusage.ru_utime + rusage.ru_stime
+    if returncode in (-signal.SIGPROF, -signal.SIGXCPU) or (
+            returncode == -signal.SIGKILL and total >= max_cpu_time):
+        raise HarnessTimeLimitExceeded(
+            f"Message {len(all_cpu_time)} exceeded the CPU time limit")
+    if len(all_cpu_time) != number_of_tests:
+        raise HarnessError(
+            f"The harness stopped after {len(all_cpu_time)} messages "
+            f"(return code {returncode})")
+    if returncode != 0:
+        raise HarnessError(f"The harness returned {returncode}")
+    check_hints(hints, total)
+
+    return (bytes(signatures), all_cpu_time, all_max_ram)
@@ -0,0 +1,100 @@
+"""Send the signatures to the launcher by batches while they are computed.
+
+The launcher verifies each batch as soon as it arrives and answers with a
+JSON object whose "status" is either "continue" or "abort". On "abort" (a
+signature could not be verified), the launcher already marked the program as
+failed: the run is stopped as soon as possible and the final result is not
+sent.
+
+Batches are posted in order by a background thread, so that signing never
+waits for the network. In parallel mode the signatures do not come in
+order, they are buffered until the batch they belong to is contiguous."""
+
+import json
+import logging
+import queue
+import threading
+import urllib.request
+
+from urllib.parse import urlencode
+
+logger = logging.getLogger()
+
+
+class Aborted(Exception):
+    pass
+
+
+class SignatureUploader:
+
+    def __init__(self, url, batch_size):
+        self.url = url
+        self.batch_size = batch_size
+        self.pending = dict()
+        self.next_index = 0
+        self.batch = bytearray()
+        self.offset = 0
+        self.lock = threading.Lock()
+        self.aborted = threading.Event()
+        self.batches = queue.Queue()
+        self.thread = threading.Thread(target=self._post_batches, daemon=True)
+        self.thread.start()
+
+    def add(self, index, signature):
+        """Record the signature of the message at index. Raises Aborted if
+        the launcher asked to stop."""
+        if self.aborted.is_set():
+            raise Aborted()
+        with self.lock:
+            self.pending[index] = signature
+            while self.next_index in self.pending:
+                self.batch += self.pending.pop(self.next_index)
+                self.next_index += 1
+                if self.next_index - self.offset >= self.batch_size:
+                    self.batches.put((self.offset, bytes(self.batch)))
+                    self.offset = self.next_index
+                    self.batch = bytearray()
+
+    def close(self):
+        """Wait until the full batches are posted. The last, incomplete,
+        batch is left to the final result. Raises Aborted if the launcher
+        asked to stop."""
+        self.batches.put(None)
+        self.thread.join()
+        if self.aborted.is_set():
+            raise Aborted()
+
+    def _post(self, offset, signatures):
+        url = f"{self.url}?{urlencode({'offset': offset})}"
+        req = urllib.request.Request(
+            url,
+            data=signatures,
+            headers={'content-type': 'application/octet-stream'}
+        )
+        with urllib.request.urlopen(req) as response:
+            return json.loads(response.read())
+
+    def _post_batches(self):
+        while True:
+            batch = self.batches.get()
+            if batch is None:
+                return
+            offset, signatures = batch
+            try:
+                answer = self._post(offset, signatures)
+            except Exception as e:
+                # The final result still carries all the signatures
+                logger.warning(f"Could not send the signatures from {offset}, "
+                               f"stop streaming them: {e}")
+                self._discard_batches()
+                return
+            if answer.get('status') == 'abort':
+                logger.warning("The launcher rejected the signatures from "
+                               f"{offset}, aborting")
+                self.aborted.set()
+                self._discard_batches()
+                return
+
+    def _discard_batches(self):
+        while self.batches.get() is not None:
+            pass
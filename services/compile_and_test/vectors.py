@@ -0,0 +1,76 @@
+"""Messages signed by a program under test, derived from the seed of the
+program (stored with it in the database).
+
+The edge cases come first, then the message i is the keyed BLAKE2b (32
+bytes, the key being the seed) of the counter i on 8 little-endian bytes.
+The compile_and_test service and the launcher generate the same messages
+on their own, only the ones they need, and a program tested again is
+tested on exactly the same messages.
+
+The launcher copies this file from services/compile_and_test (see the
+Makefile), any change must keep the messages of the existing seeds."""
+
+import hashlib
+
+MESSAGE_SIZE = 32
+SEED_SIZE = 16
+
+
+def decode_seed(seed):
+    """The seed given as hexadecimal digits, as bytes. Raises ValueError if
+    it is not SEED_SIZE bytes long."""
+    seed = bytes.fromhex(seed)
+    if len(seed) != SEED_SIZE:
+        raise ValueError(f"The seed must be {SEED_SIZE} bytes long")
+    return seed
+
+
+def encode_edge_cases(edge_cases):
+    """The edge cases (integers) as an environment variable."""
+    return ','.join(f'{case:x}' for case in edge_cases)
+
+
+def decode_edge_cases(value):
+    return [int(case, 16) for case in value.split(',') if case]
+
+
+class Messages:
+    """The concatenation of the messages, generated on demand: like bytes,
+    it has a length and can be sliced (with step 1), the slices being
+    bytes."""
+
+    def __init__(self, seed, edge_cases, number_of_vectors):
+        # Keying BLAKE2b costs a compression, it is done once
+        self._keyed = hashlib.blake2b(key=decode_seed(seed),
+                                      digest_size=MESSAGE_SIZE)
+        self._edge_cases = b''.join(case.to_bytes(MESSAGE_SIZE, 'big')
+                                    for case in edge_cases)
+        self.number_of_edge_cases = len(edge_cases)
+        self.number_of_messages = len(edge_cases) + number_of_vectors
+
+    def message(self, index):
+        if index < self.number_of_edge_cases:
+            return self._edge_cases[MESSAGE_SIZE*index:
+                                    MESSAGE_SIZE*(index+1)]
+        h = self._keyed.copy()
+        h.update((index - self.number_of_edge_cases).to_bytes(8, 'little'))
+        return h.digest()
+
+    def __len__(self):
+        return MESSAGE_SIZE * self.number_of_messages
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            raise TypeError("The messages can only be sliced")
+        start, stop, step = key.indices(len(self))
+        if step != 1:
+            raise ValueError("The messages cannot be sliced with a step")
+        if start >= stop:
+            return b''
+        first = start // MESSAGE_SIZE
+        last = (stop - 1) // MESSAGE_SIZE
+        data = b''.join(self.message(i) for i in range(first, last + 1))
+        return data[start - MESSAGE_SIZE*first:stop - MESSAGE_SIZE*first]
+
+    def __bytes__(self):
+        return self[:]
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""Long-lived worker of the compile_and_test pool.
+
+The worker registers with the launcher, then pulls the programs to compile
+and test, one at a time. Each program is handled by compile_and_test.py,
+run in a fresh working directory and in its own process group, both removed
+once it is done. The processes which left the group (setsid, double fork)
+are killed too: nothing but the worker survives in the container between
+two programs. When the launcher asks to recycle the worker (the default),
+it exits after the program and docker replaces the container by a fresh
+one."""
+
+import json
+import logging
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from urllib.parse import urljoin
+
+# logging
+FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+logging.basicConfig(stream=sys.stdout, level=logging.INFO, format=FORMAT)
+logger = logging.getLogger()
+
+LAUNCHER_URL = os.environ.get('LAUNCHER_URL', 'http://launcher:5000/')
+# The hostname is set to the slot of the task in the stack file, so that a
+# restarted worker keeps its name
+WORKER_NAME = os.environ.get('WORKER_NAME', socket.gethostname())
+POLL_INTERVAL_IN_SECS = float(os.environ.get('POLL_INTERVAL_IN_SECS', 0.5))
+WORK_ROOT = os.environ.get('WORK_ROOT', '/work')
+
+
+def register():
+    url = urljoin(LAUNCHER_URL, f'pool/register/{WORKER_NAME}')
+    while True:
+        try:
+            req = urllib.request.Request(url, data=b'')
+            with urllib.request.urlopen(req) as response:
+                if json.loads(response.read()).get('registered'):
+                    logger.info(f"Worker {WORKER_NAME} registered")
+                    return
+        except Exception as e:
+            logger.warning(f"Could not register with the launcher: {e}")
+        time.sleep(5)
+
+
+def next_job():
+    """The next program to compile and test, or None."""
+    url = urljoin(LAUNCHER_URL, f'pool/next_job/{WORKER_NAME}')
+    try:
+        with urllib.request.urlopen(url) as response:
+            if response.status == 204:
+                return None
+            return json.loads(response.read())
+    except Exception as e:
+        logger.warning(f"Could not get a job from the launcher: {e}")
+        time.sleep(5)
+        return None
+
+
+def max_time(env):
+    """Same bound as the one used by the launcher to clean the programs
+    which take too much time."""
+    max_compile_time = int(env['CHALLENGE_MAX_TIME_COMPILATION_IN_SECS'])
+    max_exec_time = int(env['CHALLENGE_MAX_TIME_EXECUTION_IN_SECS']) * \
+        (int(env['CHALLENGE_NUMBER_OF_TEST_VECTORS']) +
+         int(env.get('BENCHMARK_REPETITIONS', 0)))
+    return 10 + max_compile_time + max_exec_time + 100
+
+
+def other_processes():
+    """Pids of the live processes of the container, but the worker and the
+    init process."""
+    pids = list()
+    for name in os.listdir('/proc'):
+        if not name.isdigit() or int(name) in (1, os.getpid()):
+            continue
+        try:
+            with open(f'/proc/{name}/stat') as f:
+                state = f.read().rsplit(')', 1)[1].split()[0]
+        except (OSError, IndexError):
+            continue
+        if state != 'Z':
+            pids.append(int(name))
+    return pids
+
+
+def kill_leftovers():
+    for _ in range(50):
+        pids = other_processes()
+        if not pids:
+            return
+        logger.warning(f"Killing the leftover processes {pids}")
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        # As the init process of the container, we reap the orphans
+        try:
+            while os.waitpid(-1, os.WNOHANG)[0] > 0:
+                pass
+        except ChildProcessError:
+            pass
+        time.sleep(0.1)
+    logger.error("Could not kill the leftover processes, exiting")
+    sys.exit(1)
+
+
+def run_job(job):
+    basename = job['basename']
+    work_dir = tempfile.mkdtemp(prefix=f'{basename}-', dir=WORK_ROOT)
+    ps = None
+    try:
+        logger.info(f"Fetching the source of {basename}")
+        with urllib.request.urlopen(job['url_for_fetching_source']) as response, \
+                open(os.path.join(work_dir, basename + '.c'), 'wb') as f:
+            shutil.copyfileobj(response, f)
+
+        env = dict(os.environ)
+        env.update(variable.split('=', 1) for variable in job['env'])
+        env['UPLOAD_FOLDER'] = work_dir
+        env['WORK_DIR'] = work_dir
+        env['TMPDIR'] = work_dir
+
+        logger.info(f"Compiling and testing {basename}")
+        ps = subprocess.Popen(['/compile_and_test.py'], env=env, cwd=work_dir,
+                              start_new_session=True)
+        try:
+            ps.wait(timeout=max_time(env))
+        except subprocess.TimeoutExpired:
+            logger.error(f"Compiling and testing {basename} took too long")
+    except Exception as e:
+        # The launcher fails the program once it times out
+        logger.error(f"Could not compile and test {basename}: {e}")
+    finally:
+        if ps is not None:
+            # Nothing started by the program survives it
+            try:
+                os.killpg(ps.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            ps.wait()
+        kill_leftovers()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def main():
+    os.makedirs(WORK_ROOT, exist_ok=True)
+    register()
+    while True:
+        job = next_job()
+        if job is None:
+            time.sleep(POLL_INTERVAL_IN_SECS)
+            continue
+        run_job(job)
+        if job.get('recycle'):
+            logger.info("Recycling the worker")
+            sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
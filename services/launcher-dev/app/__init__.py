@@ -1,3 +1,5 @@
+import sqlalchemy
+
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
@@ -12,3 +14,12 @@ db = SQLAlchemy(app)
 login_manager = LoginManager()
 
 from app import routes, models  # noqa
+from app.models.calibration import Calibration  # noqa
+
+# The web service creates the tables of the models shared with the launcher,
+# the calibrations are only known here
+try:
+    Calibration.__table__.create(db.engine, checkfirst=True)
+except sqlalchemy.exc.OperationalError:
+    # Created in the meantime by another process of the launcher
+    pass
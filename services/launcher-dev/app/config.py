@@ -56,5 +56,80 @@ CHALLENGE_TEST_EDGE_CASES = [
 #############
 
 NAME_OF_COMPILE_AND_TEST_SERVICE = os.environ['NAME_OF_COMPILE_AND_TEST_SERVICE']
+# Slots in which programs are compiled and tested concurrently (one
+# compile_and_test service each), separated by ';'. A slot is given as
+# '<cpu set>:<memory limit in MB>', e.g. '0-1:500;2-3:500'. An empty cpu set
+# means all the cores, an empty memory limit the compilation/execution one.
+COMPILE_AND_TEST_SLOTS = list()
+for i, slot in enumerate(
+        os.environ.get('COMPILE_AND_TEST_SLOTS', ':').split(';')):
+    cpu_set, _, mem_limit_in_mb = slot.strip().partition(':')
+    COMPILE_AND_TEST_SLOTS.append({
+        # The first slot keeps the name of the single service of old
+        'name': NAME_OF_COMPILE_AND_TEST_SERVICE + (f'_{i}' if i else ''),
+        'cpu_set': cpu_set.strip(),
+        'mem_limit_in_mb': int(mem_limit_in_mb) if mem_limit_in_mb.strip()
+        else max(CHALLENGE_MAX_MEM_COMPILATION_IN_MB,
+                 CHALLENGE_MAX_MEM_EXECUTION_IN_MB),
+    })
 SOCK = os.environ['SOCK']
 COMPILE_AND_TEST_SERVICE_NETWORK = os.environ['COMPILE_AND_TEST_SERVICE_NETWORK']
+# 'streaming' signs all the test vectors with a single process,
+# 'parallel' shards them across several processes pinned to distinct cores,
+# 'spawn' runs the submitted program once per test vector
+COMPILE_AND_TEST_EXECUTION_MODE = os.environ.get(
+    'COMPILE_AND_TEST_EXECUTION_MODE', 'streaming')
+# Size of the compilation cache shared by the compile_and_test services,
+# 0 disables the cache
+COMPILATION_CACHE_MAX_SIZE_IN_MB = int(os.environ.get(
+    'COMPILATION_CACHE_MAX_SIZE_IN_MB', 0))
+# Number of processes in 'parallel' mode, 0 means one per available core
+COMPILE_AND_TEST_EXECUTION_WORKERS = int(os.environ.get(
+    'COMPILE_AND_TEST_EXECUTION_WORKERS', 0))
+# Number of signatures per batch sent to the launcher during the execution,
+# so that a wrong signature stops the run early, 0 disables the streaming
+COMPILE_AND_TEST_SIGNATURES_BATCH_SIZE = int(os.environ.get(
+    'COMPILE_AND_TEST_SIGNATURES_BATCH_SIZE', 0))
+# 'service' creates a compile_and_test service for each program, 'pool' lets
+# the long-lived workers of the compile_and_test_pool service pull them
+COMPILE_AND_TEST_DISPATCH = os.environ.get(
+    'COMPILE_AND_TEST_DISPATCH', 'service')
+# In 'pool' mode, restart the worker (hence its container) after each program
+COMPILE_AND_TEST_POOL_RECYCLE = \
+    os.environ.get('COMPILE_AND_TEST_POOL_RECYCLE', 'True') == 'True'
+# The dispatcher is woken up when a program is submitted and when a slot is
+# freed, and otherwise every DISPATCHER_POLL_INTERVAL_IN_SECS
+DISPATCHER_POLL_INTERVAL_IN_SECS = \
+    int(os.environ.get('DISPATCHER_POLL_INTERVAL_IN_SECS', 60))
+# Estimation of the time and RAM factors (see compile_and_test/benchmark.py):
+# measures left out at the start of each run, extra runs on the first
+# messages, estimator ('median', 'trimmed_mean' or 'mean'), measures removed
+# on each side by the trimmed mean, level of the confidence intervals and
+# modified z-score above which a measure is an outlier
+BENCHMARK_WARM_UP_RUNS = int(os.environ.get('BENCHMARK_WARM_UP_RUNS', 0))
+BENCHMARK_REPETITIONS = int(os.environ.get('BENCHMARK_REPETITIONS', 0))
+BENCHMARK_ESTIMATOR = os.environ.get('BENCHMARK_ESTIMATOR', 'trimmed_mean')
+BENCHMARK_TRIMMED_MEASURES = int(os.environ.get(
+    'BENCHMARK_TRIMMED_MEASURES', 5))
+BENCHMARK_CONFIDENCE = float(os.environ.get('BENCHMARK_CONFIDENCE', 0.95))
+BENCHMARK_OUTLIER_THRESHOLD = float(os.environ.get(
+    'BENCHMARK_OUTLIER_THRESHOLD', 3.5))
+# Each slot calibrates its node with the reference signer at most every
+# CALIBRATION_INTERVAL_IN_SECS (0 disables the calibration), the time
+# factors are divided by the speed coefficient of the node: the median CPU
+# time of the reference signer over CALIBRATION_REFERENCE_CPU_TIME_IN_SECS
+# (0 means the one of the first calibration ever accepted)
+CALIBRATION_INTERVAL_IN_SECS = int(os.environ.get(
+    'CALIBRATION_INTERVAL_IN_SECS', 0))
+CALIBRATION_NUMBER_OF_MESSAGES = int(os.environ.get(
+    'CALIBRATION_NUMBER_OF_MESSAGES', 200))
+CALIBRATION_REFERENCE_CPU_TIME_IN_SECS = float(os.environ.get(
+    'CALIBRATION_REFERENCE_CPU_TIME_IN_SECS', 0))
+# A calibration whose coefficient is more than CALIBRATION_MAX_DRIFT times
+# off the recent ones of the node (0 accepts any) is not accepted until
+# CALIBRATION_CONFIRMATIONS consecutive calibrations agree (0 never, the
+# reference CPU time is then needed). The first calibration of a node is
+# compared to the reference node
+CALIBRATION_MAX_DRIFT = float(os.environ.get('CALIBRATION_MAX_DRIFT', 2))
+CALIBRATION_CONFIRMATIONS = int(os.environ.get(
+    'CALIBRATION_CONFIRMATIONS', 3))
@@ -0,0 +1,57 @@
+"""Start the compilation and test of the submitted programs as soon as
+possible.
+
+Each launcher process runs a dispatcher thread. It is woken up by wake()
+when a program is submitted or when a slot becomes free, and otherwise
+every DISPATCHER_POLL_INTERVAL_IN_SECS as a safety net. The dispatchers of
+the different (uwsgi) processes share a file lock, so that a single one of
+them starts programs at a time."""
+
+import fcntl
+import os
+import threading
+from traceback import print_exc
+
+from app import app
+from app import utils
+
+LOCK_FILE = '/tmp/compile_and_test.lock'
+
+_wake_up = threading.Event()
+_lock = threading.Lock()
+_dispatch = None
+_started_in_pid = None
+
+
+def start(dispatch):
+    """Call dispatch() (in an application context) whenever we are woken
+    up. The thread is started again in forked processes."""
+    global _dispatch, _started_in_pid
+    with _lock:
+        _dispatch = dispatch
+        if _started_in_pid == os.getpid():
+            return
+        _started_in_pid = os.getpid()
+        thread = threading.Thread(target=_run, name='dispatcher', daemon=True)
+        thread.start()
+
+
+def wake():
+    if _dispatch is not None:
+        start(_dispatch)
+    _wake_up.set()
+
+
+def _run():
+    utils.console(f'Dispatcher started in process {os.getpid()}')
+    while True:
+        _wake_up.wait(app.config['DISPATCHER_POLL_INTERVAL_IN_SECS'])
+        _wake_up.clear()
+        try:
+            with open(LOCK_FILE, 'w') as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                with app.app_context():
+                    _dispatch()
+        except:
+            utils.console('Exception caught in the dispatcher')
+            print_exc()
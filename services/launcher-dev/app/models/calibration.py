@@ -0,0 +1,176 @@
+import json
+import math
+import statistics
+import time
+
+from sqlalchemy.dialects import mysql
+
+from app import db
+
+
+class Calibration(db.Model):
+    """Speed of a sandbox node, measured with the reference signer (see
+    compile_and_test/calibrate.py). The time factors measured on a node are
+    divided by its latest coefficient.
+
+    The node is the slot (or the pool worker) the launcher dispatched the
+    calibrating run to, never a name reported by the sandbox.
+
+    A calibration too far off the recent ones of its node is recorded but
+    not accepted, until enough consecutive calibrations confirm the node
+    really changed speed."""
+
+    # Number of calibrations of the node a new one is compared to
+    NUMBER_OF_RECENT = 10
+
+    _id = db.Column(db.Integer, primary_key=True)
+    _node = db.Column(db.String(64), nullable=False, index=True)
+    _slot = db.Column(db.String(64), default=None, index=True)
+    _timestamp = db.Column(db.BigInteger, nullable=False)
+    _cpu_time_median = db.Column(mysql.DOUBLE, nullable=False)
+    _cpu_time_mad = db.Column(mysql.DOUBLE, nullable=False)
+    # Median CPU time of the reference signer over the reference one
+    _coefficient = db.Column(mysql.DOUBLE, nullable=False)
+    _summary = db.Column(db.Text, default=None)
+    # Whether the coefficient is used, and whether it confirmed a drift of
+    # the node (the recent calibrations of the node start there)
+    _accepted = db.Column(db.Boolean, nullable=False, default=True)
+    _drift = db.Column(db.Boolean, nullable=False, default=False)
+
+    @property
+    def node(self):
+        return self._node
+
+    @property
+    def coefficient(self):
+        return self._coefficient
+
+    @property
+    def accepted(self):
+        return self._accepted
+
+    def to_dict(self):
+        return {
+            'id': self._id,
+            'node': self._node,
+            'slot': self._slot,
+            'timestamp': self._timestamp,
+            'cpu_time_median': self._cpu_time_median,
+            'cpu_time_mad': self._cpu_time_mad,
+            'coefficient': self._coefficient,
+            'accepted': self._accepted,
+            'drift': self._drift,
+        }
+
+    @staticmethod
+    def create(node, slot, summary, reference_cpu_time=None, max_drift=0,
+               confirmations=0):
+        """Record the summary posted by calibrate.py. Without reference
+        CPU time, the first calibration ever accepted is the reference.
+        Returns None, and records nothing, if the CPU times are not
+        positive.
+
+        A calibration whose coefficient is more than max_drift times off the
+        median coefficient of the recent calibrations of the node (or off 1,
+        the reference node, for the first calibration of a node) is recorded
+        as not accepted, unless it is the last of confirmations consecutive
+        calibrations of the node within max_drift of each other (0 for no
+        confirmation). The first calibration ever, without reference CPU
+        time, always needs the confirmations. A max_drift of 0 accepts any
+        calibration."""
+        cpu_time_median = float(summary['cpu_time']['median'])
+        cpu_time_mad = float(summary['cpu_time']['mad'])
+        if not (math.isfinite(cpu_time_median) and cpu_time_median > 0 and
+                math.isfinite(cpu_time_mad) and cpu_time_mad >= 0):
+            return None
+        usual = 1.
+        if not reference_cpu_time:
+            first = Calibration.query.filter(
+                Calibration._accepted.is_(True)
+            ).order_by(Calibration._id).first()
+            if first is None:
+                reference_cpu_time = cpu_time_median
+                usual = None
+            else:
+                reference_cpu_time = first._cpu_time_median
+        coefficient = cpu_time_median / reference_cpu_time \
+            if reference_cpu_time > 0 else 1.
+        accepted, drift = True, False
+        if max_drift > 0:
+            recent = Calibration.recent_coefficients(node)
+            if recent:
+                usual = statistics.median(recent)
+            if usual is None or \
+               not usual / max_drift <= coefficient <= usual * max_drift:
+                accepted = drift = Calibration.drift_is_confirmed(
+                    node, cpu_time_median, max_drift, confirmations)
+        calibration = Calibration(_node=node,
+                                  _slot=slot,
+                                  _timestamp=int(time.time()),
+                                  _cpu_time_median=cpu_time_median,
+                                  _cpu_time_mad=cpu_time_mad,
+                                  _coefficient=coefficient,
+                                  _summary=json.dumps(summary),
+                                  _accepted=accepted,
+                                  _drift=drift)
+        db.session.add(calibration)
+        return calibration
+
+    @staticmethod
+    def drift_is_confirmed(node, cpu_time_median, max_drift, confirmations):
+        """Whether the confirmations - 1 latest calibrations of the node were
+        not accepted, and are within max_drift times of cpu_time_median."""
+        if confirmations <= 0:
+            return False
+        latest = Calibration.query.filter(
+            Calibration._node == node
+        ).order_by(Calibration._id.desc()).limit(confirmations - 1).all()
+        return len(latest) == confirmations - 1 and all(
+            not calibration._accepted and
+            1 / max_drift <= calibration._cpu_time_median / cpu_time_median
+            <= max_drift
+            for calibration in latest)
+
+    @staticmethod
+    def latest_of_node(node):
+        return Calibration.query.filter(
+            Calibration._node == node,
+            Calibration._accepted.is_(True)
+        ).order_by(Calibration._id.desc()).first()
+
+    @staticmethod
+    def recent_coefficients(node):
+        """Coefficients of the recent accepted calibrations of the node,
+        since its latest drift."""
+        recent = []
+        for coefficient, drift in db.session.query(
+            Calibration._coefficient, Calibration._drift
+        ).filter(
+            Calibration._node == node,
+            Calibration._accepted.is_(True)
+        ).order_by(Calibration._id.desc()).limit(
+                Calibration.NUMBER_OF_RECENT).all():
+            recent.append(coefficient)
+            if drift:
+                break
+        return recent
+
+    @staticmethod
+    def slot_is_due(slot, interval, now):
+        """Whether the slot was not calibrated for interval seconds."""
+        return Calibration.query.filter(
+            Calibration._slot == slot,
+            Calibration._accepted.is_(True),
+            Calibration._timestamp > now - interval
+        ).first() is None
+
+    @staticmethod
+    def history(node=None, limit=100):
+        query = Calibration.query
+        if node is not None:
+            query = query.filter(Calibration._node == node)
+        return query.order_by(Calibration._id.desc()).limit(limit).all()
+
+    def __repr__(self):
+        return (f'<Calibration {self._id} node={self._node} '
+                f'coefficient={self._coefficient} accepted={self._accepted}>')
@@ -1,17 +1,23 @@
 import docker
 import os
+import re
 import shutil
 import time
 
 from traceback import print_exc
 from app import app
+from app import cache
 from app import db
+from app import dispatcher
+from app.ec_backend import backend
+from app import result_protocol
 from app import utils
-from flask import request
+from app import vectors
+from flask import after_this_request, jsonify, request
+from .models.calibration import Calibration
 from .models.program import Program
 from .models.user import User
-from commands import (ecdsa_verify_str, decode_public, check_public_key,
-                      ec_schnorr_verify)
+from commands import decode_public, check_public_key, ec_schnorr_verify
 
 
 CODE_SUCCESS = 0
@@ -28,6 +34,92 @@ CHALLENGE_MAX_MEM_EXECUTION_IN_MB = app.config['CHALLENGE_MAX_MEM_EXECUTION_IN_M
 CHALLENGE_MAX_TIME_EXECUTION_IN_SECS = app.config['CHALLENGE_MAX_TIME_EXECUTION_IN_SECS']
 CHALLENGE_TEST_EDGE_CASES = app.config["CHALLENGE_TEST_EDGE_CASES"]
 
+# Files of the compilation cache a run may stage (see compile_and_test/cache.py)
+CACHED_FILES = (cache.OBJECT, 'harness', 'main')
+
+
+def path_to_verified_signatures_file(basename):
+    """Signatures streamed by the compile_and_test service and verified so
+    far, in order."""
+    return os.path.join('/tmp', basename + '.signatures.bin')
+
+
+def path_to_pre_execution_marker(basename, nonce):
+    """Exists from the dispatch of a run until the run starts executing the
+    submission: the run is trusted until then."""
+    return os.path.join('/tmp', f'{basename}.{nonce}.pre_execution')
+
+
+def path_to_staged_files(basename):
+    """Files compiled by the run, put in the compilation cache if the run
+    succeeds. They are in a directory named after their cache key."""
+    return os.path.join('/tmp', basename + '.staged')
+
+
+def open_pre_execution(basename, nonce):
+    remove_staged_files(basename)
+    with open(path_to_pre_execution_marker(basename, nonce), 'w'):
+        pass
+
+
+def pre_execution_is_open(basename, nonce):
+    return os.path.exists(path_to_pre_execution_marker(basename, nonce))
+
+
+def path_to_calibration_marker(basename, nonce):
+    """Exists while the launcher waits for the calibration it asked the
+    run for."""
+    return os.path.join('/tmp', f'{basename}.{nonce}.calibration')
+
+
+def close_pre_execution(basename, nonce):
+    """Returns False if the run already started executing the submission
+    (or was never dispatched). Only one of concurrent callers gets True."""
+    try:
+        os.remove(path_to_pre_execution_marker(basename, nonce))
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def messages_of(program):
+    """The messages signed by the program, generated from its seed when
+    they are sliced (see vectors.py)."""
+    return vectors.Messages(program.seed, CHALLENGE_TEST_EDGE_CASES,
+                            app.config['CHALLENGE_NUMBER_OF_TEST_VECTORS'])
+
+
+def first_wrong_signature(pubkey, messages, signatures, start=0):
+    """Index of the first signature which cannot be verified, the first
+    one being the signature of the message at index start, or None.
+    messages and signatures are bytes-like, they are never hexlified."""
+    try:
+        public_key = backend.decode_public_key(pubkey)
+    except ValueError:
+        utils.console(f"The public key {pubkey} cannot be decoded.")
+        return start
+    index = backend.first_invalid(public_key, messages, signatures,
+                                  start=start)
+    if index is not None:
+        message = messages[32*index:32*(index+1)]
+        signature = signatures[64*(index-start):64*(index-start+1)]
+        utils.console(f"The {index}-th signature cannot be verified "
+                      f"(hash={message.hex()}, pubkey={pubkey}, "
+                      f"signature={signature.hex()}).")
+    return index
+
+
+def set_status_to_test_failed_for_signature(program, messages, signatures,
+                                            index, start=0):
+    message = messages[32*index:32*(index+1)].hex()
+    signature = signatures[64*(index-start):64*(index-start+1)].hex()
+    error_message = f'''One of the tests failed:
+
+- hash      {message}
+- pubkey    {program.pubkey}
+- signature {signature}'''
+    program.set_status_to_test_failed(error_message)
+
 
 def clean_programs_timeout_to_compile_or_test():
     for _ in range(5):
@@ -35,8 +127,15 @@ def clean_programs_timeout_to_compile_or_test():
             utils.console(
                 'Try to clean programs timeout to compile or test...'
             )
+            programs = Program.get_all_programs_being_compiled_or_tested()
             Program.clean_programs_which_timeout_to_compile_or_test()
             db.session.commit()
+            # The result of a program which timed out never comes
+            for program in programs:
+                if program.status != Program.Status.submitted:
+                    basename = os.path.splitext(program.filename)[0]
+                    remove_signing_files(basename)
+                    remove_staged_files(basename)
             return True
         except:
             utils.console('Exception caught, trying again in 2sec')
@@ -47,45 +146,40 @@ def clean_programs_timeout_to_compile_or_test():
     return False
 
 
-@app.route('/compile_and_test', methods=['GET', 'POST'])
-def compile_and_test():
-    utils.console('Starting compile and test')
-
-    if not clean_programs_timeout_to_compile_or_test():
-        return ""
-
-    client = docker.from_env()
-    api_client = docker.APIClient(app.config['SOCK'])
-
-    if utils.service_runs_already(
-            client, app.config['NAME_OF_COMPILE_AND_TEST_SERVICE']):
-        utils.console(
-            'A program is currently being compiled or tested. Exiting.')
-        return ""
-
-    retry_count = 0
+def get_program_to_compile_and_test():
+    """Next program in the queue whose public key and proof-of-knowledge
+    are valid (the status of the invalid ones is set to test failed on the
+    way), or None."""
     while True:
-        try:
-            utils.console('Looking for a program to compile and test.')
-            program_to_compile_and_test = Program.get_next_program_to_compile()
-        except:
-            retry_count += 1
-            if retry_count < 5:
-                utils.console('Exception caught, trying again in 2sec')
-                time.sleep(2)
-                continue
-            else:
-                utils.console(
-                    'Could not look for a program to compile and test.')
-                utils.console('Exception:')
-                print_exc()
-                return ""
-        break
-
-    if program_to_compile_and_test is None:
-        utils.console('There is no program to compile and test. Exiting')
-        return ""
-    basename = os.path.splitext(program_to_compile_and_test.filename)[0]
+        retry_count = 0
+        while True:
+            try:
+                utils.console('Looking for a program to compile and test.')
+                program_to_compile_and_test = Program.get_next_program_to_compile()
+            except:
+                retry_count += 1
+                if retry_count < 5:
+                    utils.console('Exception caught, trying again in 2sec')
+                    time.sleep(2)
+                    continue
+                else:
+                    utils.console(
+                        'Could not look for a program to compile and test.')
+                    utils.console('Exception:')
+                    print_exc()
+                    return None
+            break
+
+        if program_to_compile_and_test is None:
+            utils.console('There is no program to compile and test. Exiting')
+            return None
+        if program_can_be_compiled_and_tested(program_to_compile_and_test):
+            return program_to_compile_and_test
+
+
+def program_can_be_compiled_and_tested(program_to_compile_and_test):
+    """Check the public key and the proof-of-knowledge of the program, set
+    its status to test failed if they are invalid."""
     pubkey_string = program_to_compile_and_test.pubkey
     proof_of_knowledge_string = program_to_compile_and_test.proof_of_knowledge
     # Make sure the key can be converted in a 16-byte string
@@ -99,7 +193,7 @@ def compile_and_test():
                       "setting the status to test failed.")
         program_to_compile_and_test.set_status_to_test_failed()
         db.session.commit()
-        return ""
+        return False
 
     if not check_public_key(Q):
         error_message = "The public key is not invalid"
@@ -107,7 +201,7 @@ def compile_and_test():
         program_to_compile_and_test.set_status_to_test_failed(
             error_message=error_message)
         db.session.commit()
-        return ""
+        return False
 
     if not ec_schnorr_verify(pubkey_string, proof_of_knowledge_string):
         error_message = "Proof-of-knowledge could not be verified"
@@ -115,16 +209,20 @@ def compile_and_test():
         program_to_compile_and_test.set_status_to_test_failed(
             error_message=error_message)
         db.session.commit()
-        return ""
+        return False
 
-    utils.console(
-        f'Preparing to compile and test a program (basename={basename})')
+    return True
 
+
+def generate_nonce(program_to_compile_and_test):
     retry_count = 0
     while True:
         try:
             utils.console('Generating nonce')
             nonce = program_to_compile_and_test.generate_nonce()
+            # The programs submitted before the seeds have none
+            if program_to_compile_and_test.seed is None:
+                program_to_compile_and_test.generate_seed()
             db.session.commit()
         except:
             retry_count += 1
@@ -136,31 +234,151 @@ def compile_and_test():
                 utils.console('Could not generate nonce.')
                 utils.console('Exception:')
                 print_exc()
-                return ""
+                return None
         break
+    return nonce
 
-    # TODO: add more constraints on the service, use https instead of http, do not hardcode the urls
-    restart_policy = docker.types.RestartPolicy(condition='on-failure',
-                                                max_attempts=1)
-    mem_limit = 2**20 * max(
-        app.config['CHALLENGE_MAX_MEM_COMPILATION_IN_MB'],
-        CHALLENGE_MAX_MEM_EXECUTION_IN_MB)  # in Bytes
-    resources = docker.types.Resources(mem_limit=mem_limit)
-    networks = [app.config['COMPILE_AND_TEST_SERVICE_NETWORK']]
-    env = [
+
+def compile_and_test_env(basename, nonce, seed):
+    # TODO: use https instead of http, do not hardcode the urls
+    return [
         'UPLOAD_FOLDER=/uploads',
         f'FILE_BASENAME={basename}',
         f'URL_TO_PING_BACK=http://launcher:5000/compile_and_test_result/{basename}/{nonce}/',
-        f'URL_FOR_FETCHING_MESSAGES=http://launcher:5000/get_messages/{basename}/{nonce}',
+        f'URL_FOR_STREAMING_SIGNATURES=http://launcher:5000/compile_and_test_signatures/{basename}/{nonce}',
+        f'URL_FOR_COMPILATION_CACHE=http://launcher:5000/compilation_cache/{basename}/{nonce}/',
+        f'URL_FOR_EXECUTION_START=http://launcher:5000/execution_start/{basename}/{nonce}',
         f'CHALLENGE_MAX_MEM_COMPILATION_IN_MB={app.config["CHALLENGE_MAX_MEM_COMPILATION_IN_MB"]}',
         f'CHALLENGE_MAX_TIME_COMPILATION_IN_SECS={app.config["CHALLENGE_MAX_TIME_COMPILATION_IN_SECS"]}',
         f'CHALLENGE_MAX_BINARY_SIZE_IN_MB={CHALLENGE_MAX_BINARY_SIZE_IN_MB}',
         f'CHALLENGE_MAX_MEM_EXECUTION_IN_MB={CHALLENGE_MAX_MEM_EXECUTION_IN_MB}',
         f'CHALLENGE_MAX_TIME_EXECUTION_IN_SECS={app.config["CHALLENGE_MAX_TIME_EXECUTION_IN_SECS"]}',
         f'CHALLENGE_NUMBER_OF_TEST_VECTORS={app.config["CHALLENGE_NUMBER_OF_TEST_VECTORS"]}',
-        f'CHALLENGE_NUMBER_OF_TEST_EDGE_CASES={len(CHALLENGE_TEST_EDGE_CASES)}',
+        f'CHALLENGE_TEST_EDGE_CASES={vectors.encode_edge_cases(CHALLENGE_TEST_EDGE_CASES)}',
+        f'TEST_VECTORS_SEED={seed}',
+        f'EXECUTION_MODE={app.config["COMPILE_AND_TEST_EXECUTION_MODE"]}',
+        f'EXECUTION_WORKERS={app.config["COMPILE_AND_TEST_EXECUTION_WORKERS"]}',
+        'COMPILATION_CACHE_DIR=/cache',
+        f'COMPILATION_CACHE_MAX_SIZE_IN_MB={app.config["COMPILATION_CACHE_MAX_SIZE_IN_MB"]}',
+        f'SIGNATURES_BATCH_SIZE={app.config["COMPILE_AND_TEST_SIGNATURES_BATCH_SIZE"]}',
+        f'BENCHMARK_WARM_UP_RUNS={app.config["BENCHMARK_WARM_UP_RUNS"]}',
+        f'BENCHMARK_REPETITIONS={app.config["BENCHMARK_REPETITIONS"]}',
+        f'BENCHMARK_ESTIMATOR={app.config["BENCHMARK_ESTIMATOR"]}',
+        f'BENCHMARK_TRIMMED_MEASURES={app.config["BENCHMARK_TRIMMED_MEASURES"]}',
+        f'BENCHMARK_CONFIDENCE={app.config["BENCHMARK_CONFIDENCE"]}',
+        f'BENCHMARK_OUTLIER_THRESHOLD={app.config["BENCHMARK_OUTLIER_THRESHOLD"]}',
     ]
 
+
+def calibration_env(basename, nonce, slot_name):
+    """Ask the program's run to calibrate the node first if the slot was
+    not calibrated for CALIBRATION_INTERVAL_IN_SECS."""
+    interval = app.config['CALIBRATION_INTERVAL_IN_SECS']
+    if interval <= 0 or \
+       not Calibration.slot_is_due(slot_name, interval, int(time.time())):
+        return []
+    utils.console(f'The slot {slot_name} will be calibrated')
+    with open(path_to_calibration_marker(basename, nonce), 'w'):
+        pass
+    return [
+        'CALIBRATE=True',
+        f'URL_FOR_CALIBRATION_RESULT=http://launcher:5000/calibration/{basename}/{nonce}',
+        f'CALIBRATION_NUMBER_OF_MESSAGES={app.config["CALIBRATION_NUMBER_OF_MESSAGES"]}',
+    ]
+
+
+def normalize_time_factor(time_factor, program):
+    """The time factor as measured on the reference node, using the latest
+    calibration of the node the program ran on, and this calibration (None
+    if there is none)."""
+    node = program.slot
+    if app.config['CALIBRATION_INTERVAL_IN_SECS'] <= 0 or node is None:
+        return (time_factor, None)
+    calibration = Calibration.latest_of_node(node)
+    if calibration is None or calibration.coefficient <= 0:
+        utils.console(f'The node {node} was never calibrated')
+        return (time_factor, None)
+    return (time_factor / calibration.coefficient, calibration)
+
+
+@app.before_request
+def start_dispatcher():
+    # uwsgi forks the processes after the application is loaded
+    dispatcher.start(dispatch_programs)
+
+
+@app.route('/compile_and_test', methods=['GET', 'POST'])
+def compile_and_test():
+    """Called by the web service when a program is submitted, the
+    dispatcher starts it right away if a slot is free."""
+    dispatcher.wake()
+    return ""
+
+
+def wake_up_dispatcher_after_this_request():
+    """The dispatcher must see the changes committed by the current
+    request."""
+    @after_this_request
+    def wake_up_dispatcher(response):
+        dispatcher.wake()
+        return response
+
+
+def dispatch_programs():
+    utils.console('Starting compile and test')
+
+    if not clean_programs_timeout_to_compile_or_test():
+        return
+
+    if app.config['COMPILE_AND_TEST_DISPATCH'] == 'pool':
+        # The workers of the pool pull the programs themselves
+        utils.console('Programs are dispatched to the pool. Exiting.')
+        return
+
+    client = docker.from_env()
+    api_client = docker.APIClient(app.config['SOCK'])
+
+    # We fill every free slot
+    for slot in app.config['COMPILE_AND_TEST_SLOTS']:
+        if utils.service_runs_already(client, slot['name']):
+            utils.console('A program is currently being compiled or tested '
+                          f'in the slot {slot["name"]}.')
+            continue
+        if not compile_and_test_in_slot(client, slot):
+            return
+
+
+def compile_and_test_in_slot(client, slot):
+    """Start the compile_and_test service of the slot for the next program.
+    Returns False if no program was started."""
+    program_to_compile_and_test = get_program_to_compile_and_test()
+    if program_to_compile_and_test is None:
+        return False
+    basename = os.path.splitext(program_to_compile_and_test.filename)[0]
+
+    utils.console(
+        f'Preparing to compile and test a program (basename={basename}) '
+        f'in the slot {slot["name"]}')
+
+    nonce = generate_nonce(program_to_compile_and_test)
+    if nonce is None:
+        return False
+    open_pre_execution(basename, nonce)
+
+    # TODO: add more constraints on the service
+    restart_policy = docker.types.RestartPolicy(condition='on-failure',
+                                                max_attempts=1)
+    mem_limit = 2**20 * slot['mem_limit_in_mb']  # in Bytes
+    resources = docker.types.Resources(mem_limit=mem_limit)
+    networks = [app.config['COMPILE_AND_TEST_SERVICE_NETWORK']]
+    env = compile_and_test_env(basename, nonce,
+                               program_to_compile_and_test.seed)
+    env += calibration_env(basename, nonce, slot['name'])
+    # The sandbox pins itself to the cores of the slot
+    env.append(f'CPU_SET={slot["cpu_set"]}')
+    # Expanded by docker, reported in the logs and the benchmark summaries
+    env.append('NODE_NAME={{.Node.Hostname}}')
+
     # We copy the source file from /uploads to a fresh directory in /compilations
     dir_for_compilation = basename
     path_for_compilations = os.path.join('/compilations', dir_for_compilation)
@@ -177,12 +395,15 @@ def compile_and_test():
     mounts = [
         '/whitebox_program_uploads/compilations/%s:/uploads:ro' % dir_for_compilation
     ]
+    if app.config['COMPILATION_CACHE_MAX_SIZE_IN_MB'] > 0:
+        # Only the launcher writes the cache
+        mounts.append('/whitebox_program_uploads/cache:/cache:ro')
     service = client.services.create(
         image='crx/compile_and_test',
         mounts=mounts,
         env=env,
         constraints=['node.labels.vm == node-sandbox'],
-        name=app.config['NAME_OF_COMPILE_AND_TEST_SERVICE'],
+        name=slot['name'],
         restart_policy=restart_policy,
         labels={'basename': str(basename)},
         networks=networks,
@@ -197,6 +418,7 @@ def compile_and_test():
         try:
             utils.console(f'Setting the program\'s task id to {task_id}')
             program_to_compile_and_test.task_id = task_id
+            program_to_compile_and_test.slot = slot['name']
             db.session.commit()
         except:
             retry_count += 1
@@ -208,37 +430,290 @@ def compile_and_test():
                 utils.console('Could not set the program task ide.')
                 utils.console('Exception:')
                 print_exc()
-                return ""
+                return False
         break
 
     utils.console('End of the compile_and_test procedure for the program:')
     utils.console(str(program_to_compile_and_test))
 
-    return "youpi"
+    return True
 
 
-@app.route('/get_messages/<string:basename>/<string:nonce>',
-           methods=['GET'])
-def get_messages(basename, nonce):
+def pool_task_id(worker):
+    return f'pool-{worker}'[:32]
+
+
+@app.route('/pool/register/<string:worker>', methods=['POST'])
+def pool_register(worker):
+    """Called by a worker of the compile_and_test pool when it starts. A
+    program still assigned to this worker was lost by its previous
+    incarnation."""
+    utils.console(f'The pool worker {worker} registers')
+    try:
+        for program in Program.get_programs_being_compiled_by(
+                pool_task_id(worker)):
+            program.set_status_to_execution_failed(
+                'Compilation and/or testing failed for unknown reason.')
+        db.session.commit()
+    except:
+        utils.console(f'Could not register the pool worker {worker}')
+        print_exc()
+        return jsonify(registered=False)
+    return jsonify(registered=True)
+
+
+@app.route('/pool/next_job/<string:worker>', methods=['GET', 'POST'])
+def pool_next_job(worker):
+    """Assign the next program to a worker of the compile_and_test pool.
+    Answers with the environment of compile_and_test.py, or with an empty
+    204 response if there is nothing to do."""
+    if app.config['COMPILE_AND_TEST_DISPATCH'] != 'pool':
+        return "", 204
+
+    if not clean_programs_timeout_to_compile_or_test():
+        return "", 204
+
+    program_to_compile_and_test = get_program_to_compile_and_test()
+    if program_to_compile_and_test is None:
+        return "", 204
+
+    # Another worker may have taken the same program in the meantime
+    try:
+        claimed = program_to_compile_and_test.claim(pool_task_id(worker),
+                                                    worker)
+        db.session.commit()
+    except:
+        utils.console('Could not claim the program')
+        print_exc()
+        db.session.rollback()
+        return "", 204
+    if not claimed:
+        utils.console('The program was claimed by another worker')
+        return "", 204
+
+    basename = os.path.splitext(program_to_compile_and_test.filename)[0]
+    nonce = generate_nonce(program_to_compile_and_test)
+    if nonce is None:
+        return "", 204
+    open_pre_execution(basename, nonce)
+
+    utils.console(f'The pool worker {worker} compiles and tests the program '
+                  f'with basename {basename}')
+    return jsonify(
+        basename=basename,
+        env=(compile_and_test_env(basename, nonce,
+                                  program_to_compile_and_test.seed) +
+             calibration_env(basename, nonce, worker)),
+        url_for_fetching_source=f'http://launcher:5000/pool/source/{basename}/{nonce}',
+        recycle=app.config['COMPILE_AND_TEST_POOL_RECYCLE'])
+
+
+@app.route('/pool/source/<string:basename>/<string:nonce>', methods=['GET'])
+def pool_source(basename, nonce):
+    if not utils.basename_and_nonce_are_valid(basename, nonce):
+        return ""
+
+    with open(os.path.join('/uploads', basename + '.c'), 'rb') as f:
+        return f.read()
+
+
+@app.route('/compile_and_test_signatures/<string:basename>/<string:nonce>',
+           methods=['POST'])
+def compile_and_test_signatures(basename, nonce):
+    """Verify a batch of the signatures while the compile_and_test service
+    computes them. The service stops as soon as we answer "abort"."""
     if not utils.basename_and_nonce_are_valid(basename, nonce):
+        return jsonify(status='abort')
+
+    program = Program.get(basename)
+    if program.status != Program.Status.submitted:
+        utils.console(f"The program {program._id} status is {program.status}. "
+                      "No need to verify its signatures.")
+        return jsonify(status='abort')
+
+    offset = request.args.get('offset', type=int)
+    signatures = memoryview(request.get_data(cache=False))
+    path_to_signatures_file = path_to_verified_signatures_file(basename)
+    try:
+        number_of_verified = os.path.getsize(path_to_signatures_file) // 64
+    except OSError:
+        number_of_verified = 0
+    if offset != number_of_verified or len(signatures) % 64 != 0:
+        # The final result will verify them anyway
+        utils.console(f"Ignoring a batch of signatures at offset {offset} "
+                      f"(expecting offset {number_of_verified})")
+        return jsonify(status='continue')
+
+    messages = messages_of(program)
+    if len(messages) < 32 * offset + len(signatures) // 2:
+        utils.console("Received more signatures than messages")
+        return jsonify(status='continue')
+
+    index = first_wrong_signature(program.pubkey, messages, signatures,
+                                  start=offset)
+    if index is None:
+        with open(path_to_signatures_file, 'ab') as f:
+            f.write(signatures)
+        return jsonify(status='continue')
+
+    # Stop the run now instead of waiting for all the signatures
+    set_status_to_test_failed_for_signature(program, messages,
+                                            signatures, index,
+                                            start=offset)
+    db.session.commit()
+    wake_up_dispatcher_after_this_request()
+    utils.console(f"Aborting the compile and test of {basename}")
+    client = docker.from_env()
+    utils.remove_compiler_service_for_basename(client, basename, app)
+    remove_compilation_dir(basename)
+    remove_signing_files(basename)
+    remove_staged_files(basename)
+    return jsonify(status='abort')
+
+
+@app.route('/compilation_cache/<string:basename>/<string:nonce>/<string:name>',
+           methods=['POST'])
+def compilation_cache_stage(basename, nonce, name):
+    """Stage a file compiled by the run, before it executes the submission.
+    The key of the entry is computed here from the source."""
+    if not utils.basename_and_nonce_are_valid(basename, nonce):
+        return ""
+    if not pre_execution_is_open(basename, nonce):
+        utils.console(f"Ignoring {name} staged by {basename} after the "
+                      "execution started")
+        return ""
+    compilation_cache = get_compilation_cache()
+    fingerprint = request.args.get('fingerprint', '')
+    data = request.get_data(cache=False)
+    max_size = 2 * 2**20 * CHALLENGE_MAX_BINARY_SIZE_IN_MB
+    if compilation_cache is None or name not in CACHED_FILES or \
+       not re.fullmatch('[0-9a-f]{64}', fingerprint) or \
+       len(data) > max_size:
+        utils.console(f"Ignoring {name} staged by {basename}")
+        return ""
+
+    key = compilation_cache.key(os.path.join('/uploads', basename + '.c'),
+                                fingerprint)
+    path = os.path.join(path_to_staged_files(basename), key)
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, name), 'wb') as f:
+        f.write(data)
+    os.chmod(os.path.join(path, name), 0o755)
+    return ""
+
+
+@app.route('/execution_start/<string:basename>/<string:nonce>',
+           methods=['POST'])
+def execution_start(basename, nonce):
+    """Called by the run right before it executes the submission, which
+    knows the nonce: the run is not trusted anymore."""
+    if not utils.basename_and_nonce_are_valid(basename, nonce):
+        return jsonify(started=False)
+    return jsonify(started=close_pre_execution(basename, nonce))
+
+
+def get_compilation_cache():
+    max_size = app.config['COMPILATION_CACHE_MAX_SIZE_IN_MB']
+    if max_size <= 0:
+        return None
+    return cache.CompilationCache('/cache', max_size * 2**20)
+
+
+def put_staged_files_in_compilation_cache(basename):
+    """The run succeeded, its staged files go to the compilation cache."""
+    compilation_cache = get_compilation_cache()
+    path = path_to_staged_files(basename)
+    if compilation_cache is None or not os.path.isdir(path):
+        return
+    try:
+        for key in os.listdir(path):
+            entry = os.path.join(path, key)
+            compilation_cache.put(key, {
+                name: os.path.join(entry, name)
+                for name in os.listdir(entry)})
+    except:
+        utils.console('Could not update the compilation cache')
+        print_exc()
+
+
+@app.route('/calibration/<string:basename>/<string:nonce>',
+           methods=['POST'])
+def calibration(basename, nonce):
+    """Record the calibration of the node made by the run of a program. It
+    is accepted once, if we asked for it, and only before the run executes
+    the submission."""
+    if not utils.basename_and_nonce_are_valid(basename, nonce):
+        return ""
+    if not pre_execution_is_open(basename, nonce):
+        utils.console(f"Ignoring a calibration of {basename} posted after "
+                      "the execution started")
+        return ""
+    try:
+        os.remove(path_to_calibration_marker(basename, nonce))
+    except FileNotFoundError:
+        utils.console(f"Ignoring a calibration of {basename} we did not "
+                      "ask for")
         return ""
 
-    path_to_message_file = os.path.join('/tmp', basename + '.message.bin')
+    # The node is the one we dispatched the run to
+    program = Program.get(basename)
+    summary = request.get_json()
+    try:
+        calibration = Calibration.create(
+            program.slot, program.slot, summary,
+            app.config['CALIBRATION_REFERENCE_CPU_TIME_IN_SECS'],
+            app.config['CALIBRATION_MAX_DRIFT'],
+            app.config['CALIBRATION_CONFIRMATIONS'])
+        db.session.commit()
+    except:
+        utils.console('Could not record the calibration')
+        print_exc()
+        db.session.rollback()
+        return ""
+    if calibration is None:
+        utils.console(f'Rejected the calibration of {program.slot}: '
+                      f'{summary.get("cpu_time")}')
+        return ""
+    if not calibration.accepted:
+        utils.console(f'WARNING The calibration of {program.slot} is off '
+                      f'its recent ones, not accepted until confirmed: '
+                      f'{calibration}')
+        return ""
+    utils.console(f'Recorded {calibration}')
+    return ""
 
-    # If it doesn't already exist, create the file containting the messages
-    if not os.path.exists(path_to_message_file):
-        with open(path_to_message_file, 'wb') as f:
 
-            for case in CHALLENGE_TEST_EDGE_CASES:
-                f.write(case.to_bytes(32, byteorder="big"))
+@app.route('/calibration/history', methods=['GET'])
+def calibration_history():
+    """Latest calibrations, for the operators to spot drifting or throttled
+    nodes."""
+    calibrations = Calibration.history(
+        node=request.args.get('node'),
+        limit=request.args.get('limit', 100, type=int))
+    return jsonify(calibrations=[c.to_dict() for c in calibrations])
 
-            f.write(os.urandom(
-                32 * app.config['CHALLENGE_NUMBER_OF_TEST_VECTORS']))
 
-    with open(path_to_message_file, 'rb') as f:
-        messages = f.read()
+def remove_compilation_dir(basename):
+    dir_for_compilation = basename
+    path_for_compilations = os.path.join('/compilations', dir_for_compilation)
+    utils.console(f'Trying to remove {path_for_compilations}')
+    try:
+        shutil.rmtree(path_for_compilations)
+    except:
+        utils.console(f'Could NOT remove the dir {path_for_compilations}')
+
+
+def remove_staged_files(basename):
+    shutil.rmtree(path_to_staged_files(basename), ignore_errors=True)
 
-    return messages
+
+def remove_signing_files(basename):
+    path = path_to_verified_signatures_file(basename)
+    try:
+        os.remove(path)
+        utils.console("We removed the file %s" % path)
+    except:
+        utils.console("Could NOT remove the file %s" % path)
 
 
 def process_compile_and_test_ret(program, request, basename, ret):
@@ -305,14 +780,23 @@ def compile_and_test_result(basename, nonce, ret):
         utils.console("Exception takes place ... (1)")
         return ""
 
+    # Whatever the result, the slot of the program is free again
+    wake_up_dispatcher_after_this_request()
+
+    @after_this_request
+    def remove_files_of_the_run(response):
+        remove_staged_files(basename)
+        for path in (path_to_pre_execution_marker(basename, nonce),
+                     path_to_calibration_marker(basename, nonce),
+                     path_to_verified_signatures_file(basename)):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        return response
+
     # We (try to) remove the compilation directory
-    dir_for_compilation = basename
-    path_for_compilations = os.path.join('/compilations', dir_for_compilation)
-    utils.console(f'Trying to remove {path_for_compilations}')
-    try:
-        shutil.rmtree(path_for_compilations)
-    except:
-        utils.console(f'Could NOT remove the dir {path_for_compilations}')
+    remove_compilation_dir(basename)
 
     # We process the ret code
     process_compile_and_test_ret(program, request, basename, ret)
@@ -328,19 +812,33 @@ def compile_and_test_result(basename, nonce, ret):
 
     # If we reach this point, the program was successfully compiled,
     # we get performance factors
-    postdata = request.get_json()
-    size_factor = postdata['size_factor']
-    ram_factor = postdata['ram_factor']
-    time_factor = postdata['time_factor']
-    program.set_performance_factor(size_factor, ram_factor, time_factor)
+    try:
+        result = result_protocol.decode(request.get_data(cache=False))
+    except ValueError as e:
+        utils.console(f"Could not decode the result: {e}")
+        program.set_status_to_test_failed(
+            "The result of the tests could not be decoded.")
+        db.session.commit()
+        return ""
+    benchmark_summary = result.benchmark_summary
+    time_factor, calibration = normalize_time_factor(result.time_factor,
+                                                     program)
+    if calibration is not None:
+        utils.console(f"Time factor {result.time_factor} normalized to "
+                      f"{time_factor} ({calibration})")
+        benchmark_summary['measured_time_factor'] = result.time_factor
+        benchmark_summary['calibration'] = calibration.to_dict()
+    program.set_performance_factor(result.size_factor, result.ram_factor,
+                                   time_factor)
+    program.benchmark_summary = benchmark_summary
 
     # we can test the signatures
-    signatures = bytes.fromhex(postdata['signatures'])
+    signatures = result.signatures
     number_of_test_vectors = app.config['CHALLENGE_NUMBER_OF_TEST_VECTORS']
     number_of_test_vectors += len(CHALLENGE_TEST_EDGE_CASES)
     if len(signatures) != 64 * number_of_test_vectors:
         utils.console(f"The length of the signatures is {len(signatures)}, "
-                      f"we were expecting {32*number_of_test_vectors}.")
+                      f"we were expecting {64*number_of_test_vectors}.")
         error_message = "The stream of ciphertexts does not have the appropriate length."
         utils.console(error_message)
         program.error_message = error_message
@@ -354,48 +852,44 @@ def compile_and_test_result(basename, nonce, ret):
     utils.console("We received the appropriate number of signatures.")
     utils.console("Verify signature for messages using the announced key...")
 
-    # Retrieve the messages from the saved file
-    path_to_messages_file = os.path.join('/tmp', basename + '.message.bin')
-    with open(path_to_messages_file, 'rb') as f:
-        messages = f.read()
-
-    # Check the signature against the public key and messages.
+    # The signatures streamed during the execution were verified already
+    start = 0
+    try:
+        with open(path_to_verified_signatures_file(basename), 'rb') as f:
+            verified_signatures = f.read()
+        if signatures[:len(verified_signatures)] == verified_signatures:
+            start = len(verified_signatures) // 64
+            utils.console(f"{start} signatures were verified while streamed")
+    except OSError:
+        pass
+
+    # Check the signature against the public key and the messages,
+    # generated from the seed of the program
     # TODO the db should always return the key as 128 hexdecimal digits
     pubkey = program.pubkey
-    for i in range(number_of_test_vectors):
-        message = messages[32*i:32*(i+1)].hex()
-        signature = signatures[64*i:64*(i+1)].hex()
-        if not ecdsa_verify_str(pubkey, message, signature):
-            utils.console(f"The {i}-th signature cannot be verified "
-                          f"(hash={message}, pubkey={pubkey}, "
-                          f"signature={signature}).")
-
-            error_message = f'''One of the tests failed:
-
-- hash      {message}
-- pubkey    {pubkey}
-- signature {signature}'''
-            program.set_status_to_test_failed(error_message)
-            db.session.commit()
-            return ""
+    messages = messages_of(program)
+    index = first_wrong_signature(pubkey, messages, signatures[64*start:],
+                                  start=start)
+    if index is not None:
+        set_status_to_test_failed_for_signature(program, messages,
+                                                signatures, index)
+        db.session.commit()
+        return ""
+    messages_for_checking = messages[0:10*32]
     utils.console(f"All {number_of_test_vectors} signatures verified")
 
     # If we reach this point, all the tests were successful.
     # We save 10 test vectors for in the database
-    messages_for_checking = messages[0:10*32]
-    signatures_for_checking = signatures[0:10*64]
+    signatures_for_checking = bytes(signatures[0:10*64])
     program.hashes = messages_for_checking
     program.signatures = signatures_for_checking
 
     program.set_status_to_unbroken()
     db.session.commit()
     utils.console("The program is unbroken!")
-
-    # Cleanup
-    try:
-        os.remove(path_to_messages_file)
-        utils.console("We removed the file %s" % path_to_messages_file)
-    except:
-        utils.console("Could NOT remove the file %s" % path_to_messages_file)
+    put_staged_files_in_compilation_cache(basename)
 
     return ""
+
+
+dispatcher.start(dispatch_programs)
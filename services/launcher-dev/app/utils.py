@@ -39,7 +39,11 @@ def compute_ciphertexts(plaintexts, key, number_of_test_vectors):
 
 
 def get_service(client, service_name):
-    services = client.services.list(filters={'name': service_name})
+    # The name filter also matches the services of the other slots, whose
+    # names start with this one
+    services = [service for service in
+                client.services.list(filters={'name': service_name})
+                if service.name == service_name]
     if len(services) == 0:
         return None
     elif len(services) == 1:
@@ -48,7 +52,19 @@ def get_service(client, service_name):
         assert False
 
 
+# The states of a swarm task once it is over, every other state (new,
+# pending, assigned, preparing, starting, running...) is a task on its way
+TERMINAL_TASK_STATES = {'complete', 'failed', 'shutdown', 'rejected',
+                        'orphaned', 'remove'}
+
+
 def service_runs_already(client, service_name):
+    """Whether a program is being compiled or tested in the slot: a
+    submitted program is assigned to the slot (database) and a task of its
+    service is not over. A fresh task may take a while to reach the 'running'
+    state (image pull...) and a task restarted by swarm gets a new id, so
+    neither the 'running' state nor the task id are relied on. A slot found
+    free has its service removed."""
     compiler_service = get_service(client, service_name)
     if compiler_service is None:
         console("\tDEBUG compiler_service is None")
@@ -57,29 +73,27 @@ def service_runs_already(client, service_name):
         console("\tDEBUG compiler_service is *not* None")
         tasks = compiler_service.tasks()
         console("\tDEBUG The compiler service has %d task" % len(tasks))
-        # We look for a running task which id corresponds to a 'submitted' program
-        for task in tasks:
-            if task['Status']['State'] != 'running':
-                continue
-            running_task_id = task['ID']
-            program_being_compiled = Program.get_program_being_compiled(
-                running_task_id)
-            if program_being_compiled is not None:
-                return True
+        program_being_compiled = Program.get_program_being_compiled_in_slot(
+            service_name)
+        if program_being_compiled is not None and \
+           any(task['Status']['State'] not in TERMINAL_TASK_STATES
+               for task in tasks):
+            return True
     # If reach this point, there is no program being compiled (but there is a compiler_service to remove)
     compiler_service.remove()
     return False
 
 
 def remove_compiler_service_for_basename(client, basename, app):
-    compiler_service = get_service(
-        client, app.config['NAME_OF_COMPILE_AND_TEST_SERVICE'])
-    if compiler_service is None:
+    for slot in app.config['COMPILE_AND_TEST_SLOTS']:
+        compiler_service = get_service(client, slot['name'])
+        if compiler_service is None:
+            continue
+        if 'Labels' not in compiler_service.attrs['Spec'] or \
+           'basename' not in compiler_service.attrs['Spec']['Labels']:
+            continue
+        if compiler_service.attrs['Spec']['Labels']['basename'] != basename:
+            continue
+        compiler_service.remove()
+        console("We just removed a compiler service for basename %s" % basename)
         return
-    if 'Labels' not in compiler_service.attrs['Spec'] or \
-       'basename' not in compiler_service.attrs['Spec']['Labels']:
-        return
-    if compiler_service.attrs['Spec']['Labels']['basename'] != basename:
-        return
-    compiler_service.remove()
-    console("We just removed a compiler service for basename %s" % basename)
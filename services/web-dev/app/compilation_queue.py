@@ -0,0 +1,66 @@
+"""Snapshot of the compilation queue: the positions of all the waiting
+programs, and the times their compilation should start.
+
+The snapshot costs two queries whatever the number of programs shown: the
+submitted programs in the order the launcher takes them, and the durations
+of the last compilations and tests. The programs being compiled or tested
+occupy the slots, so the waiting program at position p should start after
+ceil(p / slots) more jobs per slot, each taking the median of the last
+durations."""
+
+import statistics
+import time
+
+from app import utils
+from app.models.program import Program
+
+# Number of finished jobs the durations are estimated from
+NUMBER_OF_DURATIONS = 20
+
+
+class CompilationQueue:
+
+    def __init__(self, queue, durations, now):
+        self._in_progress = {_id for _id, task_id in queue
+                             if task_id is not None}
+        # Id -> position (1 for the next program)
+        self._positions = {
+            _id: position for position, _id in enumerate(
+                [_id for _id, task_id in queue if task_id is None], 1)}
+        self._duration = statistics.median(durations) if durations else None
+        self._slots = max(1, len(self._in_progress))
+        self._now = now
+
+    @staticmethod
+    def snapshot(now=None):
+        if now is None:
+            now = int(time.time())
+        return CompilationQueue(
+            Program.get_compilation_queue(),
+            Program.get_last_compilation_durations(NUMBER_OF_DURATIONS),
+            now)
+
+    def position(self, program):
+        if program._id in self._in_progress:
+            return 'In progress'
+        position = self._positions.get(program._id)
+        if position is None:
+            return None
+        if position == 1:
+            return "Next"
+        return str(position)
+
+    def estimated_start(self, program):
+        """Timestamp at which the compilation of the waiting program should
+        start, None if unknown."""
+        position = self._positions.get(program._id)
+        if position is None or self._duration is None:
+            return None
+        rounds = -(-position // self._slots)
+        return self._now + int(rounds * self._duration)
+
+    def datetime_estimated_start(self, program):
+        timestamp = self.estimated_start(program)
+        if timestamp is None:
+            return None
+        return utils.format_timestamp(timestamp)
@@ -31,6 +31,12 @@ SQLALCHEMY_DATABASE_URI = 'mysql+pymysql://{0}:{1}@{2}:{3}/{4}'.format(
 )
 SQLALCHEMY_POOL_SIZE = 0
 UPLOAD_FOLDER = os.environ['UPLOAD_FOLDER']
+# The responses about the published programs are exported there, for nginx
+# to serve them (see exports.py), nothing is exported if empty
+EXPORT_FOLDER = os.environ.get('EXPORT_FOLDER', '')
+# nginx sends the sources from this internal location (see sources.py), the
+# app sends them itself if empty
+ACCEL_REDIRECT_PREFIX = os.environ.get('ACCEL_REDIRECT_PREFIX', '')
 
 ###############################
 # Challenge's related variables
@@ -63,6 +69,19 @@ FINAL_DEADLINE = int(os.environ['FINAL_DEADLINE'])
 
 URL_COMPILE_AND_TEST = os.environ['URL_COMPILE_AND_TEST']
 
+# The strawberries and the rankings are updated in the background at this
+# interval (see scoring.py)
+SCORING_INTERVAL_IN_SECS = int(os.environ.get('SCORING_INTERVAL_IN_SECS', 60))
+
+# The tables of the index page are cached on the version of the scores (see
+# fragments.py)
+FRAGMENT_CACHE_BACKEND = os.environ.get('FRAGMENT_CACHE_BACKEND', 'lru')
+FRAGMENT_CACHE_SIZE = int(os.environ.get('FRAGMENT_CACHE_SIZE', 16))
+
+# Number of entries of the Atom feed (the latest publications), 0 for all
+# of them (see feed.py)
+FEED_MAX_ENTRIES = int(os.environ.get('FEED_MAX_ENTRIES', 0))
+
 RECAPTCHA_PUBLIC_KEY = os.environ['RECAPTCHA_PUBLIC_KEY']
 RECAPTCHA_PRIVATE_KEY = os.environ['RECAPTCHA_PRIVATE_KEY']
 RECAPTCHA_PARAMETERS = {'hl': 'en'}
@@ -0,0 +1,160 @@
+"""Elliptic curve operations on the contest keys, delegated to the fastest
+backend available:
+
+- 'cryptography': OpenSSL, through the cryptography package,
+- 'gmpy2': the pure Python code of p256.py on GMP integers,
+- 'python': the pure Python code of p256.py, and of commands.py from the
+  supplementary materials.
+
+The backend is chosen by the EC_BACKEND environment variable ('auto' by
+default, the first available one in the order above). All the backends
+must agree on every input: tests/test_ec_backend.py checks them against the
+same vectors, and scripts/benchmark_ec_backend.py compares their speed.
+
+This file and p256.py are copied into the launcher (see the Makefile)."""
+
+import os
+
+try:
+    from . import p256
+except ImportError:
+    import p256
+
+try:
+    import commands
+except ImportError:
+    commands = None
+
+try:
+    import gmpy2
+except ImportError:
+    gmpy2 = None
+
+try:
+    from cryptography.exceptions import InvalidSignature
+    from cryptography.hazmat.backends import default_backend
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from cryptography.hazmat.primitives.asymmetric.utils import (
+        Prehashed, encode_dss_signature)
+except ImportError:
+    ec = None
+
+
+def _private_key_as_int(prikey):
+    """The private key given as (at most) 64 hexadecimal digits, or
+    None."""
+    try:
+        d = int(prikey, 16)
+    except (TypeError, ValueError):
+        return None
+    if len(prikey) > 64 or not 0 < d < p256.N:
+        return None
+    return d
+
+
+class PythonBackend:
+
+    name = 'python'
+
+    def decode_public_key(self, pubkey):
+        """Opaque public key of this backend. Raises ValueError if pubkey
+        is not 128 hexadecimal digits encoding a point of the curve."""
+        return p256.decode_public_key(pubkey)
+
+    def check_public_key(self, pubkey):
+        try:
+            self.decode_public_key(pubkey)
+        except ValueError:
+            return False
+        return True
+
+    def first_invalid(self, public_key, messages, signatures, start=0):
+        """See p256.first_invalid."""
+        return p256.first_invalid(public_key, messages, signatures,
+                                  start=start)
+
+    def public_key_of(self, d):
+        """Public key (as 128 hexadecimal digits) of the private key d."""
+        x, y = p256.base_multiple(d)
+        return f'{x:064x}{y:064x}'
+
+    def validate_private_key(self, prikey, pubkey):
+        """Whether prikey is the private key of pubkey. The usual
+        hexadecimal form is checked here, commands.py has the final word
+        on the others."""
+        d = _private_key_as_int(prikey)
+        if d is not None and self.public_key_of(d) == pubkey.lower():
+            return True
+        if commands is None:
+            return False
+        return commands.validate_private_key(prikey, pubkey)
+
+
+class Gmpy2Backend(PythonBackend):
+
+    name = 'gmpy2'
+
+    def decode_public_key(self, pubkey):
+        # The arithmetic of p256.py runs on whatever integers it is given
+        x, y = p256.decode_public_key(pubkey)
+        return (gmpy2.mpz(x), gmpy2.mpz(y))
+
+
+class CryptographyBackend(PythonBackend):
+
+    name = 'cryptography'
+
+    def decode_public_key(self, pubkey):
+        x, y = p256.decode_public_key(pubkey)
+        return ec.EllipticCurvePublicNumbers(
+            x, y, ec.SECP256R1()).public_key(default_backend())
+
+    def first_invalid(self, public_key, messages, signatures, start=0):
+        # The messages are the hashes to sign
+        algorithm = ec.ECDSA(Prehashed(hashes.SHA256()))
+        signatures = memoryview(signatures)
+        for i in range(len(signatures) // 64):
+            message = bytes(messages[32*(start+i):32*(start+i+1)])
+            r = int.from_bytes(signatures[64*i:64*i+32], 'big')
+            s = int.from_bytes(signatures[64*i+32:64*(i+1)], 'big')
+            if len(message) != 32 or not (0 < r < p256.N and 0 < s < p256.N):
+                return start + i
+            try:
+                public_key.verify(encode_dss_signature(r, s), message,
+                                  algorithm)
+            except InvalidSignature:
+                return start + i
+        return None
+
+    def public_key_of(self, d):
+        numbers = ec.derive_private_key(
+            d, ec.SECP256R1(), default_backend()).public_key().public_numbers()
+        return f'{numbers.x:064x}{numbers.y:064x}'
+
+
+def available_backends():
+    backends = list()
+    if ec is not None:
+        backends.append(CryptographyBackend())
+    if gmpy2 is not None:
+        backends.append(Gmpy2Backend())
+    backends.append(PythonBackend())
+    return backends
+
+
+def get_backend(name=None):
+    """The backend called name ('auto' for the fastest available one)."""
+    if name is None:
+        name = os.environ.get('EC_BACKEND', 'auto')
+    backends = available_backends()
+    if name == 'auto':
+        return backends[0]
+    for backend in backends:
+        if backend.name == name:
+            return backend
+    raise ValueError(f"The elliptic curve backend {name} is not available")
+
+
+backend = get_backend()
+
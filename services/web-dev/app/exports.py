@@ -0,0 +1,81 @@
+"""Responses about the published programs which never change: the sample
+(/candidate/<id>, serialized when the program is published), the public key
+and the proof of knowledge.
+
+They are served with an ETag (a hash of their content) and cached for a
+year by the browsers and the proxies. If EXPORT_FOLDER is set, each of
+them is also written there the first time it is served, where nginx serves
+it directly from then on (see nginx_vhost.conf):
+
+    EXPORT_FOLDER/candidate/<id>/sample.json
+    EXPORT_FOLDER/candidate/<id>/pubkey
+    EXPORT_FOLDER/candidate/<id>/proof-of-knowledge
+
+The command `flask export-candidates` exports all the published
+programs at once."""
+
+import hashlib
+import os
+import tempfile
+
+from flask import Response, request
+
+from app import app
+from app import utils
+from app.models.program import Program
+
+CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# Name -> (file name, mimetype, content of a published program)
+EXPORTS = {
+    'sample': ('sample.json', 'application/json',
+               lambda program: program.sample),
+    'pubkey': ('pubkey', 'text/html',
+               lambda program: program.pubkey),
+    'proof_of_knowledge': ('proof-of-knowledge', 'text/html',
+                           lambda program: program.proof_of_knowledge),
+}
+
+
+def response(program, name):
+    """The response of the published program for the export name."""
+    filename, mimetype, content = EXPORTS[name]
+    data = content(program).encode()
+    if app.config['EXPORT_FOLDER']:
+        export(program._id, filename, data)
+    response = Response(data, mimetype=mimetype)
+    response.set_etag(hashlib.blake2b(data, digest_size=16).hexdigest())
+    response.headers['Cache-Control'] = CACHE_CONTROL
+    return response.make_conditional(request)
+
+
+def export(identifier, filename, data):
+    folder = os.path.join(app.config['EXPORT_FOLDER'], 'candidate',
+                          str(identifier))
+    path = os.path.join(folder, filename)
+    if os.path.exists(path):
+        return
+    try:
+        os.makedirs(folder, exist_ok=True)
+        # Written aside then renamed, nginx never serves a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=folder)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        utils.console(f"Could not export {path}: {e}")
+
+
+@app.cli.command('export-candidates')
+def export_candidates():
+    """Export the responses of all the published programs."""
+    if not app.config['EXPORT_FOLDER']:
+        utils.console("EXPORT_FOLDER is not set")
+        return
+    for _id, *_ in Program.get_all_published_states():
+        program = Program.get_by_id_with_sample(_id)
+        for filename, _, content in EXPORTS.values():
+            if content(program):
+                export(program._id, filename, content(program).encode())
+    utils.console("Published programs exported")
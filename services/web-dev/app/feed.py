@@ -0,0 +1,119 @@
+"""The Atom feed of the published programs, kept serialized.
+
+Each process keeps the feed it served last, with the XML of each entry.
+When the version of the contest state changes (see
+models/contest_state.py), only the publication states of the programs are
+queried: the entries of the new programs and of the programs whose status
+changed are rendered and the feed is put together again, the others are
+reused. The feed is served with an ETag (a hash of its content) and a
+Last-Modified date, so that the readers polling it get a 304 Not Modified
+while it does not change.
+
+FEED_MAX_ENTRIES caps the number of entries (the latest publications), 0
+for all of them."""
+
+import hashlib
+import threading
+from datetime import datetime
+
+from feedwerk.atom import AtomFeed, FeedEntry
+from flask import Response, render_template, request
+
+from app import app
+from app import scoring
+from app.models.program import Program
+
+TITLE = 'WhibOx Contest 3nd Edition -- CHES 2021 Challenge'
+SUBTITLE = 'Submitted challenged order by published date descending'
+AUTHOR = 'WhibOx organizing committee'
+END = '</feed>\n'
+
+_lock = threading.Lock()
+_feeds = dict()
+
+
+class Feed:
+    """The feed served at feed_url, for the last version it was updated
+    to."""
+
+    def __init__(self, feed_url, url_root):
+        self.feed_url = feed_url
+        self.url_root = url_root
+        self.version = None
+        self.states = None
+        # Id of the program -> (status, XML of its entry)
+        self.entries = dict()
+        self.data = None
+        self.etag = None
+        self.last_modified = None
+
+    def update(self, version):
+        states = Program.get_all_published_states()
+        max_entries = app.config['FEED_MAX_ENTRIES']
+        if max_entries:
+            states = states[-max_entries:]
+        self.version = version
+        if states == self.states:
+            return
+        self.states = states
+
+        changed = [_id for _id, status, *_ in states
+                   if self.entries.get(_id, (None,))[0] != status]
+        entries = {_id: self.entries[_id] for _id, *_ in states
+                   if _id in self.entries}
+        for program in Program.get_published_by_ids(changed):
+            entries[program._id] = (program._status,
+                                    self.render_entry(program))
+        self.entries = entries
+
+        timestamps = [t for _, _, published, first_break in states
+                      for t in (published, first_break) if t is not None]
+        self.last_modified = datetime.fromtimestamp(
+            max(timestamps, default=app.config['STARTING_DATE']))
+        header = AtomFeed(TITLE, feed_url=self.feed_url, url=self.url_root,
+                          author=AUTHOR, subtitle=SUBTITLE,
+                          updated=self.last_modified).to_string()
+        # Entries of the programs which vanished meanwhile are skipped
+        self.data = ''.join(
+            [header[:-len(END)]] +
+            [self.entries[_id][1] for _id, *_ in states
+             if _id in self.entries] +
+            [END]).encode()
+        self.etag = hashlib.blake2b(self.data, digest_size=16).hexdigest()
+
+    def render_entry(self, program):
+        item_url = f"{self.url_root}candidate/{program._id}.html"
+        author = program.user.nickname
+        if not author or not author.strip():
+            author = program.user.username
+        entry = FeedEntry(
+            id=item_url,
+            title=f'New challenge "{program.funny_name}" submitted',
+            title_type='html',
+            updated=datetime.fromtimestamp(program._timestamp_published),
+            author=author,
+            url=item_url,
+            categories=[{'term': program.status}],
+            content=render_template('candidate.html', program=program,
+                                    feed=True),
+            content_type='html',
+            feed_url=self.feed_url)
+        # Indented as AtomFeed.generate does
+        return ''.join('  ' + line for line in entry.generate())
+
+
+def response():
+    """The feed for this request, or 304 Not Modified."""
+    version = scoring.version()
+    with _lock:
+        feed = _feeds.get(request.base_url)
+        if feed is None:
+            feed = _feeds[request.base_url] = Feed(request.base_url,
+                                                   request.url_root)
+        if feed.version != version:
+            feed.update(version)
+        data, etag, last_modified = feed.data, feed.etag, feed.last_modified
+    response = Response(data, mimetype='application/atom+xml')
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    return response.make_conditional(request)
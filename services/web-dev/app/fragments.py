@@ -0,0 +1,167 @@
+"""Cache of the rendered tables of the index page (challenges, bananas
+ranking and breaks).
+
+The tables only change with the scores: a table is rendered once per
+version of the contest state (see models/contest_state.py) and kept in a
+cache keyed by its name and the version, older versions simply age out.
+The backend is chosen by the FRAGMENT_CACHE_BACKEND environment variable:
+
+- 'lru': an LRU cache in each process (FRAGMENT_CACHE_SIZE tables),
+- 'uwsgi': the cache 'fragments' of uwsgi (see uwsgi.ini), shared by the
+  processes, which falls back to 'lru' outside of uwsgi,
+- 'none': no cache.
+
+The cached tables are the same for everyone: what depends on the current
+user ("You!", "Yours!", "Broken by you!" and the break buttons) is left as
+markers, replaced on each request by the personalize filter. The markers
+are HTML comments, which escaped data cannot forge:
+
+- <!--you:USER_ID-->NAME<!--/you-->: "You!" for the user, NAME otherwise,
+- <!--actions-header-->: the header of the column of the actions,
+- <!--actions:PROGRAM_ID:USER_ID-->: the actions on the program of the
+  user.
+
+The markup of these parts is in templates/personalized.html."""
+
+import re
+import threading
+from collections import OrderedDict
+
+import jinja2
+from flask import get_template_attribute, render_template
+from flask_login import current_user
+from markupsafe import Markup
+
+from app import app
+from app import utils
+
+try:
+    import uwsgi
+except ImportError:
+    uwsgi = None
+
+# contextfilter was renamed in Jinja 3
+pass_context = getattr(jinja2, 'pass_context', None) or jinja2.contextfilter
+
+_MARKERS = re.compile(r'<!--you:(\d+)-->(.*?)<!--/you-->'
+                      r'|<!--actions-header-->'
+                      r'|<!--actions:(\d+):(\d+)-->', re.DOTALL)
+# Stands for the id of the program in the rendered break buttons
+_PROGRAM_ID = '{program_id}'
+
+
+class NoCache:
+
+    name = 'none'
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value):
+        pass
+
+
+class LRUCache(NoCache):
+
+    name = 'lru'
+
+    def __init__(self, size):
+        self._size = size
+        self._fragments = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._fragments.get(key)
+            if value is not None:
+                self._fragments.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._fragments[key] = value
+            self._fragments.move_to_end(key)
+            while len(self._fragments) > self._size:
+                self._fragments.popitem(last=False)
+
+
+class UwsgiCache(NoCache):
+
+    name = 'uwsgi'
+    CACHE = 'fragments'
+    # The version changes by the minute, the entries of the former
+    # versions are not needed anymore
+    EXPIRES_IN_SECS = 300
+
+    def get(self, key):
+        value = uwsgi.cache_get(key, self.CACHE)
+        return None if value is None else value.decode()
+
+    def set(self, key, value):
+        # Two processes may render the same version, both are the same
+        uwsgi.cache_update(key, value.encode(), self.EXPIRES_IN_SECS,
+                           self.CACHE)
+
+
+def get_backend(name=None):
+    if name is None:
+        name = app.config['FRAGMENT_CACHE_BACKEND']
+    if name == 'none':
+        return NoCache()
+    if name == 'uwsgi':
+        if uwsgi is not None:
+            return UwsgiCache()
+        utils.console("Not running under uwsgi, "
+                      "the fragments are cached in each process")
+    elif name != 'lru':
+        raise ValueError(f"Unknown fragment cache backend {name}")
+    return LRUCache(app.config['FRAGMENT_CACHE_SIZE'])
+
+
+backend = get_backend()
+
+
+def render(template_name, version, **context):
+    """The template rendered with context for the version of the scores,
+    from the cache if possible. Its markers are left for personalize."""
+    key = f'{template_name}:{version}'
+    fragment = backend.get(key)
+    if fragment is None:
+        fragment = render_template(template_name, **context)
+        backend.set(key, fragment)
+    return Markup(fragment)
+
+
+@app.template_filter('personalize')
+@pass_context
+def personalize(context, fragment):
+    """The fragment with its markers replaced for the current user. The
+    template may define program_ids_broken_by_current_user."""
+    if not current_user or not current_user.is_authenticated:
+        return Markup(_MARKERS.sub(
+            lambda match: match.group(2) or '', fragment))
+
+    user_id = current_user._id
+    program_ids_broken = context.get('program_ids_broken_by_current_user',
+                                     set())
+    you = str(get_template_attribute('personalized.html', 'you')())
+    actions = get_template_attribute('personalized.html', 'actions')
+    header = str(get_template_attribute('personalized.html',
+                                        'actions_header')())
+    yours, broken_by_you, break_buttons = [
+        str(actions(state, _PROGRAM_ID))
+        for state in ('yours', 'broken_by_you', 'break')]
+
+    def replace(match):
+        you_id, name, program_id, owner_id = match.groups()
+        if you_id is not None:
+            return you if int(you_id) == user_id else name
+        if program_id is None:
+            return header
+        if int(owner_id) == user_id:
+            return yours
+        if int(program_id) in program_ids_broken:
+            return broken_by_you
+        return break_buttons.replace(_PROGRAM_ID, program_id)
+
+    return Markup(_MARKERS.sub(replace, fragment))
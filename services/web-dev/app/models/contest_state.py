@@ -0,0 +1,65 @@
+from app import db
+
+
+class ContestState(db.Model):
+    """Single row shared by the web processes: the version of the scores
+    (strawberries and rankings), bumped by each update of app/scoring.py
+    and by each program published or broken. The pages computed from the
+    scores can be cached on this version (see app/fragments.py)."""
+
+    ID = 1
+
+    _id = db.Column(db.Integer, primary_key=True)
+    _version = db.Column(db.BigInteger, nullable=False, default=0)
+    _timestamp_last_update = db.Column(db.BigInteger, default=None)
+    # Set by the last update after the final deadline, the scores do not
+    # change anymore
+    _frozen = db.Column(db.Boolean, nullable=False, default=False)
+
+    @property
+    def version(self):
+        return self._version
+
+    @property
+    def timestamp_last_update(self):
+        return self._timestamp_last_update
+
+    @property
+    def frozen(self):
+        return self._frozen
+
+    def bump(self, now):
+        self._version += 1
+        self._timestamp_last_update = now
+
+    @staticmethod
+    def bump_version():
+        """Bump the version in the current transaction, without loading the
+        state (the launcher publishes the programs). This locks the row of
+        the state: to be called before any change of the programs or of the
+        users, which app/scoring.py locks after it."""
+        with db.session.no_autoflush:
+            db.session.execute(ContestState.__table__.update().values(
+                _version=ContestState.__table__.c._version + 1
+            ).where(ContestState.__table__.c._id == ContestState.ID))
+
+    def freeze(self):
+        self._frozen = True
+
+    @staticmethod
+    def get(for_update=False):
+        """The state, created if needed. With for_update, its row is locked
+        until the end of the transaction."""
+        query = ContestState.query.filter(ContestState._id == ContestState.ID)
+        if for_update:
+            query = query.with_for_update()
+        state = query.first()
+        if state is None:
+            state = ContestState(_id=ContestState.ID, _version=0,
+                                 _frozen=False)
+            db.session.add(state)
+        return state
+
+    def __repr__(self):
+        return (f'<ContestState version={self._version} '
+                f'frozen={self._frozen}>')
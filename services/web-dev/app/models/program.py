@@ -1,4 +1,6 @@
+import json
 import random
+import secrets
 import string
 import time
 
@@ -6,11 +8,15 @@ from enum import Enum, unique
 from math import log
 from sqlalchemy import or_, and_
 from sqlalchemy.dialects import mysql
+from sqlalchemy.orm import deferred, joinedload, undefer
 
 from app import app
 from app import db
+from app import ranking
 from app import utils
 from app.funny_name_generator import get_funny_name
+from .contest_state import ContestState
+from .user import User
 from .whiteboxbreak import WhiteboxBreak
 
 
@@ -64,11 +70,17 @@ class Program(db.Model):
     def _now(context):
         return int(time.time())
 
+    def _new_seed(context=None):
+        return secrets.token_hex(16)
+
     _id = db.Column(db.Integer, primary_key=True)
     _funny_name = db.Column(db.Text)
     _basename = db.Column(db.String(32))
     _user_id = db.Column(db.Integer, db.ForeignKey('user._id'))
     _nonce = db.Column(db.String(32), default=None)
+    # The messages signed by the program are derived from this seed (see
+    # compile_and_test/vectors.py), testing it again gives the same ones
+    _seed = db.Column(db.String(32), default=_new_seed)
     _timestamp_submitted = db.Column(db.BigInteger, default=_now)
     _timestamp_published = db.Column(db.BigInteger, default=None)
     _timestamp_first_break = db.Column(db.BigInteger, default=None)
@@ -79,34 +91,34 @@ class Program(db.Model):
     _size_factor = db.Column(mysql.DOUBLE, default=1.0)
     _ram_factor = db.Column(mysql.DOUBLE, default=1.0)
     _time_factor = db.Column(mysql.DOUBLE, default=1.0)
+    # JSON summary of the measures the factors were estimated from
+    _benchmark_summary = deferred(db.Column(db.Text, default=None))
     # ID of the docker task responsible for the compilation
     _task_id = db.Column(db.String(32), default=None)
+    # Name of the slot (compile_and_test service or pool worker) in which
+    # the program is compiled and tested
+    _slot = db.Column(db.String(64), default=None)
     _timestamp_compilation_start = db.Column(db.BigInteger, default=None)
     _timestamp_compilation_finished = db.Column(db.BigInteger, default=None)
-    _error_message = db.Column(db.Text, default=None)
-    _hashes = db.Column(db.LargeBinary, default=None)
-    _signatures = db.Column(db.LargeBinary, default=None)
+    # The large columns are only loaded when they are accessed (or undeferred
+    # by the query), the listings do not render them
+    _error_message = deferred(db.Column(db.Text, default=None))
+    _hashes = deferred(db.Column(db.LargeBinary, default=None),
+                       group='test_vectors')
+    _signatures = deferred(db.Column(db.LargeBinary, default=None),
+                           group='test_vectors')
+    # JSON of the test vectors, serialized when the program is published
+    # (see app/exports.py)
+    _sample = deferred(db.Column(db.Text, default=None))
 
     # First set when the program is published
     _strawberries_peak = db.Column(mysql.DOUBLE, default=0)
     _strawberries_last = db.Column(mysql.DOUBLE, default=0)
     _strawberries_ranking = db.Column(db.BigInteger, default=None)
 
-    @property
-    def position_in_the_compilation_queue(self):
-        if self.status != Program.Status.submitted:
-            return None
-        if self._task_id is not None:
-            return 'In progress'
-        pos = Program.query.filter(
-            Program._status == Program.Status.submitted.value,
-            Program._task_id.is_(None),
-            Program._timestamp_submitted < self._timestamp_submitted
-        ).count()
-        if pos == 0:
-            return "Next"
-        else:
-            return str(pos+1)
+    # The compilation queue (see app/compilation_queue.py)
+    __table_args__ = (db.Index('ix_program_status_timestamp_submitted',
+                               '_status', '_timestamp_submitted'),)
 
     @property
     def funny_name(self):
@@ -122,6 +134,15 @@ class Program(db.Model):
             self._task_id = val
             self._timestamp_compilation_start = int(time.time())
 
+    @property
+    def slot(self):
+        return self._slot
+
+    @slot.setter
+    def slot(self, val):
+        if type(val) == str and len(val) <= 64:
+            self._slot = val
+
     @property
     def strawberries_last(self):
         return self._strawberries_last
@@ -176,6 +197,16 @@ class Program(db.Model):
     def time_factor(self):
         return self._time_factor
 
+    @property
+    def benchmark_summary(self):
+        if self._benchmark_summary is None:
+            return None
+        return json.loads(self._benchmark_summary)
+
+    @benchmark_summary.setter
+    def benchmark_summary(self, val):
+        self._benchmark_summary = json.dumps(val)
+
     @property
     def proof_of_knowledge(self):
         return self._proof_of_knowledge
@@ -204,6 +235,31 @@ class Program(db.Model):
         if self._signatures is None:
             self._signatures = val
 
+    @property
+    def sample(self):
+        """JSON of the public key, of the proof of knowledge and of the test
+        vectors, as served at /candidate/<id>."""
+        if self._sample is None:
+            # Published before the samples were stored
+            return self.serialize_sample()
+        return self._sample
+
+    def serialize_sample(self):
+        hashes = self._hashes.hex().upper()
+        signatures = self._signatures.hex().upper()
+        test_vectors = [
+            {"hash": hashes[i*64:(i+1)*64],
+             "signature": signatures[i*128:(i+1)*128]}
+            for i in range(len(self._hashes) // 32)]
+        res = {
+            "id": self._id,
+            "public_key": self._pubkey,
+            "proof_of_knowledge": self._proof_of_knowledge,
+            "test_vectors": test_vectors
+        }
+        # As flask.jsonify
+        return json.dumps(res, separators=(',', ':'), sort_keys=True) + '\n'
+
     @property
     def datetime_first_break(self):
         if self._timestamp_first_break is None:
@@ -233,43 +289,44 @@ class Program(db.Model):
     def clean_programs_which_timeout_to_compile_or_test():
         programs = Program.get_all_programs_being_compiled_or_tested()
 
-        # We ensure the first program has not been compiled/tested for too long
-        for p in programs[:1]:
-            max_compile_time = app.config['CHALLENGE_MAX_TIME_COMPILATION_IN_SECS']
-            max_exec_time = app.config['CHALLENGE_MAX_TIME_EXECUTION_IN_SECS'] * \
-                app.config['CHALLENGE_NUMBER_OF_TEST_VECTORS']
-            # buffer for forking processes
-            buffer_time_for_forking = 100
-            max_time = 10 + max_compile_time + max_exec_time + buffer_time_for_forking
-            now = int(time.time())
-            if now > p._timestamp_compilation_start + max_time:
+        # Each slot compiles/tests a single program at a time
+        programs_by_slot = dict()
+        for p in programs:
+            programs_by_slot.setdefault(p._slot, []).append(p)
+
+        for programs_of_the_slot in programs_by_slot.values():
+            # We ensure the first program has not been compiled/tested for too long
+            for p in programs_of_the_slot[:1]:
+                p.fail_if_compilation_or_test_timed_out()
+            # Any other unpublished program of the slot with a lower 'timestamp_compilation_start' must have crashed their docker
+            for p in programs_of_the_slot[1:]:
                 p.set_status_to_execution_failed(
-                    'Compilation and/or testing took too much time. Timeout!')
-        # Any other unpublished program with a lower 'timestamp_compilation_start' must have crashed their docker
-        for p in programs[1:]:
-            p.set_status_to_execution_failed(
-                'Compilation and/or testing failed for unknown reason.')
+                    'Compilation and/or testing failed for unknown reason.')
+
+    def fail_if_compilation_or_test_timed_out(self):
+        max_compile_time = app.config['CHALLENGE_MAX_TIME_COMPILATION_IN_SECS']
+        # the benchmark may sign the first messages again
+        max_exec_time = app.config['CHALLENGE_MAX_TIME_EXECUTION_IN_SECS'] * \
+            (app.config['CHALLENGE_NUMBER_OF_TEST_VECTORS'] +
+             app.config.get('BENCHMARK_REPETITIONS', 0))
+        # buffer for forking processes
+        buffer_time_for_forking = 100
+        max_time = 10 + max_compile_time + max_exec_time + buffer_time_for_forking
+        now = int(time.time())
+        if now > self._timestamp_compilation_start + max_time:
+            self.set_status_to_execution_failed(
+                'Compilation and/or testing took too much time. Timeout!')
 
     @staticmethod
     def refresh_all_strawberry_rankings():
-        programs = Program.query.filter(or_(
-            Program._status == Program.Status.unbroken.value,
-            Program._status == Program.Status.broken.value)
-        ).order_by(Program._strawberries_peak.desc()).all()
-        if len(programs) == 0:
-            return
-        programs[0]._strawberries_ranking = 1
-        r = 1
-        p = programs[0]._strawberries_peak
-        skipped = 0
-        for program in programs[1:]:
-            if program._strawberries_peak < p:
-                r += 1 + skipped
-                skipped = 0
-            else:
-                skipped += 1
-            program._strawberries_ranking = r
-            p = program._strawberries_peak
+        # The strawberries updated in the session are flushed first
+        db.session.flush()
+        ranking.update_ranking(
+            db.session.connection(), Program.__table__,
+            '_strawberries_peak', '_strawberries_ranking',
+            lambda program: program.c._status.in_([
+                Program.Status.unbroken.value,
+                Program.Status.broken.value]))
 
     def current_strawberries(self, end_timestamp):
         if not self.is_published:
@@ -295,12 +352,17 @@ class Program(db.Model):
             strawberries = (surviving_minutes/1440.0) ** 2
         return strawberries * float(self._performance_factor)
 
+    def _compilation_finished(self):
+        if self._timestamp_compilation_finished is None:
+            self._timestamp_compilation_finished = int(time.time())
+
     def set_status_to_compilation_failed(self, error_message=None):
         utils.console(
             "Setting the status to compilation_failed for program with id %s" % str(self._id))
         if Program.Status.authorized_status_change(
                 self.status, Program.Status.compilation_failed):
             self._status = Program.Status.compilation_failed.value
+            self._compilation_finished()
             if error_message is not None and type(error_message) == str:
                 self._error_message = error_message
 
@@ -310,6 +372,7 @@ class Program(db.Model):
         if Program.Status.authorized_status_change(
                 self.status, Program.Status.preprocess_failed):
             self._status = Program.Status.preprocess_failed.value
+            self._compilation_finished()
             if error_message is not None and type(error_message) == str:
                 self._error_message = error_message
 
@@ -317,11 +380,13 @@ class Program(db.Model):
         if Program.Status.authorized_status_change(self.status,
                                                    Program.Status.link_failed):
             self._status = Program.Status.link_failed.value
+            self._compilation_finished()
 
     def set_status_to_execution_failed(self, error_message=None):
         if Program.Status.authorized_status_change(
                 self.status, Program.Status.execution_failed):
             self._status = Program.Status.execution_failed.value
+            self._compilation_finished()
             if error_message is not None and type(error_message) == str:
                 self._error_message = error_message
 
@@ -329,6 +394,7 @@ class Program(db.Model):
         if Program.Status.authorized_status_change(self.status,
                                                    Program.Status.test_failed):
             self._status = Program.Status.test_failed.value
+            self._compilation_finished()
             if error_message is not None and type(error_message) == str:
                 self._error_message = error_message
 
@@ -341,7 +407,12 @@ class Program(db.Model):
                 self.set_status_to_compilation_failed(
                     "Submission rejected after final deadline")
                 return
+            # The cached tables change
+            ContestState.bump_version()
+            # The test vectors are set, they do not change anymore
+            self._sample = self.serialize_sample()
             self._status = Program.Status.unbroken.value
+            self._compilation_finished()
             if self._timestamp_published is None:
                 self._timestamp_published = now
             self.update_strawberries(now)
@@ -385,9 +456,31 @@ class Program(db.Model):
             string.ascii_lowercase + string.digits) for _ in range(32))
         return self._nonce
 
+    @property
+    def seed(self):
+        return self._seed
+
+    def generate_seed(self):
+        self._seed = Program._new_seed()
+        return self._seed
+
     def compare_nonces(self, nonce):
         return self._nonce == nonce
 
+    def claim(self, task_id, slot):
+        """Set the task id and the slot, unless another task claimed the
+        program in the meantime (several pool workers may look for a program
+        at the same time). Returns True if the program is ours."""
+        claimed = Program.query.filter(
+            Program._id == self._id,
+            Program._task_id.is_(None)
+        ).update({
+            Program._task_id: task_id,
+            Program._slot: slot,
+            Program._timestamp_compilation_start: int(time.time()),
+        }, synchronize_session='evaluate')
+        return claimed == 1
+
     def set_performance_factor(self, size_factor, ram_factor, time_factor):
         self._size_factor = size_factor
         self._ram_factor = ram_factor
@@ -426,6 +519,12 @@ class Program(db.Model):
     def get_by_id(_id):
         return Program.query.filter(Program._id == _id).first()
 
+    @staticmethod
+    def get_by_id_with_sample(_id):
+        """Same as get_by_id, the sample being loaded along."""
+        return Program.query.options(undefer(Program._sample)).filter(
+            Program._id == _id).first()
+
     @staticmethod
     def get_unbroken_or_broken_by_id(_id):
         program = Program.query.filter(Program._id == _id).first()
@@ -437,29 +536,41 @@ class Program(db.Model):
         else:
             return None
 
+    @staticmethod
+    def _published_with_their_user():
+        """Query of the published programs, with the columns of their user
+        the tables render loaded along (a single query)."""
+        return Program.query.filter(or_(
+            Program._status == Program.Status.unbroken.value,
+            Program._status == Program.Status.broken.value
+        )).options(joinedload(Program.user).load_only(
+            User._username, User._nickname))
+
     @staticmethod
     def get_all_published_sorted_by_ranking(max_rank=None):
+        query = Program._published_with_their_user()
         if max_rank is not None:
-            programs = Program.query.filter(or_(
-                Program._status == Program.Status.unbroken.value,
-                Program._status == Program.Status.broken.value
-            )).filter(
-                Program._strawberries_ranking <= max_rank
-            ).order_by(Program._strawberries_ranking).all()
-        else:
-            programs = Program.query.filter(or_(
-                Program._status == Program.Status.unbroken.value,
-                Program._status == Program.Status.broken.value
-            )).order_by(Program._strawberries_ranking).all()
-        return programs
+            query = query.filter(Program._strawberries_ranking <= max_rank)
+        return query.order_by(Program._strawberries_ranking).all()
 
     @staticmethod
-    def get_all_published_sorted_by_published_time():
-        programs = Program.query.filter(or_(
+    def get_all_published_states():
+        """(id, status, timestamps of publication and of first break) of the
+        published programs, by publication time."""
+        return db.session.query(
+            Program._id, Program._status, Program._timestamp_published,
+            Program._timestamp_first_break
+        ).filter(or_(
             Program._status == Program.Status.unbroken.value,
             Program._status == Program.Status.broken.value
-        )).order_by(Program._timestamp_published).all()
-        return programs
+        )).order_by(Program._timestamp_published, Program._id).all()
+
+    @staticmethod
+    def get_published_by_ids(ids):
+        if not ids:
+            return []
+        return Program._published_with_their_user().filter(
+            Program._id.in_(ids)).all()
 
     @staticmethod
     def get_user_programs(user, status):
@@ -484,7 +595,8 @@ class Program(db.Model):
 
     @staticmethod
     def get_user_rejected_programs(user):
-        return Program.query.filter(
+        # Their error message is rendered
+        return Program.query.options(undefer(Program._error_message)).filter(
             Program._user_id == user._id,
             or_(Program._status == Program.Status.preprocess_failed.value,
                 Program._status == Program.Status.compilation_failed.value,
@@ -533,6 +645,43 @@ class Program(db.Model):
             Program._task_id == running_task_id
         ).first()
 
+    @staticmethod
+    def get_program_being_compiled_in_slot(slot):
+        return Program.query.filter(
+            Program._status == Program.Status.submitted.value,
+            Program._slot == slot,
+            Program._task_id.isnot(None)
+        ).first()
+
+    @staticmethod
+    def get_programs_being_compiled_by(task_id):
+        return Program.query.filter(
+            Program._status == Program.Status.submitted.value,
+            Program._task_id == task_id
+        ).all()
+
+    @staticmethod
+    def get_compilation_queue():
+        """(id, task id) of the submitted programs, in the order they are
+        compiled (a single query on the index on the status and the
+        submission time)."""
+        return db.session.query(Program._id, Program._task_id).filter(
+            Program._status == Program.Status.submitted.value
+        ).order_by(Program._timestamp_submitted, Program._id).all()
+
+    @staticmethod
+    def get_last_compilation_durations(number):
+        """Durations of the last number compilations and tests, the last
+        one first."""
+        return [finished - start for start, finished in db.session.query(
+            Program._timestamp_compilation_start,
+            Program._timestamp_compilation_finished
+        ).filter(
+            Program._timestamp_compilation_start.isnot(None),
+            Program._timestamp_compilation_finished.isnot(None)
+        ).order_by(Program._timestamp_compilation_finished.desc()
+                   ).limit(number).all()]
+
     @staticmethod
     def get_all_programs_being_compiled_or_tested():
         return Program.query.filter(
@@ -541,25 +690,5 @@ class Program(db.Model):
         ).order_by(Program._timestamp_compilation_start.desc()).all()
 
     def __repr__(self):
-        print(self._id, flush=True)
-        s = (
-            f'<Program {self._id}>\n'
-            f'\t funny_name:              {self._funny_name}\n'
-            f'\t basename:                {self._basename}\n'
-            f'\t user_id:                 {self._user_id}\n'
-            f'\t nonce:                   {self._nonce}\n'
-            f'\t timestamp_submitted:     {self._timestamp_submitted}\n'
-            f'\t timestamp_published:     {self._timestamp_published}\n'
-            f'\t timestamp_first_break:   {self._timestamp_first_break}\n'
-            f'\t status:                  {self._status}\n'
-            f'\t pubkey:                  {self._pubkey}\n'
-            f'\t proof_of_knowledge:      {self._proof_of_knowledge}\n'
-            f'\t task_id:                 {self._task_id}\n'
-            f'\t ts_compilation_start:    {self._timestamp_compilation_start}\n'
-            f'\t error_message:           {self._error_message}\n'
-            f'\t hashes:                  {self._hashes}\n'
-            f'\t signatures:              {self._signatures}\n'
-            f'\t strawberries_peak:       {self._strawberries_peak}\n'
-            f'\t strawberries_last:       {self._strawberries_last}\n'
-        )
-        return s
+        return (f'<Program {self._id} basename={self._basename} '
+                f'status={self._status}>')
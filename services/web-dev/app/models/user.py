@@ -2,6 +2,7 @@ import time
 from sqlalchemy.dialects import mysql
 from app import db
 from app import login_manager
+from app import ranking
 from passlib.hash import pbkdf2_sha256
 
 
@@ -12,7 +13,7 @@ class User(db.Model):
     _username = db.Column(db.String(64), index=True, unique=True)
     _nickname = db.Column(db.String(64), index=True, default=None, unique=True)
     _password_hash = db.Column(db.String(256))
-    _bananas = db.Column(mysql.DOUBLE, default=None)
+    _bananas = db.Column(mysql.DOUBLE, default=None, index=True)
     _bananas_ranking = db.Column(db.BigInteger, default=None)
     _strawberries = db.Column(mysql.DOUBLE, default=0)
     _strawberries_ranking = db.Column(db.BigInteger, default=None)
@@ -68,32 +69,40 @@ class User(db.Model):
         return str(self._id)
 
     def update_bananas(self, strawberries):
-        if self._bananas is None or strawberries > self._bananas:
-            self._bananas = strawberries
-        User.refresh_all_banana_rankings()
+        if self._bananas is not None and strawberries <= self._bananas:
+            return
+        former_bananas = self._bananas
+        self._bananas = strawberries
+        db.session.flush()
+        # Only the users overtaken lose one place
+        ranking.raise_rank(db.session.connection(), User.__table__,
+                           '_bananas', '_bananas_ranking', User._has_bananas,
+                           self._id, former_bananas, strawberries)
+        db.session.expire(self, ['_bananas_ranking'])
 
     def update_strawberries(self, strawberries):
         if strawberries > self._strawberries:
             self._strawberries = strawberries
 
+    @staticmethod
+    def _has_bananas(user):
+        return user.c._bananas.isnot(None)
+
     @staticmethod
     def refresh_all_banana_rankings():
-        users = User.query.filter(User._bananas.isnot(None)) \
-                          .order_by(User._bananas.desc()).all()
-        if len(users) == 0:
-            return
-        users[0]._bananas_ranking = 1
-        r = 1
-        b = users[0]._bananas
-        skipped = 0
-        for user in users[1:]:
-            if user._bananas < b:
-                r += 1 + skipped
-                skipped = 0
-            else:
-                skipped += 1
-            user._bananas_ranking = r
-            b = user._bananas
+        db.session.flush()
+        ranking.update_ranking(
+            db.session.connection(), User.__table__,
+            '_bananas', '_bananas_ranking', User._has_bananas)
+
+    @staticmethod
+    def check_banana_rankings():
+        """The banana ranks are updated incrementally, this returns the
+        (id, rank, expected rank) of the users whose rank is wrong."""
+        db.session.flush()
+        return ranking.inconsistencies(
+            db.session.connection(), User.__table__,
+            '_bananas', '_bananas_ranking', User._has_bananas)
 
     @login_manager.user_loader
     def load_user(id):
@@ -101,24 +110,11 @@ class User(db.Model):
 
     @staticmethod
     def refresh_all_strawberry_rankings():
-        users = User.query.filter(
-            User._strawberries > 0
-        ).order_by(User._strawberries.desc()).all()
-        if len(users) == 0:
-            return
-
-        users[0]._strawberries_ranking = 1
-        r = 1
-        b = users[0]._strawberries
-        skipped = 0
-        for user in users[1:]:
-            if user._strawberries < b:
-                r += 1 + skipped
-                skipped = 0
-            else:
-                skipped += 1
-            user._strawberries_ranking = r
-            b = user._strawberries
+        db.session.flush()
+        ranking.update_ranking(
+            db.session.connection(), User.__table__,
+            '_strawberries', '_strawberries_ranking',
+            lambda user: user.c._strawberries > 0)
 
     # User creation and password verification
     @staticmethod
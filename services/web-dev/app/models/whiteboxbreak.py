@@ -1,8 +1,11 @@
 import time
 from app import db
+from sqlalchemy.orm import joinedload
 from sqlalchemy.sql import func
 from sqlalchemy.dialects import mysql
 
+from .user import User
+
 
 class WhiteboxBreak(db.Model):
 
@@ -43,9 +46,18 @@ class WhiteboxBreak(db.Model):
         user.update_bananas(strawberries)
         return wb_break
 
+    @staticmethod
+    def _with_their_user_and_program():
+        """Query of the breaks, with their user and program loaded along
+        (a single query)."""
+        return WhiteboxBreak.query.options(
+            joinedload(WhiteboxBreak.user).load_only(User._username,
+                                                     User._nickname),
+            joinedload(WhiteboxBreak.program))
+
     @staticmethod
     def get_all():
-        wb_breaks = WhiteboxBreak.query.all()
+        wb_breaks = WhiteboxBreak._with_their_user_and_program().all()
         return wb_breaks
 
     @staticmethod
@@ -58,10 +70,16 @@ class WhiteboxBreak(db.Model):
 
     @staticmethod
     def get_all_by_user(user):
-        wb_breaks = WhiteboxBreak.query.filter(
+        wb_breaks = WhiteboxBreak._with_their_user_and_program().filter(
             WhiteboxBreak._user_id == user._id).all()
         return wb_breaks
 
+    @staticmethod
+    def get_program_ids_broken_by_user(user):
+        return {program_id for program_id, in db.session.query(
+            WhiteboxBreak._program_id
+        ).filter(WhiteboxBreak._user_id == user._id)}
+
     @staticmethod
     def get_total_breaks_group_by_user():
         result = db.session.query(WhiteboxBreak._user_id, func.count(
@@ -0,0 +1,179 @@
+"""ECDSA verification on NIST P-256, working directly on the raw bytes of
+the messages and signatures (bytes, mmap or memoryview slices), without
+going through their hexadecimal representation.
+
+A message is the 32-byte big-endian hash to sign, a signature the 64-byte
+big-endian concatenation of r and s, and a public key the 128 hexadecimal
+digits of its coordinates, as stored in the database.
+
+All the signatures of a program are verified with the same public key Q:
+first_invalid() decodes Q and tabulates its first multiples once for the
+whole batch. u1 G + u2 Q is computed with Straus' method, the doublings
+being shared by both scalars: the 4-bit windows of u2 are looked up in the
+table of Q, the bytes of u1 in the fixed-base table of G, built once when
+the module is loaded."""
+
+P = 0xffffffff00000001000000000000000000000000ffffffffffffffffffffffff
+N = 0xffffffff00000000ffffffffffffffffbce6faada7179e84f3b9cac2fc632551
+B = 0x5ac635d8aa3a93e7b3ebbd55769886bc651d06b0cc53b0f63bce3c3e27d2604b
+G = (0x6b17d1f2e12c4247f8bce6e563a440f277037d812deb33a0f4a13945d898c296,
+     0x4fe342e2fe1a7f9b8ee7eb4a7c0f9e162bce33576b315ececbb6406837bf51f5)
+
+# Points are handled in Jacobian coordinates (X, Y, Z), standing for the
+# affine point (X/Z^2, Y/Z^3), Z = 0 being the point at infinity. The
+# precomputed points are affine (x, y), so that they are added with fewer
+# multiplications.
+INFINITY = (1, 1, 0)
+
+# Width (in bits) of the windows of the scalars multiplying Q and G
+Q_WINDOW = 4
+G_WINDOW = 8
+
+
+def _double(point):
+    X, Y, Z = point
+    if Y == 0 or Z == 0:
+        return INFINITY
+    # a = -3
+    delta = Z * Z % P
+    gamma = Y * Y % P
+    beta = X * gamma % P
+    alpha = 3 * (X - delta) * (X + delta) % P
+    X3 = (alpha * alpha - 8 * beta) % P
+    Z3 = ((Y + Z) * (Y + Z) - gamma - delta) % P
+    Y3 = (alpha * (4 * beta - X3) - 8 * gamma * gamma) % P
+    return (X3, Y3, Z3)
+
+
+def _add_affine(point, affine):
+    """point + affine, the latter being a precomputed (x, y)."""
+    X1, Y1, Z1 = point
+    x2, y2 = affine
+    if Z1 == 0:
+        return (x2, y2, 1)
+    Z1Z1 = Z1 * Z1 % P
+    H = (x2 * Z1Z1 - X1) % P
+    R = (y2 * Z1 * Z1Z1 - Y1) % P
+    if H == 0:
+        if R == 0:
+            return _double(point)
+        return INFINITY
+    HH = H * H % P
+    HHH = H * HH % P
+    V = X1 * HH % P
+    X3 = (R * R - HHH - 2 * V) % P
+    Y3 = (R * (V - X3) - Y1 * HHH) % P
+    Z3 = Z1 * H % P
+    return (X3, Y3, Z3)
+
+
+def _to_affine(points):
+    """Affine coordinates of the (finite) points, with a single modular
+    inversion (Montgomery's trick)."""
+    prefix = [1]
+    for _, _, Z in points:
+        prefix.append(prefix[-1] * Z % P)
+    # int() as the coordinates may be gmpy2 integers (see ec_backend.py)
+    inverse = pow(int(prefix[-1]), -1, P)
+    affine = [None] * len(points)
+    for i in range(len(points) - 1, -1, -1):
+        X, Y, Z = points[i]
+        z_inverse = inverse * prefix[i] % P
+        inverse = inverse * Z % P
+        zz_inverse = z_inverse * z_inverse % P
+        affine[i] = (X * zz_inverse % P, Y * zz_inverse * z_inverse % P)
+    return affine
+
+
+def _multiples(affine, count):
+    """[None, affine, 2 affine, ..., (count - 1) affine]."""
+    points = [(affine[0], affine[1], 1)]
+    for _ in range(count - 2):
+        points.append(_add_affine(points[-1], affine))
+    return [None] + _to_affine(points)
+
+
+G_TABLE = _multiples(G, 2**G_WINDOW)
+
+
+def precompute(public_key):
+    """Table of the multiples of the public key used by verify()."""
+    return _multiples(public_key, 2**Q_WINDOW)
+
+
+def _straus(u1, u2, q_table):
+    """u1 G + u2 Q, in Jacobian coordinates."""
+    q_mask = 2**Q_WINDOW - 1
+    g_mask = 2**G_WINDOW - 1
+    steps_per_g_window = G_WINDOW // Q_WINDOW
+    result = INFINITY
+    for i in range(256 // Q_WINDOW - 1, -1, -1):
+        if result[2] != 0:
+            for _ in range(Q_WINDOW):
+                result = _double(result)
+        digit = (u2 >> (Q_WINDOW * i)) & q_mask
+        if digit:
+            result = _add_affine(result, q_table[digit])
+        # The bytes of u1 are added when Q_WINDOW * i doublings are left,
+        # which scale them by 2^(Q_WINDOW * i) as well
+        if i % steps_per_g_window == 0:
+            digit = (u1 >> (Q_WINDOW * i)) & g_mask
+            if digit:
+                result = _add_affine(result, G_TABLE[digit])
+    return result
+
+
+def base_multiple(k):
+    """Affine coordinates of k G, for 0 < k < N."""
+    return _to_affine([_straus(k, 0, None)])[0]
+
+
+def decode_public_key(pubkey):
+    """Affine coordinates of the public key given as 128 hexadecimal
+    digits. Raises ValueError if it is not a point of the curve."""
+    if len(pubkey) != 128:
+        raise ValueError("The public key must have 128 hexadecimal digits")
+    x, y = int(pubkey[:64], 16), int(pubkey[64:], 16)
+    if not (0 <= x < P and 0 <= y < P) or \
+       (y * y - x * x * x + 3 * x - B) % P != 0:
+        raise ValueError("The public key is not on the curve")
+    return (x, y)
+
+
+def verify(public_key, message, signature, q_table=None):
+    """Verify the 64-byte signature of the 32-byte message with the public
+    key returned by decode_public_key, whose table (see precompute) is
+    computed if not given."""
+    if len(message) != 32 or len(signature) != 64:
+        return False
+    r = int.from_bytes(signature[:32], 'big')
+    s = int.from_bytes(signature[32:], 'big')
+    if not (0 < r < N and 0 < s < N):
+        return False
+    if q_table is None:
+        q_table = precompute(public_key)
+    e = int.from_bytes(message, 'big')
+    w = pow(s, -1, N)
+    X, _, Z = _straus(e * w % N, r * w % N, q_table)
+    if Z == 0:
+        return False
+    # x = X / Z^2 must be r or r + N, which is checked without inverting Z
+    ZZ = Z * Z % P
+    if (r * ZZ - X) % P == 0:
+        return True
+    return r + N < P and ((r + N) * ZZ - X) % P == 0
+
+
+def first_invalid(public_key, messages, signatures, start=0):
+    """Index of the first message whose signature cannot be verified, the
+    first signature being the one of the message at index start, or None.
+    messages and signatures are the concatenations of the raw messages
+    and signatures."""
+    q_table = precompute(public_key)
+    signatures = memoryview(signatures)
+    for i in range(len(signatures) // 64):
+        message = messages[32*(start+i):32*(start+i+1)]
+        if not verify(public_key, message, signatures[64*i:64*(i+1)],
+                      q_table):
+            return start + i
+    return None
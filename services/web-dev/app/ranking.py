@@ -0,0 +1,196 @@
+"""Competition rankings (1, 1, 3, ...) computed by the database.
+
+The ranks are computed with RANK() OVER (ORDER BY ... DESC) and applied by
+a single multi-table UPDATE per ranking (UPDATE ... JOIN on MySQL), instead
+of loading every row and updating them one by one. Databases without
+window functions (MySQL before 8.0, MariaDB before 10.2, SQLite before
+3.25) get the same ranks from a self-join counting the rows with a larger
+value, which is quadratic. As before, the rows which are not ranked keep
+their former rank.
+
+Run this file to compare the three ways on generated rows:
+
+    python3 ranking.py [DATABASE_URL] [NUMBER_OF_ROWS]
+
+This file is copied into the launcher with the models (see the Makefile)."""
+
+import random
+import sqlite3
+import sys
+import time
+
+from sqlalchemy import and_, bindparam, func, or_, select
+
+
+def supports_window_functions(dialect):
+    version = dialect.server_version_info or ()
+    if dialect.name == 'mysql':
+        if getattr(dialect, 'is_mariadb', False):
+            return version >= (10, 2)
+        return version >= (8, 0)
+    if dialect.name == 'sqlite':
+        return sqlite3.sqlite_version_info >= (3, 25)
+    return True
+
+
+def ranks(table, value, where, window_functions=True):
+    """SELECT of the id ('id') and of the rank ('rank'), by decreasing
+    value (name of a column), of the rows of table for which where is true.
+    where is called with an alias of table."""
+    ranked = table.alias('ranked')
+    if window_functions:
+        return select(
+            ranked.c._id.label('id'),
+            func.rank().over(order_by=ranked.c[value].desc()).label('rank')
+        ).where(where(ranked))
+    larger = table.alias('larger')
+    return select(
+        ranked.c._id.label('id'),
+        (func.count(larger.c._id) + 1).label('rank')
+    ).select_from(ranked.outerjoin(
+        larger, and_(larger.c[value] > ranked.c[value], where(larger)))
+    ).where(where(ranked)).group_by(ranked.c._id)
+
+
+def update_ranking(connection, table, value, rank, where,
+                   window_functions=None):
+    """Set the column rank of the rows of table for which where is true to
+    their rank by decreasing value, with a single UPDATE."""
+    if window_functions is None:
+        window_functions = supports_window_functions(connection.dialect)
+    query = ranks(table, value, where, window_functions).subquery('ranks')
+    if connection.dialect.name in ('mysql', 'postgresql'):
+        statement = table.update().values(
+            {rank: query.c.rank}
+        ).where(table.c._id == query.c.id)
+    else:
+        # No multiple-table UPDATE (SQLite): a subquery per row
+        statement = table.update().values(
+            {rank: select(query.c.rank).where(
+                query.c.id == table.c._id).scalar_subquery()}
+        ).where(where(table))
+    connection.execute(statement)
+
+
+def raise_rank(connection, table, value, rank, where, _id, old, new):
+    """Same as update_ranking after the value of the row _id rose from old
+    (None if the row was not ranked) to new, but only the rows it overtook
+    are updated: they lose one place."""
+    # Locks the rows above, so that concurrent raises are serialized
+    above = connection.execute(
+        select(func.count()).select_from(table).where(and_(
+            table.c._id != _id, where(table), table.c[value] > new))
+        .with_for_update()).scalar()
+    overtaken = and_(table.c._id != _id, where(table), table.c[value] < new)
+    if old is not None:
+        overtaken = and_(overtaken, table.c[value] >= old)
+    connection.execute(table.update().values(
+        {rank: table.c[rank] + 1}).where(overtaken))
+    connection.execute(table.update().values(
+        {rank: above + 1}).where(table.c._id == _id))
+
+
+def inconsistencies(connection, table, value, rank, where):
+    """(id, rank, expected rank) of the rows whose rank is not the one
+    given by a full recompute."""
+    query = ranks(table, value, where,
+                  supports_window_functions(connection.dialect)
+                  ).subquery('ranks')
+    return connection.execute(
+        select(table.c._id, table.c[rank], query.c.rank)
+        .select_from(table.join(query, table.c._id == query.c.id))
+        .where(or_(table.c[rank].is_(None), table.c[rank] != query.c.rank))
+    ).all()
+
+
+# Benchmark
+
+def update_ranking_in_python(connection, table, value, rank, where):
+    """The former way: the rows are loaded and ranked here, then updated
+    one by one (a lower bound of its cost, without the ORM)."""
+    rows = connection.execute(
+        select(table.c._id, table.c[value]).where(where(table))
+        .order_by(table.c[value].desc())).all()
+    new_ranks = list()
+    r, skipped, previous = 1, 0, None
+    for _id, v in rows:
+        if previous is not None:
+            if v < previous:
+                r += 1 + skipped
+                skipped = 0
+            else:
+                skipped += 1
+        new_ranks.append({'b_id': _id, 'b_rank': r})
+        previous = v
+    if new_ranks:
+        connection.execute(table.update().where(
+            table.c._id == bindparam('b_id')
+        ).values({rank: bindparam('b_rank')}), new_ranks)
+
+
+def benchmark(url='sqlite://', number_of_rows=10000):
+    from sqlalchemy import (BigInteger, Column, Float, Integer, MetaData,
+                            String, Table, create_engine)
+
+    engine = create_engine(url)
+    metadata = MetaData()
+    program = Table('ranking_benchmark_program', metadata,
+                    Column('_id', Integer, primary_key=True),
+                    Column('_status', String(100)),
+                    Column('_strawberries_peak', Float),
+                    Column('_strawberries_ranking', BigInteger))
+    user = Table('ranking_benchmark_user', metadata,
+                 Column('_id', Integer, primary_key=True),
+                 Column('_strawberries', Float),
+                 Column('_strawberries_ranking', BigInteger))
+    metadata.drop_all(engine)
+    metadata.create_all(engine)
+
+    rng = random.Random(0)
+    statuses = ['unbroken', 'broken', 'test_failed']
+    with engine.begin() as connection:
+        # Rounded values, for ties
+        connection.execute(program.insert(), [
+            {'_id': i + 1, '_status': rng.choice(statuses),
+             '_strawberries_peak': round(rng.expovariate(1), 2)}
+            for i in range(number_of_rows)])
+        connection.execute(user.insert(), [
+            {'_id': i + 1, '_strawberries': round(rng.expovariate(1), 2)
+             if rng.random() < 0.8 else 0}
+            for i in range(number_of_rows)])
+
+    rankings = [
+        (program, '_strawberries_peak', '_strawberries_ranking',
+         lambda t: t.c._status.in_(['unbroken', 'broken'])),
+        (user, '_strawberries', '_strawberries_ranking',
+         lambda t: t.c._strawberries > 0),
+    ]
+    ways = [('python loop', update_ranking_in_python),
+            ('fallback', lambda *args: update_ranking(
+                *args, window_functions=False))]
+    if supports_window_functions(engine.dialect):
+        ways.append(('window function', lambda *args: update_ranking(
+            *args, window_functions=True)))
+
+    results = dict()
+    for name, way in ways:
+        for table, *args in rankings:
+            with engine.begin() as connection:
+                connection.execute(table.update().values(
+                    _strawberries_ranking=None))
+            begin = time.perf_counter()
+            with engine.begin() as connection:
+                way(connection, table, *args)
+            elapsed = time.perf_counter() - begin
+            with engine.connect() as connection:
+                ranking = connection.execute(
+                    select(table.c._id, table.c._strawberries_ranking)
+                    .order_by(table.c._id)).all()
+            if results.setdefault(table.name, ranking) != ranking:
+                print(f"{name} does not give the same {table.name} ranking")
+            print(f"{table.name}, {name}: {1000 * elapsed:.1f} ms")
+    metadata.drop_all(engine)
+
+
+if __name__ == "__main__":
+    benchmark(*sys.argv[1:2], *[int(n) for n in sys.argv[2:3]])
@@ -1,12 +1,8 @@
-import time
-
-from datetime import datetime
-from traceback import print_exc
-from feedwerk.atom import AtomFeed
-from flask import render_template, url_for, request, request_started
+from collections import Counter
+from flask import render_template, url_for, request
 from flask_login import current_user
 
-from app import app, db, login_manager
+from app import app, feed, fragments, login_manager, scoring
 from app.models.user import User
 from app.models.program import Program
 from app.models.whiteboxbreak import WhiteboxBreak
@@ -15,65 +11,58 @@ from app.utils import crx_flash, redirect
 from . import user, submit, challenge, breaks  # noqa
 
 
-def need_to_check(url_rule):
-    if url_rule.startswith('/static/') \
-       or (url_rule.startswith('/user/') and url_rule != "/user/show") \
-       or url_rule == '/rules' \
-       or url_rule == '/submit/candidate':
-        return False
-    return True
-
-
-def update_strawberries(sender, **extra):
-    url_rule = str(request.url_rule)
-    if not need_to_check(url_rule):
-        return
-
-    app.logger.info(f"Updating strawberries for {url_rule}")
-    now = int(time.time())
-    try:
-        programs = Program.get_programs_requiring_update(now)
-
-        # update the strawberries and carrots for each program
-        for program in programs:
-            program.update_strawberries(now)
-
-        # refresh program and user ranking
-        Program.refresh_all_strawberry_rankings()
-        User.refresh_all_strawberry_rankings()
-
-        db.session.commit()
-    except:
-        db.session.rollback()
-        print_exc()
-
-
-request_started.connect(update_strawberries, app)
+@app.before_request
+def start_scoring():
+    # uwsgi forks the processes after the application is loaded
+    scoring.start()
 
 
 @app.route('/', methods=['GET'])
 def index():
+    # A fixed number of queries: the tables are computed from the lists of
+    # the published programs and of the breaks, loaded with their users
     total_number_of_users = User.get_total_number_of_users()
     users = User.get_all_sorted_by_bananas()
-    programs_to_plot = Program.get_all_published_sorted_by_ranking(
-        max_rank=app.config['MAX_RANK_OF_PLOTED_CHALLENGES'])
     programs = Program.get_all_published_sorted_by_ranking()
-    number_of_unbroken_programs = Program.get_number_of_unbroken_programs()
-    number_of_broken_programs = Program.get_number_of_broken_programs()
+    max_rank = app.config['MAX_RANK_OF_PLOTED_CHALLENGES']
+    programs_to_plot = [
+        program for program in programs
+        if program.strawberries_ranking is not None and
+        program.strawberries_ranking <= max_rank]
+    number_of_broken_programs = sum(
+        1 for program in programs if program.is_broken)
+    number_of_unbroken_programs = len(programs) - number_of_broken_programs
     total_programs = number_of_broken_programs + number_of_unbroken_programs
     if not total_programs:
         broken_ratio = None
     else:
         broken_ratio = round(number_of_broken_programs*100 / total_programs)
     wb_breaks = WhiteboxBreak.get_all()
-    programs_broken_by_current_user = None
+    program_ids_broken_by_current_user = set()
     if current_user and current_user.is_authenticated:
-        wb_breaks_by_current_user = WhiteboxBreak.get_all_by_user(current_user)
-        programs_broken_by_current_user = [
-            wb_break.program for wb_break in wb_breaks_by_current_user]
-
-    total_breaks_by_user = WhiteboxBreak.get_total_breaks_group_by_user()
-    total_breaks_by_program = WhiteboxBreak.get_total_breaks_group_by_program()
+        program_ids_broken_by_current_user = {
+            wb_break._program_id for wb_break in wb_breaks
+            if wb_break._user_id == current_user._id}
+
+    total_breaks_by_user = Counter(
+        wb_break._user_id for wb_break in wb_breaks)
+    total_breaks_by_program = Counter(
+        wb_break._program_id for wb_break in wb_breaks)
+
+    # The tables are rendered once per version of the scores
+    version = scoring.version()
+    table_challenges = fragments.render(
+        'table_challenges.html', version,
+        programs=programs,
+        total_breaks_by_program=total_breaks_by_program)
+    table_bananas_ranking = fragments.render(
+        'table_bananas_ranking.html', version,
+        users=users,
+        total_breaks_by_user=total_breaks_by_user)
+    table_breaks = fragments.render(
+        'table_breaks.html', version,
+        active_page='index',
+        wb_breaks=wb_breaks)
 
     return render_template(
         'index.html',
@@ -82,13 +71,14 @@ def index():
         total_number_of_users=total_number_of_users,
         programs=programs,
         wb_breaks=wb_breaks,
-        programs_broken_by_current_user=programs_broken_by_current_user,
+        program_ids_broken_by_current_user=program_ids_broken_by_current_user,
         number_of_unbroken_programs=number_of_unbroken_programs,
         number_of_broken_programs=number_of_broken_programs,
         broken_ratio=broken_ratio,
         programs_to_plot=programs_to_plot,
-        total_breaks_by_user=total_breaks_by_user,
-        total_breaks_by_program=total_breaks_by_program
+        table_challenges=table_challenges,
+        table_bananas_ranking=table_bananas_ranking,
+        table_breaks=table_breaks
     )
 
 
@@ -110,31 +100,7 @@ def rules():
 
 @app.route('/rss.xml', methods=['GET'])
 def recent_feed():
-    feed = AtomFeed('WhibOx Contest 3nd Edition -- CHES 2021 Challenge',
-                    feed_url=request.url, url=request.url_root,
-                    author="WhibOx organizing committee",
-                    subtitle="Submitted challenged order by published date descending"
-                    )
-    programs = Program.get_all_published_sorted_by_published_time()
-
-    for program in programs:
-        item_url = f"{request.url_root}candidate/{program._id}.html"
-        title = f'New challenge "{program.funny_name}" submitted'
-        author = program.user.nickname
-        content = render_template('candidate.html', program=program, feed=True)
-
-        if not author or not author.strip():
-            author = program.user.username
-        feed.add(id=item_url,
-                 title=title,
-                 title_type='html',
-                 updated=datetime.fromtimestamp(program._timestamp_published),
-                 author=author,
-                 url=item_url,
-                 categories=[{'term': program.status}],
-                 content=content,
-                 content_type='html',)
-    return feed.get_response()
+    return feed.response()
 
 
 def unauthorized_handler():
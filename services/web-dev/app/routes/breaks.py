@@ -2,14 +2,14 @@ import time
 from flask import url_for, render_template, request
 from flask_login import current_user, login_required
 
-from app import app, db
+from app import app, db, scoring
 from app.forms import WhiteboxBreakForm
+from app.models.contest_state import ContestState
 from app.models.program import Program
 from app.models.whiteboxbreak import WhiteboxBreak
+from app.ec_backend import backend
 from app.utils import redirect, format_timestamp, crx_flash
 
-from commands import validate_private_key
-
 
 @app.route('/break/candidate/<int:identifier>', methods=['GET', 'POST'])
 @login_required
@@ -53,10 +53,15 @@ def break_candidate(identifier):
     if program.pubkey is None:
         return redirect(url_for('index'))
 
-    if validate_private_key(submitted_prikey, program.pubkey):
+    if backend.validate_private_key(submitted_prikey, program.pubkey):
         app.logger.info(f"Implementation is broken at {now}")
+        # The cached tables change
+        ContestState.bump_version()
+        # The break records the strawberries of the program right now
+        program.update_strawberries(now)
         program.set_status_to_broken(current_user, now)
         db.session.commit()
+        scoring.wake()
 
         return redirect(url_for('break_candidate_ok', identifier=identifier))
     else:
@@ -1,7 +1,7 @@
-from flask import url_for, send_from_directory, jsonify, render_template
+from flask import url_for, render_template
 from flask_login import current_user
 
-from app import app
+from app import app, exports, sources
 from app.models.program import Program
 from app.models.whiteboxbreak import WhiteboxBreak
 from app.utils import redirect
@@ -24,8 +24,7 @@ def down_candidate(identifier):
         return redirect(url_for('index'))
 
     # If we reach this point, we can show the source code
-    upload_folder = app.config['UPLOAD_FOLDER']
-    return send_from_directory(upload_folder, program.filename)
+    return sources.response(program)
 
 
 @app.route('/candidate/<int:identifier>/pubkey', methods=['GET'])
@@ -34,6 +33,10 @@ def get_candidate_pubkey(identifier):
     if program is None:
         return redirect(url_for('index'))
 
+    # Published, it does not change anymore
+    if program.is_published and program.pubkey:
+        return exports.response(program, 'pubkey')
+
     do_show = False
     if program.is_published:
         do_show = True
@@ -56,6 +59,10 @@ def get_candidate_proof_of_knowledge(identifier):
     if program is None:
         return redirect(url_for('index'))
 
+    # Published, it does not change anymore
+    if program.is_published and program.proof_of_knowledge:
+        return exports.response(program, 'proof_of_knowledge')
+
     do_show = False
     if program.is_published:
         do_show = True
@@ -71,25 +78,11 @@ def get_candidate_proof_of_knowledge(identifier):
 
 @app.route('/candidate/<int:identifier>', methods=['GET'])
 def show_candidate_sample(identifier):
-    program = Program.get_by_id(identifier)
+    program = Program.get_by_id_with_sample(identifier)
     if program is None or not program.is_published:
         return redirect(url_for('index'))
 
-    number_of_test_vectors = int(len(program.hashes) / 32)
-    test_vectors = list()
-    for i in range(number_of_test_vectors):
-        test_vectors.append({
-            "hash": program.hashes[i*32:(i+1)*32].hex().upper(),
-            "signature": program.signatures[i*64:(i+1)*64].hex().upper()
-        })
-
-    res = {
-        "id": program._id,
-        "public_key": program.pubkey,
-        "proof_of_knowledge": program.proof_of_knowledge,
-        "test_vectors": test_vectors
-    }
-    return jsonify(res)
+    return exports.response(program, 'sample')
 
 
 @app.route('/candidate/<int:identifier>.html', methods=['GET'])
@@ -98,14 +91,13 @@ def candidate(identifier):
     if program is None or not program.is_published:
         return redirect(url_for('index'))
 
-    programs_broken_by_current_user = None
+    program_ids_broken_by_current_user = set()
     if current_user and current_user.is_authenticated:
-        wb_breaks_by_current_user = WhiteboxBreak.get_all_by_user(current_user)
-        programs_broken_by_current_user = [
-            wb_break.program for wb_break in wb_breaks_by_current_user]
+        program_ids_broken_by_current_user = \
+            WhiteboxBreak.get_program_ids_broken_by_user(current_user)
     # If we reach this point, we can show the source code
     return render_template(
         'candidate.html',
         program=program,
-        programs_broken_by_current_user=programs_broken_by_current_user,
+        program_ids_broken_by_current_user=program_ids_broken_by_current_user,
     )
@@ -1,4 +1,3 @@
-import os
 import random
 import string
 import time
@@ -10,9 +9,10 @@ from flask_login import login_required, current_user
 
 from app import app
 from app import db
+from app import sources
 from app.forms import WhiteboxSubmissionForm
 from app.models.program import Program
-from app.utils import crx_flash, format_timestamp, redirect
+from app.utils import crx_flash, format_timestamp, notify_launcher, redirect
 
 
 @app.route('/submit/candidate', methods=['GET', 'POST'])
@@ -42,14 +42,13 @@ def submit_candidate():
                                active_page='submit_candidate',
                                testing=app.testing), 400
     else:
-        upload_folder = app.config['UPLOAD_FOLDER']
         basename = ''.join(random.SystemRandom().choice(
             string.ascii_lowercase + string.digits) for _ in range(32))
         filename = basename + '.c'
         pubkey = form.pubkey.data
         proof_of_knowledge = form.proof_of_knowledge.data
         form_data = form.program.data
-        form_data.save(os.path.join(upload_folder, filename))
+        sources.save(form_data, filename)
         Program.create(basename=basename,
                        pubkey=pubkey,
                        proof_of_knowledge=proof_of_knowledge,
@@ -66,6 +65,7 @@ def submit_candidate():
                                    active_page='submit_candidate',
                                    testing=app.testing), 400
         else:
+            notify_launcher(app.config['URL_COMPILE_AND_TEST'])
             return redirect(url_for('submit_candidate_ok'))
 
 
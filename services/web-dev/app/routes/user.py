@@ -3,6 +3,7 @@ from flask_login import current_user, login_user, logout_user, login_required
 from sqlalchemy.exc import IntegrityError
 
 from app import app
+from app.compilation_queue import CompilationQueue
 from app.forms import LoginForm, UserRegisterForm
 from app.models.user import User
 from app.models.program import Program
@@ -76,15 +77,18 @@ def user_register():
 def user_show():
     programs = Program.get_user_competing_programs(current_user)
     programs_queued = Program.get_user_queued_programs(current_user)
+    compilation_queue = None
+    if programs_queued:
+        compilation_queue = CompilationQueue.snapshot()
     programs_rejected = Program.get_user_rejected_programs(current_user)
     wb_breaks = WhiteboxBreak.get_all_by_user(current_user)
-    User.refresh_all_strawberry_rankings()
     total_breaks_by_program = WhiteboxBreak.get_total_breaks_group_by_program()
     return render_template('user_show.html',
                            active_page='user_show',
                            user=current_user,
                            programs=programs,
                            programs_queued=programs_queued,
+                           compilation_queue=compilation_queue,
                            programs_rejected=programs_rejected,
                            wb_breaks=wb_breaks,
                            total_breaks_by_program=total_breaks_by_program)
@@ -0,0 +1,107 @@
+"""Update of the strawberries and of the rankings, off the request path.
+
+The strawberries only change by the minute: every SCORING_INTERVAL_IN_SECS
+(and when a program is broken) the strawberries of the published programs
+and both rankings are updated in a single transaction, which bumps the
+version of the contest state (see models/contest_state.py).
+
+Each web process runs a scoring thread. The threads share a file lock,
+and the transaction locks the row of the state, so a single update runs
+at a time. A thread ticking less than SCORING_INTERVAL_IN_SECS after the
+last update, whichever process made it, leaves the scores as they are,
+unless it was woken up by a break. The first update after FINAL_DEADLINE computes the final
+scores and freezes the state: from then on, nothing is updated and the
+version does not change."""
+
+import fcntl
+import os
+import threading
+import time
+from traceback import print_exc
+
+from app import app
+from app import db
+from app import utils
+from app.models.contest_state import ContestState
+from app.models.program import Program
+from app.models.user import User
+
+LOCK_FILE = '/tmp/scoring.lock'
+
+_wake_up = threading.Event()
+_lock = threading.Lock()
+_started_in_pid = None
+
+
+def update(now, forced=False):
+    """Update the scores at the time now, unless they were updated less
+    than SCORING_INTERVAL_IN_SECS ago and forced is not set. Returns the
+    state."""
+    state = ContestState.get(for_update=True)
+    last_update = state.timestamp_last_update
+    if state.frozen or (
+            not forced and last_update is not None and
+            now - last_update < app.config['SCORING_INTERVAL_IN_SECS']):
+        db.session.commit()
+        return state
+
+    for program in Program.get_programs_requiring_update(now):
+        program.update_strawberries(now)
+    Program.refresh_all_strawberry_rankings()
+    User.refresh_all_strawberry_rankings()
+    # The banana ranks are updated incrementally on each break, a full
+    # recompute repairs them if they drifted
+    wrong_banana_ranks = User.check_banana_rankings()
+    if wrong_banana_ranks:
+        utils.console(f"Wrong banana ranks {wrong_banana_ranks}, "
+                      "ranking all the users again")
+        User.refresh_all_banana_rankings()
+
+    if now > app.config['FINAL_DEADLINE']:
+        utils.console("Final deadline passed, freezing the scores")
+        state.freeze()
+    state.bump(now)
+    db.session.commit()
+    return state
+
+
+def version():
+    """Version of the scores, to key the caches of the pages on."""
+    return ContestState.get().version
+
+
+def start():
+    """Start the scoring thread of this process (again in forked
+    processes)."""
+    global _started_in_pid
+    with _lock:
+        if _started_in_pid == os.getpid():
+            return
+        _started_in_pid = os.getpid()
+        thread = threading.Thread(target=_run, name='scoring', daemon=True)
+        thread.start()
+
+
+def wake():
+    start()
+    _wake_up.set()
+
+
+def _run():
+    utils.console(f'Scoring started in process {os.getpid()}')
+    # Started by wake() if the first break came before any request
+    woken = _wake_up.is_set()
+    _wake_up.clear()
+    while True:
+        try:
+            with open(LOCK_FILE, 'w') as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                with app.app_context():
+                    if update(int(time.time()), forced=woken).frozen:
+                        break
+        except:
+            utils.console('Exception caught while updating the scores')
+            print_exc()
+        woken = _wake_up.wait(app.config['SCORING_INTERVAL_IN_SECS'])
+        _wake_up.clear()
+    utils.console('The scores are frozen, scoring stopped')
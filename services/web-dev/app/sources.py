@@ -0,0 +1,66 @@
+"""The sources of the programs: UPLOAD_FOLDER/<basename>.c as uploaded, and
+UPLOAD_FOLDER/<basename>.c.gz, gzipped when it is uploaded.
+
+If ACCEL_REDIRECT_PREFIX is set, the app only checks who may download a
+source and nginx sends it (X-Accel-Redirect to the internal location of
+nginx_vhost.conf): sendfile, Range requests, ETag, and the gzipped source
+to the clients which accept it. Otherwise (development) the app sends the
+source as uploaded.
+
+The command `flask compress-sources` gzips the sources uploaded before."""
+
+import gzip
+import os
+import shutil
+
+from flask import Response, send_from_directory
+
+from app import app
+from app import utils
+from app.models.program import Program
+
+MIMETYPE = 'text/x-csrc'
+GZIP_LEVEL = 9
+
+
+def save(file_storage, filename):
+    path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+    file_storage.save(path)
+    compress(path)
+
+
+def compress(path):
+    """Write the gzipped path aside. A failure only costs the compression
+    of the downloads."""
+    try:
+        # Neither name nor mtime: the same source gives the same file
+        with open(path, 'rb') as f_in, open(path + '.gz.tmp', 'wb') as raw:
+            with gzip.GzipFile('', 'wb', GZIP_LEVEL, raw, mtime=0) as f_out:
+                shutil.copyfileobj(f_in, f_out)
+        # Written aside then renamed, nginx never sends a partial file
+        os.replace(path + '.gz.tmp', path + '.gz')
+    except OSError as e:
+        utils.console(f"Could not compress {path}: {e}")
+
+
+def response(program):
+    """The response sending the source of program, who may download it
+    being checked."""
+    prefix = app.config['ACCEL_REDIRECT_PREFIX']
+    if not prefix:
+        return send_from_directory(app.config['UPLOAD_FOLDER'],
+                                   program.filename, mimetype=MIMETYPE)
+    response = Response(mimetype=MIMETYPE)
+    response.headers['X-Accel-Redirect'] = prefix + program.filename
+    return response
+
+
+@app.cli.command('compress-sources')
+def compress_sources():
+    """Gzip the sources which are not."""
+    upload_folder = app.config['UPLOAD_FOLDER']
+    for program in Program.query.all():
+        path = os.path.join(upload_folder, program.filename)
+        if os.path.exists(path) and not os.path.exists(path + '.gz'):
+            compress(path)
+    utils.console("Sources compressed")
@@ -1,5 +1,6 @@
 import sys
 import time
+import urllib.request
 import flask
 from urllib.parse import urlparse, urljoin
 from flask import flash
@@ -18,6 +19,16 @@ def is_safe_url(request, target):
         ref_url.netloc == test_url.netloc
 
 
+def notify_launcher(url):
+    """Wake up the dispatcher of the launcher. The launcher polls anyway,
+    so that a failure only delays the compilation."""
+    try:
+        with urllib.request.urlopen(url, timeout=2):
+            pass
+    except Exception as e:
+        console(f"Could not notify the launcher at {url}: {e}")
+
+
 def format_timestamp(timestamp):
     if timestamp is None:
         return None
@@ -0,0 +1,54 @@
+"""Micro-benchmark of the elliptic curve backends available here: time per
+signature verification of each one (see app/ec_backend.py).
+
+    python services/web-dev/scripts/benchmark_ec_backend.py [SIGNATURES]"""
+
+import os
+import random
+import sys
+import time
+
+# ec_backend.py imports p256.py on its own outside of the app package
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, 'app'))
+
+import ec_backend  # noqa: E402
+import p256  # noqa: E402
+
+
+def sign(d, message, rng):
+    """ECDSA signature of the 32-byte message."""
+    e = int.from_bytes(message, 'big')
+    while True:
+        k = rng.randrange(1, p256.N)
+        x, _ = p256.base_multiple(k)
+        r = x % p256.N
+        s = pow(k, -1, p256.N) * (e + r * d) % p256.N
+        if r != 0 and s != 0:
+            return r.to_bytes(32, 'big') + s.to_bytes(32, 'big')
+
+
+def microbenchmark(backends, number_of_signatures):
+    """Time per signature verification, in seconds, of each backend."""
+    rng = random.Random(1)
+    d = rng.randrange(1, p256.N)
+    pubkey = ec_backend.PythonBackend().public_key_of(d)
+    messages = bytes(rng.getrandbits(8)
+                     for _ in range(32 * number_of_signatures))
+    signatures = b''.join(sign(d, messages[32*i:32*(i+1)], rng)
+                          for i in range(number_of_signatures))
+    timings = dict()
+    for b in backends:
+        begin = time.perf_counter()
+        if b.first_invalid(b.decode_public_key(pubkey), messages,
+                           signatures) is not None:
+            raise RuntimeError(f'{b.name} rejects a valid signature')
+        timings[b.name] = (time.perf_counter() - begin) / number_of_signatures
+    return timings
+
+
+if __name__ == "__main__":
+    number_of_signatures = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    timings = microbenchmark(ec_backend.available_backends(),
+                             number_of_signatures)
+    for name, timing in timings.items():
+        print(f"{name}: {1000 * timing:.3f} ms per verification")
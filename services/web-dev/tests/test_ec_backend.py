@@ -0,0 +1,120 @@
+"""Conformance of the elliptic curve backends: every available backend must
+give the same answers on the same vectors.
+
+    python -m pytest services/web-dev/tests"""
+
+import os
+import random
+import sys
+
+import pytest
+
+# ec_backend.py imports p256.py on its own outside of the app package
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, 'app'))
+
+import ec_backend  # noqa: E402
+import p256  # noqa: E402
+
+# RFC 6979, A.2.5: signature of SHA-256("sample") with P-256
+RFC6979_PRIKEY = \
+    'c9afa9d845ba75166b5c215767b1d6934e50c3db36e89b127b8a622b120f6721'
+RFC6979_PUBKEY = \
+    '60fed4ba255a9d31c961eb74c6356d68c049b8923b61fa6ce669622e60f29fb6' \
+    '7903fe1008b8bc99a41ae9e95628bc64f2f1b20c2d7e9f5177a3c294d4462299'
+RFC6979_HASH = bytes.fromhex(
+    'af2bdbe1aa9b6ec1e2ade1d694f41fc71a831d0268e9891562113d8a62add1bf')
+RFC6979_SIGNATURE = bytes.fromhex(
+    'efd48b2aacb6a8fd1140dd9cd45e81d69d2c877b56aaf991c34d0ea84eaf3716'
+    'f7cb1c942d657c41d436c7a1b6e29f65f3e900dbb9aff4064dc4ab2f843acda8')
+
+NUMBER_OF_SIGNATURES = 64
+
+BACKENDS = ec_backend.available_backends()
+
+
+def sign(d, message, rng):
+    """ECDSA signature of the 32-byte message."""
+    e = int.from_bytes(message, 'big')
+    while True:
+        k = rng.randrange(1, p256.N)
+        x, _ = p256.base_multiple(k)
+        r = x % p256.N
+        s = pow(k, -1, p256.N) * (e + r * d) % p256.N
+        if r != 0 and s != 0:
+            return r.to_bytes(32, 'big') + s.to_bytes(32, 'big')
+
+
+def make_vectors(seed=0):
+    """(pubkey, messages, signatures, start) batches with the expected
+    index of the first invalid signature, and (prikey, pubkey) pairs with
+    the expected validity."""
+    rng = random.Random(seed)
+    d = rng.randrange(1, p256.N)
+    pubkey = ec_backend.PythonBackend().public_key_of(d)
+    messages = bytes(rng.getrandbits(8)
+                     for _ in range(32 * NUMBER_OF_SIGNATURES))
+    # Edge cases of the hashes: 0, N and all ones
+    messages = bytes(32) + p256.N.to_bytes(32, 'big') + b'\xff' * 32 + \
+        messages[96:]
+    signatures = b''.join(sign(d, messages[32*i:32*(i+1)], rng)
+                          for i in range(NUMBER_OF_SIGNATURES))
+
+    def corrupted(index, signature):
+        return signatures[:64*index] + signature + signatures[64*(index+1):]
+
+    last = NUMBER_OF_SIGNATURES - 1
+    flipped = bytearray(signatures[64*last:64*(last+1)])
+    flipped[rng.randrange(64)] ^= 1 << rng.randrange(8)
+    n_bytes = p256.N.to_bytes(32, 'big')
+    batches = {
+        'rfc6979': (RFC6979_PUBKEY, RFC6979_HASH, RFC6979_SIGNATURE, 0,
+                    None),
+        'valid': (pubkey, messages, signatures, 0, None),
+        'valid from 1': (pubkey, messages, signatures[64:], 1, None),
+        'bit flip': (pubkey, messages, corrupted(last, bytes(flipped)), 0,
+                     last),
+        'zero': (pubkey, messages, corrupted(7, bytes(64)), 0, 7),
+        'r is N': (pubkey, messages,
+                   corrupted(3, n_bytes + signatures[64*3+32:64*4]), 0, 3),
+        's is N': (pubkey, messages,
+                   corrupted(5, signatures[64*5:64*5+32] + n_bytes), 0, 5),
+        'other message': (pubkey, messages,
+                          corrupted(9, signatures[64*10:64*11]), 0, 9),
+    }
+    keys = {
+        'rfc6979': (RFC6979_PRIKEY, RFC6979_PUBKEY, True),
+        'upper case': (RFC6979_PRIKEY.upper(), RFC6979_PUBKEY, True),
+        'random': (f'{d:064x}', pubkey, True),
+        'off by one': (f'{d + 1:064x}', pubkey, False),
+        'other key': (RFC6979_PRIKEY, pubkey, False),
+    }
+    return batches, keys
+
+
+BATCHES, KEYS = make_vectors()
+
+
+@pytest.fixture(params=BACKENDS, ids=[b.name for b in BACKENDS])
+def backend(request):
+    return request.param
+
+
+@pytest.mark.parametrize('name', BATCHES)
+def test_first_invalid(backend, name):
+    pubkey, messages, signatures, start, expected = BATCHES[name]
+    if expected is not None:
+        expected += start
+    assert backend.first_invalid(backend.decode_public_key(pubkey),
+                                 messages, signatures,
+                                 start=start) == expected
+
+
+@pytest.mark.parametrize('name', KEYS)
+def test_validate_private_key(backend, name):
+    prikey, pubkey, expected = KEYS[name]
+    assert backend.validate_private_key(prikey, pubkey) == expected
+
+
+def test_check_public_key(backend):
+    assert backend.check_public_key(RFC6979_PUBKEY)
+    assert not backend.check_public_key(RFC6979_PUBKEY[:-1] + '0')